@@ -1,8 +1,5 @@
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
-import json
-import os
-import pandas as pd
 
 
 
@@ -19,21 +16,46 @@ def create_app():
         allow_headers=["*"],
     )
 
+    # Request ids and per-route latency histograms (TRACING_ENABLED=1).
+    from utils.tracing import RequestTracingMiddleware
+    app.add_middleware(RequestTracingMiddleware)
+
+    # Admin-only per-request sampling profiles (PROFILE_TOKEN).
+    from utils.profiling import ProfilingMiddleware
+    app.add_middleware(ProfilingMiddleware)
+
     # Global storage for JSON config
     app.state.icd10 = {}
 
     @app.on_event("startup")
     async def startup_event():
         """Loads JSON data on FastAPI startup."""
-        
+        from utils.telemetry import sampler
+        from api.chat import ollama_lifecycle
+
+        # Background RSS sampling (TELEMETRY_SAMPLE_SECONDS, 0 disables).
+        sampler.start()
+
+        # Load the Ollama models and pin them with keep_alive; /ready turns
+        # 200 once they are warm.
+        ollama_lifecycle.start()
+
         # Ensure the cache directory exists
         # os.makedirs(ICD_CACHE_DIR, exist_ok=True)
 
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        from api.chat import ollama_lifecycle
+
+        await ollama_lifecycle.stop()
+
     from api.chat import chat_router
     from api.transcribe import transcribe_router
+    from api.stats import stats_router
     
 
     app.include_router(chat_router)
     app.include_router(transcribe_router)
+    app.include_router(stats_router)
 
     return app  # Returning `get_config` for dependency injection if needed
@@ -1,45 +1,33 @@
 import os
+import time
 import traceback
 import asyncio
 import logging
 import json
+import hashlib
+import contextvars
 import traceback
-import psutil
+from concurrent.futures import ThreadPoolExecutor
 
+from utils.cache import TieredCache
+from utils.icd10_index import ICD_CACHE_DIR
 from utils.predict import map_symptoms, final_session_specialty
 from utils.prompts import SYMPTOM_PROMPT
 from utils.types import ChatRequest
+from utils.extractors import HybridExtractor, LexiconExtractor, build_extractor
+from utils.fast_path import FAST_PATH_ENABLED, fast_path
+from utils.json_stream import JSONObjectScanner
+from utils.sessions import SessionStore
+from utils.ollama_lifecycle import OllamaLifecycle, client_options, keep_alive_from_env
+from utils import fhir, sse, telemetry, tracing
 
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from ollama import AsyncClient
 from pydantic import BaseModel
-from typing import Literal, Dict, Any
-from fhir.resources.condition import Condition
-from fhir.resources.codeableconcept import CodeableConcept
+from typing import Dict, Any
 
-from fhir.resources.appointment import Appointment
-
-from datetime import datetime, timedelta
-
-
-
-def log_memory_usage(tag: str = "Memory"):
-    process = psutil.Process(os.getpid())
-    
-    # Current RAM usage
-    mem_bytes = process.memory_info().rss
-    mem_mb = mem_bytes / (1024 * 1024)
-
-    # Peak RAM usage (Linux/Unix: use `.rss`, Windows: use `.peak_wset`)
-    try:
-        peak_bytes = process.memory_info().peak_wset  # Windows only
-    except AttributeError:
-        peak_bytes = getattr(process.memory_info(), 'rss', mem_bytes)  # fallback for Linux
-    peak_mb = peak_bytes / (1024 * 1024)
-
-    logging.info(f"{tag} - RAM used: {mem_mb:.2f} MB | Peak: {peak_mb:.2f} MB")
 
 
 class SymptomDetection(BaseModel):
@@ -59,32 +47,6 @@ class DiagnosesMappingResult(BaseModel):
     """The expected JSON structure for the result of mapping symptoms to diagnoses."""
     mappings: list[DiagnosisMapping]
 
-def symptom_to_fhir_condition(symptom_name: str) -> Condition:
-    return Condition.model_construct(
-        code=CodeableConcept.model_construct(
-            text=symptom_name
-        ),
-        clinicalStatus={"text": "active"},
-        verificationStatus={"text": "unconfirmed"}
-    )
-
-def create_fhir_appointment(specialty: str) -> Appointment:
-
-    # datetime string 2 days from now
-    start_str = datetime.now() + timedelta(days=2)
-    start_str = start_str.strftime("%Y-%m-%dT%H:%M:%S+01:00")
-    end_str = datetime.now() + timedelta(days=2, hours=1)
-    end_str = end_str.strftime("%Y-%m-%dT%H:%M:%S+01:00")
-    
-    
-    # Create a FHIR Appointment object
-    return Appointment.model_construct(
-        status="proposed",
-        description=f"Appointment for {specialty}",
-        start=start_str,
-        end=end_str,
-    )
-
 
 load_dotenv()
 
@@ -92,126 +54,236 @@ logging.basicConfig(level=logging.INFO)  # Debug logging enabled
 
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://host.docker.internal:11434")
 
-# Initialize Ollama Client
+# Models used by the chat path, and how long Ollama keeps them loaded after
+# a request (OLLAMA_KEEP_ALIVE, e.g. "24h" or -1 for forever).
+EXTRACTION_MODEL = os.getenv("OLLAMA_EXTRACTION_MODEL", "llama3.2:1b")
+FALLBACK_MODEL = os.getenv("OLLAMA_FALLBACK_MODEL", "llama3.2:1b")
+KEEP_ALIVE = keep_alive_from_env()
+
+# Initialize Ollama Client (connection pool sized by OLLAMA_MAX_CONNECTIONS)
 client = AsyncClient(
-    host=OLLAMA_URL
+    host=OLLAMA_URL,
+    **client_options(),
+)
+
+# "stream": read the structured output incrementally and hang up as soon as
+# the JSON object closes; "single": one non-streamed call.
+EXTRACTION_MODE = os.getenv("SYMPTOM_EXTRACTION_MODE", "stream")
+
+EXTRACTION_OPTIONS = {
+    "num_ctx": 128,
+    "temperature": 0.0,
+}
+
+# Extraction cache. Short turns ("yes", "sore throat") repeat across
+# patients, and extraction is deterministic (temperature 0), so the parsed
+# LLM output is cached by (model, prompt version, normalised messages).
+# The prompt version is also the cache namespace: editing SYMPTOM_PROMPT,
+# the schema or the options drops every stored entry.
+PROMPT_VERSION = hashlib.sha256(
+    json.dumps(
+        [SYMPTOM_PROMPT, SymptomsList.model_json_schema(), EXTRACTION_OPTIONS],
+        sort_keys=True,
+    ).encode()
+).hexdigest()[:16]
+
+_extraction_cache = TieredCache(
+    "symptom_extractions",
+    maxsize=int(os.getenv("EXTRACTION_CACHE_SIZE", "512")),
+    namespace=PROMPT_VERSION,
+    disk_path=os.getenv(
+        "EXTRACTION_CACHE_PATH", os.path.join(ICD_CACHE_DIR, "cache", "symptom_extractions.sqlite")
+    ) or None,
+    ttl_seconds=float(os.getenv("EXTRACTION_CACHE_TTL_SECONDS", "86400")),
+)
+
+
+def extraction_cache_stats() -> Dict[str, Any]:
+    """Hit/miss/eviction counters of the symptom extraction cache."""
+    return _extraction_cache.stats()
+
+
+# Per-session state (accumulated symptoms, user text so far). In memory by
+# default; SESSION_STORE_PATH moves it to SQLite shared by all workers.
+sessions = SessionStore(
+    ttl_seconds=float(os.getenv("SESSION_TTL_SECONDS", "1800")),
+    maxsize=int(os.getenv("SESSION_STORE_SIZE", "10000")),
+    disk_path=os.getenv("SESSION_STORE_PATH") or None,
 )
 
 # FastAPI Router
 chat_router = APIRouter()
 
-def _create_sse_data_string(
-    id_prefix: str,
-    model: str,
-    role: Literal["system", "user", "assistant", "tool"] = "assistant",
-    delta_content: str | None = None,
-    finish_reason: str | None = None
-) -> str:
-    """
-    Creates a Server-Sent Event (SSE) data string in a format mimicking OpenAI's API.
-    """
-    timestamp = int(asyncio.get_event_loop().time())
-    # Generate a somewhat unique ID part. For true uniqueness, consider UUIDs.
-    random_hex = os.urandom(3).hex()
-    chunk_id = f"chatcmpl-{id_prefix}-{random_hex}-{timestamp}"
-
-    delta: Dict[str, Any] = {"role": role}
-    if delta_content is not None:
-        delta["content"] = delta_content
-
-    # If it's a final chunk with a finish_reason and no new content,
-    # OpenAI often sends an empty delta or just the role.
-    # Forcing delta to be empty if only finish_reason and no content for this chunk.
-    if finish_reason and delta_content is None:
-        delta = {} # Ensure delta is empty if it's purely a final marker with no new content
-
-    sse_obj = {
-        "id": chunk_id,
-        "object": "chat.completion.chunk",
-        "created": timestamp,
-        "model": model, # Model name from the actual LLM response chunk
-        "choices": [
-            {
-                "index": 0,
-                "delta": delta,
-                "finish_reason": finish_reason,
-            }
-        ],
-    }
-    return f"data: {json.dumps(sse_obj)}\n\n"
+def _message_text(m) -> str:
+    return m.content if hasattr(m, "content") else m["content"]
 
-def is_greeting(text: str) -> bool:
-    t = text.strip().lower()
-    return t in {"hi", "hello", "hey", "good morning", "good afternoon"}
 
-# $SELECTION_PLACEHOLDER$ replacement with logging
-async def extract_symptoms_json(messages: list, model: str) -> list[str] | None:
-    """
-    Attempts to extract symptoms as a JSON array via the LLM.
-    Returns the list of symptom strings if VALID, otherwise None.
-    """
-    logging.info(f"extract_symptoms_json: Starting with model={model}")
-    log_memory_usage("Before LLM call")
-    accumulator = ""
+def _message_role(m) -> str:
+    return m.role if hasattr(m, "role") else m["role"]
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.casefold().split()).strip(" .,!?")
+
+
+def _extraction_key(messages: list, model: str) -> str:
+    turns = [[_message_role(m), _normalize(_message_text(m))] for m in messages]
+    return hashlib.sha256(json.dumps([model, PROMPT_VERSION, turns]).encode()).hexdigest()
+
+
+@tracing.traced("chat.validate")
+def _parse_symptoms(raw_json: str) -> list[str] | None:
+    """Symptom names from the extractor's JSON, or None if it is invalid."""
+    # 1) quick sanity check
+    if not raw_json.strip().startswith("{"):
+        logging.warning("extract_symptoms_json: Output does not start with '{'")
+        return None
+    # 2) parse + validate
+    try:
+        obj = SymptomsList.model_validate_json(raw_json)
+    except Exception as e:
+        logging.error(f"extract_symptoms_json: JSON validation failed: {e}")
+        return None
+    return [symptom.name for symptom in obj.symptoms if symptom.name]
+
+
+def _present_in_text(names: list[str], raw_text: str) -> list[str]:
+    """Only include symptoms present in what the user actually wrote."""
+    names = [name for name in names if name.lower() in raw_text]
+    if names:
+        logging.info(f"extract_symptoms_json: Parsed symptoms={names}")
+    else:
+        logging.warning("extract_symptoms_json: No valid symptom names found – returning []")
+    return names
+
+
+@tracing.traced("chat.ollama")
+async def _extract_single(messages: list, model: str) -> str:
+    start = time.perf_counter()
+    response = await client.chat(
+        model=model,
+        messages=[SYMPTOM_PROMPT, *messages],
+        format=SymptomsList.model_json_schema(),
+        options=EXTRACTION_OPTIONS,
+        keep_alive=KEEP_ALIVE,
+        stream=False,
+    )
+    ollama_lifecycle.record_ttft(model, time.perf_counter() - start)
+    ollama_lifecycle.record_load(model, getattr(response, "load_duration", None))
+    return response.message.content or ""
+
+
+@tracing.traced("chat.ollama")
+async def _extract_streamed(messages: list, model: str) -> str:
+    start = time.perf_counter()
     stream = await client.chat(
         model=model,
         messages=[SYMPTOM_PROMPT, *messages],
         format=SymptomsList.model_json_schema(),
-        options={
-        "num_ctx": 128,
-        "temperature": 0.0,
-    },
-        stream=True
+        options=EXTRACTION_OPTIONS,
+        keep_alive=KEEP_ALIVE,
+        stream=True,
     )
-    async for chunk in stream:
-        logging.info("llm_stream_response: Starting response stream")
-        log_memory_usage("During LLM stream")
-        logging.debug(f"extract_symptoms_json: Received chunk={chunk}")
-        if content := getattr(chunk.message, "content", None):
-            accumulator += content
-            logging.debug(f"extract_symptoms_json: Accumulator updated to={accumulator!r}")
-        if getattr(chunk, "done", False):
-            logging.info("extract_symptoms_json: Stream done, validating JSON")
-            # 1) quick sanity check
-            if not accumulator.strip().startswith("{"):
-                logging.warning("extract_symptoms_json: Accumulator does not start with '[' – returning None")
-                return []
-            # 2) parse + validate
-            try:
-                obj = SymptomsList.model_validate_json(accumulator)
-                # Only include symptoms present in the original messages
-                raw_text = " ".join(
-                    m.content if hasattr(m, "content") else m["content"] 
-                    for m in messages
-                ).lower()
-                names = [
-                    symptom.name 
-                    for symptom in obj.symptoms 
-                    if symptom.name and symptom.name.lower() in raw_text
-                ]
-                
-                log_memory_usage("After LLM JSON validation")
-                if names:
-                    logging.info(f"extract_symptoms_json: Parsed symptoms={names}")
-                    return names
-                else:
-                    logging.warning("extract_symptoms_json: No valid symptom names found – returning None")
-                    log_memory_usage("After LLM JSON validation")
-                    return []
-            except Exception as e:
-                logging.error(f"extract_symptoms_json: JSON validation failed: {e}")
-                log_memory_usage("After LLM JSON validation")
-                return []
-        
-    
+    scanner = JSONObjectScanner()
+    pieces = []
+    ttft = None
+    reported = False
+    try:
+        async for chunk in stream:
+            if ttft is None:
+                ttft = time.perf_counter() - start
+                ollama_lifecycle.record_ttft(model, ttft)
+            content = chunk.message.content
+            if content:
+                end = scanner.feed(content)
+                if end >= 0:
+                    # The object is closed – stop reading so Ollama stops generating.
+                    pieces.append(content[:end])
+                    logging.debug("extract_symptoms_json: JSON object closed, stopping stream early")
+                    break
+                pieces.append(content)
+            if chunk.done:
+                ollama_lifecycle.record_load(model, getattr(chunk, "load_duration", None))
+                reported = True
+                break
+    finally:
+        await stream.aclose()
+    if not reported:
+        # Stopped at the closing brace, before the chunk with load_duration.
+        ollama_lifecycle.record_unreported_load(model, ttft)
+    return "".join(pieces)
+
+
+async def extract_symptoms_json(messages: list, model: str, context_text: str | None = None) -> list[str]:
+    """
+    Attempts to extract symptoms as a JSON array via the LLM.
+    Returns the list of validated symptom strings ([] if none or invalid).
+
+    Names must occur in ``context_text`` (the session's lowercased user
+    text) or, without a session, in the messages themselves.
+    """
+    logging.info(f"extract_symptoms_json: Starting with model={model}, mode={EXTRACTION_MODE}")
+    key = _extraction_key(messages, model)
+    parsed = _extraction_cache.get(key)
+    if parsed is None:
+        telemetry.checkpoint("Before LLM call")
+        if EXTRACTION_MODE == "single":
+            raw_json = await _extract_single(messages, model)
+        else:
+            raw_json = await _extract_streamed(messages, model)
+        parsed = _parse_symptoms(raw_json)
+        # Invalid output is not cached; the next identical turn retries.
+        if parsed is not None:
+            _extraction_cache.set(key, parsed)
+        telemetry.checkpoint("After LLM JSON validation")
+    else:
+        logging.info("extract_symptoms_json: cache hit")
+    # The hallucination filter runs against this request's own wording.
+    if context_text is None:
+        context_text = " ".join(_message_text(m) for m in messages).lower()
+    return _present_in_text(parsed or [], context_text)
+
+
+# Extraction engine for this deployment: "llm" (default), "lexicon" (no
+# Ollama needed) or "hybrid" (lexicon first, LLM fallback).
+SYMPTOM_EXTRACTOR = os.getenv("SYMPTOM_EXTRACTOR", "llm")
+
+symptom_extractor = build_extractor(
+    SYMPTOM_EXTRACTOR,
+    llm_extract=lambda messages, context_text=None: extract_symptoms_json(messages, EXTRACTION_MODEL, context_text),
+)
+
+# Warms the models this deployment calls (none for the lexicon engine) and
+# keeps load/TTFT metrics; started from the app's startup hook.
+ollama_lifecycle = OllamaLifecycle(
+    client,
+    models=[] if SYMPTOM_EXTRACTOR == "lexicon" else [EXTRACTION_MODEL, FALLBACK_MODEL],
+    keep_alive=KEEP_ALIVE,
+    retry_seconds=float(os.getenv("OLLAMA_WARMUP_RETRY_SECONDS", "5")),
+    cold_ttft_seconds=float(os.getenv("OLLAMA_COLD_TTFT_SECONDS", "5")),
+)
+
+
+def extractor_stats() -> Dict[str, Any]:
+    stats: Dict[str, Any] = {"engine": symptom_extractor.name}
+    if isinstance(symptom_extractor, HybridExtractor):
+        stats.update(symptom_extractor.stats())
+        lexicon = symptom_extractor.lexicon
+    else:
+        lexicon = symptom_extractor if isinstance(symptom_extractor, LexiconExtractor) else None
+    if lexicon is not None:
+        stats["lexicon_build_seconds"] = lexicon.build_seconds
+    return stats
+
 
 async def fallback_clarify(messages: list):
     logging.info("fallback_clarify: Starting fallback clarification stream")
     prompt = SYMPTOM_PROMPT["content"] + (
         "Your JSON extraction failed. Please ask the user to clarify their symptoms."
     )
+    start = time.perf_counter()
     stream = await client.chat(
-        model="llama3.2:1b",
+        model=FALLBACK_MODEL,
         messages=[{"role": "system", "content": prompt}, *messages],
         options={
         "num_ctx": 128,
@@ -220,33 +292,123 @@ async def fallback_clarify(messages: list):
         # "repeat_penalty": 1.1,
         "temperature": 0.0,
     },
+        keep_alive=KEEP_ALIVE,
         stream=True
     )
-    async for chunk in stream:
-        logging.debug(f"fallback_clarify: Received chunk={chunk}")
-        if content := getattr(chunk.message, "content", None):
-            logging.info(f"fallback_clarify: Yielding content chunk")
-            yield _create_sse_data_string("fallback", chunk.model, delta_content=content)
-        if getattr(chunk, "done", False):
-            logging.info("fallback_clarify: Stream done, sending fallback-done")
-            yield _create_sse_data_string("fallback-done", chunk.model, finish_reason="stop")
+    done = False
+
+    async def tokens():
+        nonlocal done
+        first = True
+        async for chunk in stream:
+            if first:
+                ollama_lifecycle.record_ttft(FALLBACK_MODEL, time.perf_counter() - start)
+                first = False
+            logging.debug(f"fallback_clarify: Received chunk={chunk}")
+            if content := getattr(chunk.message, "content", None):
+                yield content
+            if getattr(chunk, "done", False):
+                ollama_lifecycle.record_load(FALLBACK_MODEL, getattr(chunk, "load_duration", None))
+                done = True
+
+    # One id/template per reply; tokens within SSE_COALESCE_MS share a frame.
+    encoder = sse.SSEEncoder("fallback", FALLBACK_MODEL)
+    async for text in sse.coalesce(tokens()):
+        yield encoder.chunk(text)
+    if done:
+        logging.info("fallback_clarify: Stream done, sending fallback-done")
+        yield encoder.finish("stop")
     logging.info("fallback_clarify: Sending [DONE]")
-    yield "data: [DONE]\n\n"
+    yield sse.DONE
+
+async def _tracked(stream, tag: str):
+    """Attach a telemetry request context to a streaming body."""
+    with telemetry.track_request(tag):
+        async for item in stream:
+            yield item
+
+
+def _new_turn(messages: list) -> list:
+    """The messages after the last assistant reply."""
+    for i in range(len(messages) - 1, -1, -1):
+        if messages[i].role == "assistant":
+            return messages[i + 1:]
+    return messages
+
+
+# ICD-10 mapping is CPU-bound (sparse TF-IDF products); it runs here so
+# it never blocks the event loop and can overlap LLM extraction.
+_mapping_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("MAPPING_WORKERS", "2")), thread_name_prefix="icd10-map"
+)
+
+
+def _map_in_executor(symptoms: list[str]) -> asyncio.Future:
+    """Future of {symptom: mapping} computed on the mapping executor."""
+    def run():
+        return {m["label"]: m for m in map_symptoms(symptoms)}
+
+    # Keeps the request id on the worker thread for tracing spans.
+    context = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(_mapping_executor, context.run, run)
+
+
+def _discard(future) -> None:
+    """Drop a speculative future without leaving its exception unretrieved."""
+    if future is not None and not future.cancel():
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+
+def _ms_since(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
+
 
 async def llm_stream_response(chat_request: ChatRequest, icd10_data):
     logging.info("llm_stream_response: Starting response stream")
-    msgs = chat_request.messages
-    accu = list(chat_request.accumulated_symptoms)
-    logging.info(f"llm_stream_response: Initial accumulated_symptoms={accu}")
+    session, is_new = sessions.resume(chat_request.session_id)
+
+    # Clients with a live session send only the new message. Anyone else may
+    # still send the whole history; it seeds the session, but only the new
+    # turn ever goes to the extractor.
+    msgs = _new_turn(chat_request.messages)
+    for m in (chat_request.messages if is_new else msgs):
+        if m.role == "user":
+            session.add_user_text(m.content)
 
+    accu = list(session.symptoms)
+    accu += [s for s in chat_request.accumulated_symptoms or [] if s not in accu]
+    logging.info(f"llm_stream_response: Session {session.id} (new={is_new}), accumulated_symptoms={accu}")
 
     user_text = msgs[-1].content if msgs else ""
     logging.info(f"llm_stream_response: User text={user_text!r}")
-    logging.info("llm_stream_response: Starting response stream")
-    log_memory_usage("Start of stream")
 
-    # 1) Extract
-    names = await extract_symptoms_json(msgs, "llama3.2:1b")
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+
+    # Speculatively map symptoms from earlier turns while this turn is
+    # being extracted; the result is kept in the session either way.
+    speculative = None
+    unmapped = [s for s in accu if s not in session.mappings]
+    if unmapped:
+        speculative = _map_in_executor(unmapped)
+
+    try:
+        # 1) Extract – trivial turns ("hi", "yes", "sore throat") skip the LLM
+        stage = time.perf_counter()
+        fast = None
+        if FAST_PATH_ENABLED and msgs and msgs[-1].role == "user":
+            with tracing.span("chat.fast_path"):
+                fast = fast_path.classify(user_text)
+        if fast is not None:
+            logging.info(f"llm_stream_response: Fast path ({fast.kind}) symptoms={fast.symptoms}")
+            names = fast.symptoms
+        else:
+            with tracing.span("chat.extract", engine=symptom_extractor.name):
+                names = await symptom_extractor.extract(msgs, context_text=session.text)
+        timings["extract"] = _ms_since(stage)
+    except BaseException:
+        _discard(speculative)
+        raise
 
     # 2) Merge new
     new = [n for n in names if n not in accu]
@@ -255,61 +417,101 @@ async def llm_stream_response(chat_request: ChatRequest, icd10_data):
         accu += new
         logging.debug(f"llm_stream_response: Updated accumulated_symptoms={accu}")
 
+    session.symptoms = accu
+    metadata = {"type": "final_metadata", "accumulated_symptoms": accu, "session_id": session.id}
+    # Persist the turn before anything is streamed: a client that hangs up
+    # at the first chunk must not lose the symptoms it just reported.
+    sessions.save(session)
 
-    # 3) If <3 symptoms, ask for more
-    if len(accu) < 3:
-        if accu:
-            text = (
-                f"I understand you're experiencing: {', '.join(accu)}. "
-                "Could you please tell me about any other symptoms you might have?"
-            )
-        else:
-            text = "Hi! What symptoms are you experiencing today?"
-        logging.info("llm_stream_response: Asking user for more symptoms")
-        yield _create_sse_data_string("assistant", "llama3.2:1b", delta_content=text, finish_reason="stop")
-
-        # 2) emit metadata (updated)
-        yield f"data: {json.dumps({'type': 'final_metadata', 'accumulated_symptoms': accu})}\n\n"
-        yield "data: [DONE]\n\n"
-        logging.info("llm_stream_response: Sent metadata and [DONE] after asking for more symptoms")
-        return
-
-    # 4) Map to diagnoses
-    logging.info(f"llm_stream_response: Proceeding to map {accu} to diagnoses")
     try:
-        mappings = map_symptoms(accu)
-        specialty = final_session_specialty(mappings)
-        logging.info(f"llm_stream_response: Mappings={mappings}, specialty={specialty}")
-        icd_10_codes = [
-            {
-                "icd10": m["icd10_code"],
-                "label": m["label"],
-             } 
-            for m in mappings]
-        logging.info(f"llm_stream_response: ICD-10 codes={icd_10_codes}, specialty={specialty}")
-
-        final = {
-            "symptoms": accu,
-            "mappings": mappings,            
-            "icd10": icd_10_codes,
-            "appointment": {
-                "specialty": specialty,
-                "suggestedDate": "TBD",
-                "suggestedTime": "TBD"
-            },
-            "symptoms_fhir": [symptom_to_fhir_condition(s).model_dump() for s in accu],
-            "appointment_fhir": create_fhir_appointment(specialty).model_dump(),
-        }
-        logging.info("llm_stream_response: Final payload prepared successfully")
-    except Exception as e:
-        logging.error(f"llm_stream_response: Error during mapping or payload creation: {e}")
-        final = {"symptoms": accu, "error_message": str(e)}
-        logging.error(traceback.format_exc())
+        # 3) If <3 symptoms, ask for more
+        if len(accu) < 3:
+            if accu:
+                text = (
+                    f"I understand you're experiencing: {', '.join(accu)}. "
+                    "Could you please tell me about any other symptoms you might have?"
+                )
+            else:
+                text = "Hi! What symptoms are you experiencing today?"
+            logging.info("llm_stream_response: Asking user for more symptoms")
+            yield sse.SSEEncoder("assistant", EXTRACTION_MODEL).chunk(text, finish_reason="stop")
+
+            # The speculative mapping finishes behind the reply; a failure only
+            # means the next turn maps these symptoms itself.
+            try:
+                if speculative is not None:
+                    with tracing.span("chat.map", speculative=True):
+                        session.mappings.update(await speculative)
+            except Exception as e:
+                logging.warning(f"llm_stream_response: Speculative mapping failed: {e}")
+            sessions.save(session)
+
+            # 2) emit metadata (updated)
+            timings["total"] = _ms_since(started)
+            metadata["timings_ms"] = timings
+            yield sse.data(metadata)
+            yield sse.DONE
+            logging.info("llm_stream_response: Sent metadata and [DONE] after asking for more symptoms")
+            return
+
+        # 4) Map to diagnoses – only symptoms without a mapping yet
+        logging.info(f"llm_stream_response: Proceeding to map {accu} to diagnoses")
+        try:
+            stage = time.perf_counter()
+            pending = [speculative] if speculative is not None else []
+            missing = [s for s in accu if s not in session.mappings and s not in unmapped]
+            if missing:
+                pending.append(_map_in_executor(missing))
+            with tracing.span("chat.map", symptoms=len(missing)):
+                for result in await asyncio.gather(*pending):
+                    session.mappings.update(result)
+            timings["map"] = _ms_since(stage)
+            logging.info(
+                f"llm_stream_response: Mapped {len(missing)} new symptom(s), "
+                f"{len(unmapped)} speculatively, reused {len(accu) - len(missing) - len(unmapped)}"
+            )
 
-    yield _create_sse_data_string("final", "llama3.2:1b", delta_content=json.dumps(final), finish_reason="stop")
-    logging.info("llm_stream_response: Sending final_metadata and [DONE]")
-    yield f"data: {json.dumps({'type': 'final_metadata', 'accumulated_symptoms': accu})}\n\n"
-    yield "data: [DONE]\n\n"
+            stage = time.perf_counter()
+            mappings = [session.mappings[s] for s in accu]
+            specialty = final_session_specialty(mappings)
+            logging.info(f"llm_stream_response: Mappings={mappings}, specialty={specialty}")
+            icd_10_codes = [
+                {
+                    "icd10": m["icd10_code"],
+                    "label": m["label"],
+                 } 
+                for m in mappings]
+            logging.info(f"llm_stream_response: ICD-10 codes={icd_10_codes}, specialty={specialty}")
+
+            final = {
+                "symptoms": accu,
+                "mappings": mappings,            
+                "icd10": icd_10_codes,
+                "appointment": {
+                    "specialty": specialty,
+                    "suggestedDate": "TBD",
+                    "suggestedTime": "TBD"
+                },
+                "symptoms_fhir": [fhir.condition(s) for s in accu],
+                "appointment_fhir": fhir.appointment(specialty),
+            }
+            timings["payload"] = _ms_since(stage)
+            logging.info("llm_stream_response: Final payload prepared successfully")
+        except Exception as e:
+            logging.error(f"llm_stream_response: Error during mapping or payload creation: {e}")
+            final = {"symptoms": accu, "error_message": str(e)}
+            logging.error(traceback.format_exc())
+        sessions.save(session)
+
+        yield sse.SSEEncoder("final", EXTRACTION_MODEL).chunk(sse.dumps(final), finish_reason="stop")
+        logging.info("llm_stream_response: Sending final_metadata and [DONE]")
+        timings["total"] = _ms_since(started)
+        metadata["timings_ms"] = timings
+        yield sse.data(metadata)
+        yield sse.DONE
+    finally:
+        # Still pending only if the client went away before it was awaited.
+        _discard(speculative)
 
 
 @chat_router.post("/chat")
@@ -338,6 +540,6 @@ async def chat(request: Request, chat_request: ChatRequest):
         )
 
     return StreamingResponse(
-        llm_stream_response(chat_request, icd10),
+        _tracked(llm_stream_response(chat_request, icd10), "chat"),
         media_type="text/event-stream",
     )
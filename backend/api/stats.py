@@ -0,0 +1,43 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from api.chat import extraction_cache_stats, extractor_stats, ollama_lifecycle, sessions
+from api.transcribe import asr_pool, whisper_batcher, models as asr_models
+from utils import telemetry, tracing
+from utils.fast_path import fast_path
+from utils.predict import symptom_cache_stats
+
+# FastAPI Router
+stats_router = APIRouter()
+
+
+@stats_router.get("/stats")
+async def stats():
+    """Returns runtime counters (cache hit rates etc.) for this worker."""
+    return {
+        "process": telemetry.stats(),
+        "ollama": ollama_lifecycle.stats(),
+        "chat_sessions": sessions.stats(),
+        "chat_fast_path": fast_path.stats(),
+        "symptom_extractor": extractor_stats(),
+        "symptom_extraction_cache": extraction_cache_stats(),
+        "icd10_candidate_cache": symptom_cache_stats(),
+        "asr_models": asr_models.stats(),
+        "asr_pool": asr_pool.stats(),
+        "whisper_batching": whisper_batcher.stats(),
+    }
+
+
+@stats_router.get("/ready")
+async def ready():
+    """Readiness probe: 200 once the Ollama models are warm, 503 until then."""
+    status = ollama_lifecycle.stats()
+    if status["ready"]:
+        return {"status": "ready", **status}
+    return JSONResponse(status_code=503, content={"status": "warming", **status})
+
+
+@stats_router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage and request latency histograms in the Prometheus text format."""
+    return PlainTextResponse(tracing.render_metrics(), media_type="text/plain; version=0.0.4")
@@ -1,35 +1,94 @@
 import sys
 import os
 import json
-import wave
-import tempfile
+import zlib
+import asyncio
 import logging
 import traceback
 from io import BytesIO
+from typing import List, Tuple
+import numpy as np
 from dotenv import load_dotenv
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from faster_whisper import WhisperModel
-from utils.convert_to_wav import convert_to_wav_bytes
-from openai import AsyncOpenAI
-from vosk import Model as VoskModel, KaldiRecognizer  # type: ignore
+from fastapi import APIRouter, UploadFile, File, HTTPException, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from utils.asr_pool import ASRPool, PoolSaturated, concurrency_from_env
+from utils.batching import MicroBatcher
+from utils.convert_to_wav import SAMPLE_RATE, decode_audio, pcm_to_float32
+from utils.model_registry import ModelRegistry
+from utils.vad import SpeechGate, VADResult, split_speech
+from utils import tracing
 
 # Load environment variables
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)  # Debug logging enabled
 
+# Engines served by this deployment, e.g. ASR_ENGINES="vosk" on the smallest boxes.
+ASR_ENGINES = {
+    e.strip()
+    for e in os.getenv("ASR_ENGINES", "faster_whisper,vosk,openai").split(",")
+    if e.strip()
+}
+
+
+def _load_whisper():
+    from faster_whisper import WhisperModel
+    return WhisperModel("base.en", compute_type="int8", download_root="./models")
+
+
+def _load_vosk():
+    from vosk import Model as VoskModel  # type: ignore
+    return VoskModel("./models/vosk-model-small-en-us-0.15")
+
+
+# ASR models are loaded on first use and may be unloaded again when idle
+# or when the process grows past ASR_MEMORY_LIMIT_MB.
+models = ModelRegistry(
+    idle_unload_seconds=float(os.getenv("ASR_IDLE_UNLOAD_SECONDS", "0")),
+    memory_limit_mb=float(os.getenv("ASR_MEMORY_LIMIT_MB", "0")),
+)
+models.register("faster_whisper", _load_whisper, enabled="faster_whisper" in ASR_ENGINES)
+models.register("vosk", _load_vosk, enabled="vosk" in ASR_ENGINES)
+
+# Blocking ASR work (ffmpeg + decode) runs here, never on the event loop.
+asr_pool = ASRPool(
+    concurrency_from_env(["faster_whisper", "vosk"]),
+    max_queue=int(os.getenv("ASR_MAX_QUEUE", "4")),
+    retry_after_seconds=int(os.getenv("ASR_RETRY_AFTER_SECONDS", "2")),
+)
+
+# Opt-in: batched decoding skips WhisperModel.transcribe's temperature
+# fallback and no-speech checks (see _whisper_transcribe_batch).
+WHISPER_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "1"))
+WHISPER_BATCH_WAIT_MS = float(os.getenv("WHISPER_BATCH_WAIT_MS", "50"))
+WHISPER_WINDOW_SAMPLES = 30 * SAMPLE_RATE  # whisper's fixed input window
+# faster-whisper's own default: more repetitive output is re-decoded.
+WHISPER_COMPRESSION_RATIO_THRESHOLD = float(os.getenv("WHISPER_COMPRESSION_RATIO_THRESHOLD", "2.4"))
+
+# Load OpenAI API Key; the OpenAI endpoint answers 503 without it.
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+client = None
+if "openai" in ASR_ENGINES:
+    if OPENAI_API_KEY:
+        from openai import AsyncOpenAI
 
-whisper_model = WhisperModel("base.en", compute_type="int8", download_root="./models")
-# Load Vosk model if available
-vosk_model = VoskModel("./models/vosk-model-small-en-us-0.15")
+        # Initialize OpenAI Client (Async)
+        client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+    else:
+        logging.warning("OPENAI_API_KEY not set – /transcribe_openai_whisper is unavailable.")
+
+
+def _engine_unavailable(name: str) -> HTTPException:
+    return HTTPException(status_code=503, detail=f"ASR engine '{name}' is not enabled on this server.")
 
-# Load OpenAI API Key
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise ValueError("Missing OpenAI API key in environment variables.")
 
-# Initialize OpenAI Client (Async)
-client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+def _busy(e: PoolSaturated) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Transcription queue is full, please retry.",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
 
 # FastAPI Router
 transcribe_router = APIRouter()
@@ -40,15 +99,18 @@ async def transcribe_audio_openai(file: UploadFile = File(...)):
     """
     Accepts audio file and returns Whisper transcription without disk I/O.
     """
+    if client is None:
+        raise _engine_unavailable("openai")
     try:
         audio_bytes = await file.read()
 
         audio_buffer = BytesIO(audio_bytes)
         audio_buffer.name = file.filename  # Whisper API expects filename attribute
 
-        transcript = await client.audio.transcriptions.create(
-            model="whisper-1", file=audio_buffer, response_format="text", language="en"
-        )
+        with tracing.span("asr.openai"):
+            transcript = await client.audio.transcriptions.create(
+                model="whisper-1", file=audio_buffer, response_format="text", language="en"
+            )
 
         print(f"Transcription result: {transcript}")
 
@@ -61,124 +123,396 @@ async def transcribe_audio_openai(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail="Transcription failed.")
 
 
+def _speech(file_bytes: bytes) -> VADResult:
+    """Decode to 16 kHz PCM and keep only the speech, in ≤30 s chunks."""
+    samples = decode_audio(file_bytes)
+    with tracing.span("audio.vad"):
+        return split_speech(samples, max_chunk_seconds=WHISPER_WINDOW_SAMPLES / SAMPLE_RATE)
+
+
+def _whisper_decode(file_bytes: bytes) -> VADResult:
+    # Decode straight to 16 kHz float32 buffers – no WAV container, no temp file.
+    vad = _speech(file_bytes)
+    vad.chunks = [pcm_to_float32(chunk) for chunk in vad.chunks]
+    return vad
+
+
+@tracing.traced("asr.faster_whisper")
+def _whisper_transcribe(chunks: List[np.ndarray]) -> str:
+    """Blocking faster-whisper decode of a recording's speech; runs on the ASR pool."""
+    texts = []
+    # Segments decode lazily, so keep the model borrowed while iterating.
+    with models.use("faster_whisper") as whisper_model:
+        for chunk in chunks:
+            segments, _ = whisper_model.transcribe(chunk)
+            texts.extend(seg.text.strip() for seg in segments)
+    return " ".join(t for t in texts if t)
+
+
+def _compression_ratio(text: str) -> float:
+    data = text.encode("utf-8")
+    return len(data) / len(zlib.compress(data)) if data else 0.0
+
+
+def _whisper_transcribe_batch(audios: List[np.ndarray]) -> List[str]:
+    """Batched decode with the guards the raw decoder lacks.
+
+    A lone utterance goes through WhisperModel.transcribe; batched outputs
+    that look like repetition loops are decoded again the same way.
+    """
+    if len(audios) == 1:
+        return [_whisper_transcribe(audios)]
+    texts = _whisper_generate_batch(audios)
+    for i, text in enumerate(texts):
+        if _compression_ratio(text) > WHISPER_COMPRESSION_RATIO_THRESHOLD:
+            logging.info("Faster Whisper batch: item %d looks repetitive, re-decoding it alone", i)
+            texts[i] = _whisper_transcribe([audios[i]])
+    return texts
+
+
+@tracing.traced("asr.faster_whisper_batch")
+def _whisper_generate_batch(audios: List[np.ndarray]) -> List[str]:
+    """Decode several ≤30 s utterances as one CTranslate2 encoder/decoder batch."""
+    import ctranslate2
+    from faster_whisper.tokenizer import Tokenizer
+
+    with models.use("faster_whisper") as whisper_model:
+        extractor = whisper_model.feature_extractor
+        n_frames = extractor.nb_max_frames
+        features = []
+        for audio in audios:
+            window = np.zeros(WHISPER_WINDOW_SAMPLES, dtype=np.float32)
+            window[: len(audio)] = audio[:WHISPER_WINDOW_SAMPLES]
+            mel = extractor(window, padding=0)[:, :n_frames]
+            if mel.shape[1] < n_frames:
+                mel = np.pad(mel, ((0, 0), (0, n_frames - mel.shape[1])))
+            features.append(mel)
+
+        tokenizer = Tokenizer(
+            whisper_model.hf_tokenizer,
+            whisper_model.model.is_multilingual,
+            task="transcribe",
+            language="en",
+        )
+        prompt = [*tokenizer.sot_sequence, tokenizer.no_timestamps]
+        encoder_output = whisper_model.model.encode(
+            ctranslate2.StorageView.from_array(np.ascontiguousarray(np.stack(features), dtype=np.float32))
+        )
+        results = whisper_model.model.generate(
+            encoder_output,
+            [prompt] * len(audios),
+            beam_size=5,
+            max_length=whisper_model.max_length,
+            suppress_blank=True,
+            suppress_tokens=[-1],
+        )
+    return [
+        tokenizer.decode([t for t in r.sequences_ids[0] if t < tokenizer.eot]).strip()
+        for r in results
+    ]
+
+
+# Short utterances arriving within WHISPER_BATCH_WAIT_MS of each other are
+# decoded together; WHISPER_BATCH_SIZE=1 turns batching off.
+whisper_batcher = MicroBatcher(
+    _whisper_transcribe_batch,
+    runner=lambda call: asr_pool.call("faster_whisper", call),
+    max_batch_size=WHISPER_BATCH_SIZE,
+    max_wait_ms=WHISPER_BATCH_WAIT_MS,
+)
+
+
 @transcribe_router.post("/transcribe_faster_whisper")
-async def transcribe_audio(file: UploadFile = File(...)):
+async def transcribe_audio(response: Response, file: UploadFile = File(...)):
     """
     Accepts audio file and returns transcription using faster-whisper.
     """
+    if not models.enabled("faster_whisper"):
+        raise _engine_unavailable("faster_whisper")
+    try:
+        ticket = asr_pool.admit("faster_whisper")
+    except PoolSaturated as e:
+        raise _busy(e)
     try:
         # Read audio file bytes
         file_bytes = await file.read()
 
         print(f"Received file: {file.filename}, size: {len(file_bytes)} bytes")
 
-        # Convert to WAV using ffmpeg in memory
-        wav_bytes = convert_to_wav_bytes(file_bytes)
-
-        # Save to temporary file for model input
-        with tempfile.NamedTemporaryFile(suffix=".wav") as temp_wav:
-            temp_wav.write(wav_bytes)
-            temp_wav.flush()
-
-            segments, _ = whisper_model.transcribe(temp_wav.name)
-
-            # ---------------------- FIX START -------------------------
-            # Limit to first 5 unique segments to avoid repetitive output
-            unique_texts = []
-            for seg in segments:
-                if seg.text not in unique_texts:
-                    unique_texts.append(seg.text)
-                if len(unique_texts) >= 5:
-                    break
-
-            transcription = " ".join(unique_texts)
-            print("Faster Whisper transcription result:", transcription)
-            # ---------------------- FIX END ---------------------------
+        vad, decode = await asr_pool.timed_call("faster_whisper", _whisper_decode, file_bytes, ticket=ticket)
+        if not vad.chunks:
+            transcription, queue_ms, asr_ms = "", 0.0, 0.0
+        elif WHISPER_BATCH_SIZE > 1:
+            results = await asyncio.gather(*(whisper_batcher.submit(chunk, holder=ticket) for chunk in vad.chunks))
+            transcription = " ".join(r.value for r in results if r.value)
+            queue_ms = max(r.queue_ms for r in results)
+            asr_ms = max(r.run_ms for r in results)
+        else:
+            transcription, timing = await asr_pool.timed_call(
+                "faster_whisper", _whisper_transcribe, vad.chunks, ticket=ticket
+            )
+            queue_ms, asr_ms = timing.queue_ms, timing.run_ms
+        logging.info(
+            "Faster Whisper: %.1fs of speech, %.1fs of silence skipped",
+            vad.speech_seconds, vad.skipped_seconds,
+        )
 
-        return {"text": transcription}
+        response.headers["Server-Timing"] = (
+            f"decode;dur={decode.queue_ms + decode.run_ms:.1f}, "
+            f"queue;dur={queue_ms:.1f}, asr;dur={asr_ms:.1f}"
+        )
+        return {"text": transcription, "skipped_seconds": vad.skipped_seconds}
 
     except Exception as e:
         logging.error(f"Transcription failed: {e}")
         logging.error(traceback.format_exc())
         traceback.print_exc(file=sys.stdout)
         raise HTTPException(status_code=500, detail="Transcription failed.")
+    finally:
+        ticket.release()
 
 # ---------------------------------------------------------------------------
 # Vosk endpoint – tiny, fully offline.
 # ---------------------------------------------------------------------------
-@transcribe_router.post("/transcribe_vosk")
-async def transcribe_audio_vosk(file: UploadFile = File(...)):
-    """Transcribe audio with Vosk small model (offline)."""
-    try:
-        file_bytes = await file.read()
-        wav_bytes = convert_to_wav_bytes(file_bytes)
+def _vosk_frames(vad: VADResult):
+    # Feed 4000‑frame chunks (~0.25 s at 16 kHz) for latency balance.
+    for chunk in vad.chunks:
+        for start in range(0, len(chunk), 4000):
+            yield chunk[start:start + 4000].tobytes()
+
 
-        # Vosk expects streaming chunks; wrap BytesIO in wave reader.
-        wf = wave.open(BytesIO(wav_bytes), "rb")
-        if wf.getnchannels() != 1 or wf.getsampwidth() != 2:
-            raise HTTPException(status_code=400, detail="Audio must be mono 16‑bit PCM after conversion.")
+def _vosk_transcribe(file_bytes: bytes) -> Tuple[str, VADResult]:
+    """Blocking Vosk decode of the speech in a recording; runs on the ASR pool."""
+    from vosk import KaldiRecognizer  # type: ignore
 
-        recognizer = KaldiRecognizer(vosk_model, wf.getframerate())
+    vad = _speech(file_bytes)
+    if not vad.chunks:
+        return "", vad
+
+    with models.use("vosk") as vosk_model, tracing.span("asr.vosk"):
+        recognizer = KaldiRecognizer(vosk_model, SAMPLE_RATE)
         recognizer.SetWords(True)
 
-        # Read in 4000‑frame chunks (~0.25 s at 16 kHz) for latency balance.
-        while True:
-            data = wf.readframes(4000)
-            if len(data) == 0:
-                break
-            recognizer.AcceptWaveform(data)
-        result = json.loads(recognizer.FinalResult())
-        text = result.get("text", "")
-        logging.debug("Vosk transcription: %s", text)
-        return {"text": text}
+        texts = []
+        for frame in _vosk_frames(vad):
+            if recognizer.AcceptWaveform(frame):
+                texts.append(json.loads(recognizer.Result()).get("text", ""))
+        texts.append(json.loads(recognizer.FinalResult()).get("text", ""))
+    return " ".join(t for t in texts if t), vad
+
+
+@transcribe_router.post("/transcribe_vosk")
+async def transcribe_audio_vosk(response: Response, file: UploadFile = File(...)):
+    """Transcribe audio with Vosk small model (offline)."""
+    if not models.enabled("vosk"):
+        raise _engine_unavailable("vosk")
+    try:
+        file_bytes = await file.read()
+        (text, vad), timing = await asr_pool.run("vosk", _vosk_transcribe, file_bytes)
+        response.headers["Server-Timing"] = timing.server_timing()
+        logging.debug("Vosk transcription: %s (%.1fs skipped)", text, vad.skipped_seconds)
+        return {"text": text, "skipped_seconds": vad.skipped_seconds}
     except HTTPException:
         raise  # pass through
+    except PoolSaturated as e:
+        raise _busy(e)
     except Exception as e:
         logging.error("Vosk transcription failed: %s", e)
         logging.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail="Transcription failed.")
 
-from fastapi.responses import StreamingResponse
-import json
-
 
 @transcribe_router.post("/stream_transcribe_vosk")
 async def stream_transcribe_vosk(file: UploadFile = File(...)):
     logging.info("Received file: %s", file.filename)
+    if not models.enabled("vosk"):
+        raise _engine_unavailable("vosk")
+
+    try:
+        ticket = asr_pool.admit("vosk")
+    except PoolSaturated as e:
+        raise _busy(e)
 
     try:
-        from io import BytesIO
+        from vosk import KaldiRecognizer  # type: ignore
 
         file_bytes = await file.read()
-        wav_file = BytesIO(file_bytes)
-        wf = wave.open(wav_file, "rb")
-        
-        recognizer = KaldiRecognizer(vosk_model, wf.getframerate())
-        recognizer.SetWords(True)
+        vad = await asr_pool.call("vosk", _speech, file_bytes, ticket=ticket)
 
-        def stream():
-            chunk_count = 0
-            while True:
-                data = wf.readframes(4000)
-                if not data:
-                    break
-                chunk_count += 1
-                if recognizer.AcceptWaveform(data):
-                    text = json.loads(recognizer.Result()).get("text", "")
-                    logging.info(f"Chunk {chunk_count} → Final: {text}")
-                    yield f"data: {text}\\n\\n"
-                else:
-                    partial = json.loads(recognizer.PartialResult()).get("partial", "")
-                    if partial:
-                        logging.info(f"Chunk {chunk_count} → Partial: {partial}")
-                        yield f"data: {partial}\\n\\n"
+        # Load (if needed) on the ASR pool rather than the event loop.
+        await asr_pool.call("vosk", models.get, "vosk", ticket=ticket)
+    except Exception as e:
+        ticket.release()
+        logging.error("Transcription error: %s", str(e))
+        raise HTTPException(status_code=500, detail="Streaming failed")
 
-            final = json.loads(recognizer.FinalResult()).get("text", "")
-            logging.info("Final segment: %s", final)
-            yield f"data: {final}\\n\\n"
+    async def stream():
+        try:
+            with models.use("vosk") as vosk_model:
+                recognizer = KaldiRecognizer(vosk_model, SAMPLE_RATE)
+                recognizer.SetWords(True)
+
+                chunk_count = 0
+                for data in _vosk_frames(vad):
+                    chunk_count += 1
+                    if await asr_pool.call("vosk", recognizer.AcceptWaveform, data, ticket=ticket):
+                        text = json.loads(recognizer.Result()).get("text", "")
+                        logging.info(f"Chunk {chunk_count} → Final: {text}")
+                        yield f"data: {text}\n\n"
+                    else:
+                        partial = json.loads(recognizer.PartialResult()).get("partial", "")
+                        if partial:
+                            logging.info(f"Chunk {chunk_count} → Partial: {partial}")
+                            yield f"data: {partial}\n\n"
+
+                final = json.loads(await asr_pool.call("vosk", recognizer.FinalResult, ticket=ticket)).get("text", "")
+                logging.info("Final segment: %s", final)
+                yield f"data: {final}\n\n"
+                # Named event, so plain `onmessage` consumers are unaffected.
+                yield f"event: vad\ndata: {json.dumps({'skipped_seconds': vad.skipped_seconds})}\n\n"
+        finally:
+            ticket.release()
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
 
-        return StreamingResponse(stream(), media_type="text/event-stream")
 
+# ---------------------------------------------------------------------------
+# WebSocket endpoint – real-time Vosk transcription from the microphone.
+#
+# Client → server: binary frames of 16‑bit mono PCM at `sample_rate`
+#   (?format=pcm, default) or a WebM/Ogg Opus byte stream (?format=opus),
+#   then the text frame "eof" (or {"type": "eof"}) when the patient stops.
+# Server → client: JSON text frames
+#   {"type": "partial", "text": ...}  – hypothesis so far, sent on change
+#   {"type": "final", "text": ..., "endpoint": true}  – Vosk detected the
+#       end of an utterance; the text can be posted to /chat right away
+#   {"type": "final", "text": ..., "endpoint": false} – flushed on eof
+#   {"type": "vad", "skipped_seconds": ...} – silence not sent to Vosk,
+#       sent last before the socket closes
+# ---------------------------------------------------------------------------
+def _is_eof(text: str) -> bool:
+    text = text.strip()
+    if text.lower() == "eof":
+        return True
+    try:
+        return json.loads(text).get("type") == "eof"
+    except (ValueError, AttributeError):
+        return False
+
+
+async def _client_audio(websocket: WebSocket):
+    """Yield binary frames from the client until eof; raise WebSocketDisconnect if it goes away."""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            # Nothing left to flush to: skip the final result and the close.
+            raise WebSocketDisconnect(message.get("code", 1000))
+        if message.get("bytes"):
+            yield message["bytes"]
+        elif message.get("text") is not None and _is_eof(message["text"]):
+            return
+
+
+async def _decoded_opus(websocket: WebSocket, sample_rate: int):
+    """Decode a streamed Opus container to PCM with one ffmpeg per session."""
+    proc = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-loglevel", "error", "-i", "pipe:0",
+        "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(sample_rate), "pipe:1",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+
+    async def pump():
+        try:
+            async for chunk in _client_audio(websocket):
+                proc.stdin.write(chunk)
+                await proc.stdin.drain()
+        finally:
+            proc.stdin.close()
+
+    pump_task = asyncio.create_task(pump())
+    try:
+        while True:
+            data = await proc.stdout.read(8000)
+            if pump_task.done() and pump_task.exception() is not None:
+                raise pump_task.exception()  # the client went away; drop ffmpeg's tail
+            if not data:
+                break
+            yield data
+        await pump_task
+    finally:
+        if not pump_task.done():
+            pump_task.cancel()
+        if proc.returncode is None:
+            proc.kill()
+        await proc.wait()
+
+
+@transcribe_router.websocket("/ws/transcribe_vosk")
+async def websocket_transcribe_vosk(websocket: WebSocket, sample_rate: int = 16000, format: str = "pcm"):
+    await websocket.accept()
+    if not models.enabled("vosk"):
+        await websocket.close(code=1011, reason="ASR engine 'vosk' is not enabled on this server.")
+        return
+    if format not in ("pcm", "opus"):
+        await websocket.close(code=1003, reason="format must be 'pcm' or 'opus'")
+        return
+    try:
+        ticket = asr_pool.admit("vosk")
+    except PoolSaturated:
+        await websocket.close(code=1013, reason="Transcription queue is full, please retry.")
+        return
+
+    try:
+        from vosk import KaldiRecognizer  # type: ignore
+
+        await asr_pool.call("vosk", models.get, "vosk", ticket=ticket)
+        with models.use("vosk") as vosk_model:
+            recognizer = KaldiRecognizer(vosk_model, sample_rate)
+            recognizer.SetWords(True)
+
+            if format == "opus":
+                audio = _decoded_opus(websocket, sample_rate)
+            else:
+                audio = _client_audio(websocket)
+
+            # Silence beyond a short hangover is never fed to the recognizer.
+            gate = SpeechGate(sample_rate)
+            last_partial = ""
+            async for data in audio:
+                if not gate.accept(data):
+                    if gate.ended and last_partial:
+                        # Speech stopped without a Vosk endpoint; flush it.
+                        text = json.loads(await asr_pool.call("vosk", recognizer.FinalResult, ticket=ticket)).get("text", "")
+                        last_partial = ""
+                        if text:
+                            await websocket.send_json({"type": "final", "text": text, "endpoint": True})
+                    continue
+                if await asr_pool.call("vosk", recognizer.AcceptWaveform, data, ticket=ticket):
+                    text = json.loads(recognizer.Result()).get("text", "")
+                    last_partial = ""
+                    if text:
+                        await websocket.send_json({"type": "final", "text": text, "endpoint": True})
+                else:
+                    partial = json.loads(recognizer.PartialResult()).get("partial", "")
+                    if partial and partial != last_partial:
+                        last_partial = partial
+                        await websocket.send_json({"type": "partial", "text": partial})
+
+            final = json.loads(await asr_pool.call("vosk", recognizer.FinalResult, ticket=ticket)).get("text", "")
+            if final:
+                await websocket.send_json({"type": "final", "text": final, "endpoint": False})
+            await websocket.send_json({"type": "vad", "skipped_seconds": round(gate.skipped_seconds, 3)})
+        await websocket.close()
+    except WebSocketDisconnect:
+        logging.info("WebSocket transcription: client disconnected")
     except Exception as e:
-        logging.error("Transcription error: %s", str(e))
-        raise HTTPException(status_code=500, detail="Streaming failed")
+        logging.error("WebSocket transcription failed: %s", e)
+        logging.error(traceback.format_exc())
+        try:
+            await websocket.close(code=1011, reason="Streaming failed")
+        except RuntimeError:
+            pass
+    finally:
+        ticket.release()
@@ -0,0 +1,203 @@
+"""
+Microbenchmarks for the ICD-10 retrieval and mapping hot path.
+
+Covers index build and load, single-query and batched retrieval,
+`map_symptoms` / `final_session_specialty`, the memory held by the TF-IDF
+matrices, and the stages of importing `utils.predict` (measured in a fresh
+interpreter each round). Needs pytest-benchmark:
+
+    pip install pytest-benchmark
+    python -m pytest benchmarks/bench_predict.py --benchmark-only
+    python -m pytest benchmarks/bench_predict.py --benchmark-json=bench-predict.json
+
+``BENCH_ICD10_ROWS=100000`` runs the retrieval benchmarks against a
+synthetic corpus made by duplicating ``icd10_symptoms.csv`` (codes made
+unique, phrase order varied) to at least that many rows, to see how
+retrieval scales before more ICD-10 chapters are added.
+"""
+
+import os
+import csv
+import sys
+import json
+import random
+import subprocess
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from sklearn.preprocessing import normalize
+
+import utils.predict as predict
+from utils.icd10_index import ICD_CSV_PATH, build_index, load_index
+
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+SCALE_ROWS = int(os.getenv("BENCH_ICD10_ROWS", "0"))
+
+QUERIES = [
+    "chest pain", "sore throat", "shortness of breath", "fever", "dry cough",
+    "ear pain", "dizziness", "nausea", "palpitations", "headache",
+    "wheezing", "swollen ankles", "hoarse voice", "runny nose", "fatigue",
+]
+BATCH = (QUERIES * 5)[:64]
+
+
+def _nbytes(matrix) -> int:
+    return int(matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes)
+
+
+def scaled_csv(path: Path, rows: int, source: str = ICD_CSV_PATH) -> Path:
+    """Duplicate the ICD-10 CSV until it has at least ``rows`` rows."""
+    with open(source, newline="", encoding="utf-8") as f:
+        original = list(csv.DictReader(f))
+    rng = random.Random(0)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["icd10code", "symptoms"])
+        writer.writeheader()
+        copy = 0
+        written = 0
+        while written < max(rows, len(original)):
+            for row in original:
+                phrases = (row["symptoms"] or "").split(",")
+                if copy:
+                    rng.shuffle(phrases)
+                code = row["icd10code"] if not copy else f"{row['icd10code']}~{copy}"
+                writer.writerow({"icd10code": code, "symptoms": ",".join(phrases)})
+                written += 1
+            copy += 1
+    return path
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    """CSV path and row count of the corpus under test."""
+    if SCALE_ROWS <= 0:
+        return Path(ICD_CSV_PATH)
+    return scaled_csv(tmp_path_factory.mktemp("icd10") / "icd10_scaled.csv", SCALE_ROWS)
+
+
+@pytest.fixture(scope="module")
+def index(corpus, tmp_path_factory):
+    """Persisted, memory-mapped index of the corpus, as workers load it."""
+    if SCALE_ROWS <= 0:
+        return predict._INDEX
+    index_dir = str(tmp_path_factory.mktemp("icd10_index"))
+    build_index(str(corpus), index_dir)
+    return load_index(str(corpus), index_dir)
+
+
+@pytest.fixture
+def retrieval(index, monkeypatch):
+    """Point utils.predict at the index under test, with an empty candidate cache."""
+    rows = index.rows_for_prefixes(predict._ALLOWED_PREFIXES)
+    monkeypatch.setattr(predict, "_vectorizer", index.vectorizer)
+    monkeypatch.setattr(predict, "_allowed_codes", [index.codes[i] for i in rows])
+    monkeypatch.setattr(predict, "_ALLOWED_MATRIX", normalize(index.matrix[rows]))
+    monkeypatch.setattr(
+        predict, "_candidate_cache", predict.TieredCache("bench_candidates", maxsize=4096)
+    )
+    return index
+
+
+# ---------------------------------------------------------------------------
+# Index
+# ---------------------------------------------------------------------------
+def test_index_build(benchmark, corpus, tmp_path):
+    index = benchmark.pedantic(
+        build_index, args=(str(corpus), str(tmp_path)), rounds=3, iterations=1
+    )
+    benchmark.extra_info.update(
+        rows=index.matrix.shape[0], terms=index.matrix.shape[1], nnz=int(index.matrix.nnz)
+    )
+
+
+def test_index_load(benchmark, corpus, index, tmp_path):
+    index_dir = str(tmp_path)
+    build_index(str(corpus), index_dir)
+    benchmark(load_index, str(corpus), index_dir)
+
+
+def test_matrix_footprint(benchmark, retrieval):
+    """Bytes held by the full (memory-mapped) and allowed-chapter (in RAM) matrices."""
+    allowed = benchmark(lambda: normalize(retrieval.matrix[retrieval.rows_for_prefixes(predict._ALLOWED_PREFIXES)]))
+    benchmark.extra_info.update(
+        tfidf_matrix_bytes=_nbytes(retrieval.matrix),
+        allowed_matrix_bytes=_nbytes(allowed),
+        allowed_rows=allowed.shape[0],
+    )
+
+
+# ---------------------------------------------------------------------------
+# Retrieval and mapping
+# ---------------------------------------------------------------------------
+def test_single_query(benchmark, retrieval):
+    result = benchmark(predict.retrieve_icd10_filtered, "chest pain", 3)
+    assert result
+
+
+def test_batched_queries(benchmark, retrieval):
+    results = benchmark(predict.retrieve_icd10_batch, BATCH, 3)
+    assert len(results) == len(BATCH)
+    benchmark.extra_info["queries_per_round"] = len(BATCH)
+
+
+def test_map_symptoms_cold(benchmark, retrieval):
+    def cold():
+        predict._candidate_cache.clear()
+        return predict.map_symptoms(QUERIES[:5])
+
+    assert len(benchmark(cold)) == 5
+
+
+def test_map_symptoms_cached(benchmark, retrieval):
+    predict.map_symptoms(QUERIES[:5])
+    assert len(benchmark(predict.map_symptoms, QUERIES[:5])) == 5
+
+
+def test_final_session_specialty(benchmark, retrieval):
+    mapped = predict.map_symptoms(QUERIES)
+    assert benchmark(predict.final_session_specialty, mapped)
+
+
+# ---------------------------------------------------------------------------
+# Import
+# ---------------------------------------------------------------------------
+_IMPORT_STAGES = r"""
+import json, time
+stages = {}
+t = time.perf_counter()
+def mark(name):
+    global t
+    now = time.perf_counter()
+    stages[name] = round((now - t) * 1000, 3)
+    t = now
+import numpy, scipy.sparse; mark("numpy_scipy")
+import sklearn.feature_extraction.text, sklearn.preprocessing; mark("sklearn")
+import utils.cache; mark("utils_cache")
+from utils import icd10_index; mark("utils_icd10_index")
+icd10_index.file_sha256(icd10_index.ICD_CSV_PATH); mark("csv_sha256")
+icd10_index.load_or_build_index(); mark("index_load")
+import utils.predict; mark("utils_predict_module_body")
+print(json.dumps(stages))
+"""
+
+
+def import_stages() -> dict:
+    """Milliseconds per stage of importing utils.predict in a fresh interpreter.
+
+    The last stage loads the index a second time (module body), so it shows
+    what the module adds on top of an already-warm page cache.
+    """
+    out = subprocess.run(
+        [sys.executable, "-c", _IMPORT_STAGES],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def test_import_stages(benchmark):
+    stages = benchmark.pedantic(import_stages, rounds=3, iterations=1)
+    benchmark.extra_info.update(stages)
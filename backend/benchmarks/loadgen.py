@@ -0,0 +1,409 @@
+"""
+Load generator for /chat and the transcription endpoints.
+
+Replays the patient turns of ``evaluations/syntheticData.txt`` (one chat
+session per conversation) and the generated WAV corpus at a fixed
+concurrency, and reports per endpoint:
+
+* latency p50/p95/p99 (request sent → body complete),
+* time to first byte of the response body (first SSE frame for streams),
+* throughput and error count,
+* peak RSS of the server process while the endpoint was under load.
+
+By default the backend is started as a subprocess against the stub Ollama
+server (`benchmarks.stub_ollama`), so LLM timing is deterministic and
+results from different commits are comparable. Its persistent extraction
+and ICD-10 candidate caches are switched off, so every run starts cold
+instead of replaying answers cached by an earlier run. Transcription
+endpoints need the WAV corpus (``evaluations/tmp_xtts_wavs``, written by
+``evaluations/generate_conversation_corrected.py``); the run refuses to
+start without it. The JSON report records the git commit and the settings; ``--compare`` checks it against an
+earlier report and exits non-zero on a p95/throughput regression.
+
+    python -m benchmarks.loadgen --concurrency 4 --out bench.json
+    python -m benchmarks.loadgen --compare bench-main.json
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import threading
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+import psutil
+
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+EVALUATIONS_DIR = BACKEND_DIR.parent / "evaluations"
+TRANSCRIPT_FILE = EVALUATIONS_DIR / "syntheticData.txt"
+AUDIO_DIR = EVALUATIONS_DIR / "tmp_xtts_wavs"
+
+TRANSCRIBE_ENDPOINTS = (
+    "transcribe_vosk",
+    "stream_transcribe_vosk",
+    "transcribe_faster_whisper",
+    "transcribe_openai_whisper",
+)
+ENDPOINTS = ("chat",) + TRANSCRIBE_ENDPOINTS
+
+# SQLite cache tiers the backend would otherwise share across runs (24h TTL);
+# an empty path keeps them in memory only.
+DISK_CACHE_ENV = ("EXTRACTION_CACHE_PATH", "SYMPTOM_CACHE_PATH")
+
+# A new conversation starts with the doctor's opening question.
+_OPENING = re.compile(r"\b(brings|brought) you\b", re.IGNORECASE)
+_SPEAKER = re.compile(r"^([PD])[:;]\s*")
+
+
+# ---------------------------------------------------------------------------
+# Workload
+# ---------------------------------------------------------------------------
+def load_conversations(path: Path = TRANSCRIPT_FILE) -> List[List[str]]:
+    """Patient utterances, grouped by conversation."""
+    conversations: List[List[str]] = []
+    speaker, text = None, []
+
+    def flush():
+        if speaker == "P" and text and conversations:
+            conversations[-1].append(" ".join(text))
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            match = _SPEAKER.match(line)
+            if not match:
+                text.append(line)  # continuation of the previous turn
+                continue
+            flush()
+            speaker, text = match.group(1), [line[match.end():]]
+            if speaker == "D" and (_OPENING.search(text[0]) or not conversations):
+                conversations.append([])
+    flush()
+    return [c for c in conversations if c]
+
+
+def audio_files(directory: Path = AUDIO_DIR) -> List[Path]:
+    return sorted(Path(directory).glob("*.wav"))
+
+
+def missing_audio(endpoints: List[str], directory: Path) -> Optional[str]:
+    """Why the requested transcription endpoints cannot run, or None."""
+    wanted = [e for e in endpoints if e in TRANSCRIBE_ENDPOINTS]
+    if not wanted or audio_files(directory):
+        return None
+    return (
+        f"{', '.join(wanted)} need WAV files but {directory} has none. Generate them with "
+        "evaluations/generate_conversation_corrected.py, pass --audio-dir, or run --endpoints chat."
+    )
+
+
+@dataclass
+class Sample:
+    latency_ms: float
+    ttfb_ms: Optional[float]
+    ok: bool
+
+
+async def _timed_request(client: httpx.AsyncClient, method: str, url: str, on_line=None, **kwargs) -> Sample:
+    start = time.perf_counter()
+    ttfb = None
+    try:
+        async with client.stream(method, url, **kwargs) as response:
+            buffer = b""
+            async for raw in response.aiter_raw():
+                if ttfb is None and raw:
+                    ttfb = (time.perf_counter() - start) * 1000
+                if on_line is not None:
+                    buffer += raw
+                    *lines, buffer = buffer.split(b"\n")
+                    for line in lines:
+                        on_line(line)
+            ok = response.status_code < 400
+    except httpx.HTTPError:
+        ok = False
+    return Sample((time.perf_counter() - start) * 1000, ttfb, ok)
+
+
+async def run_chat(client: httpx.AsyncClient, conversations: List[List[str]], concurrency: int) -> List[Sample]:
+    """Each conversation is one session; ``concurrency`` sessions run at once."""
+    samples: List[Sample] = []
+    queue: asyncio.Queue = asyncio.Queue()
+    for conversation in conversations:
+        queue.put_nowait(conversation)
+
+    async def patient():
+        while not queue.empty():
+            turns = queue.get_nowait()
+            session: Dict[str, Any] = {}
+
+            def on_line(line: bytes):
+                if line.startswith(b"data: {") and b'"final_metadata"' in line:
+                    session["id"] = json.loads(line[len(b"data: "):])["session_id"]
+
+            for utterance in turns:
+                payload = {"messages": [{"role": "user", "content": utterance}], "session_id": session.get("id")}
+                samples.append(await _timed_request(client, "POST", "/chat", on_line=on_line, json=payload))
+
+    await asyncio.gather(*(patient() for _ in range(concurrency)))
+    return samples
+
+
+async def run_transcribe(
+    client: httpx.AsyncClient, endpoint: str, files: List[Path], concurrency: int
+) -> List[Sample]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def post(path: Path) -> Sample:
+        async with semaphore:
+            content = path.read_bytes()
+            return await _timed_request(
+                client, "POST", f"/{endpoint}", files={"file": (path.name, content, "audio/wav")}
+            )
+
+    return list(await asyncio.gather(*(post(p) for p in files)))
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+class RSSMonitor:
+    """Samples a process's RSS in a thread; ``peak_mb`` covers the with-block."""
+
+    def __init__(self, pid: Optional[int], interval: float = 0.05):
+        self.process = psutil.Process(pid) if pid else None
+        self.interval = interval
+        self.peak_mb: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> None:
+        try:
+            rss = sum(p.memory_info().rss for p in [self.process, *self.process.children(recursive=True)])
+        except psutil.Error:
+            return
+        self.peak_mb = max(self.peak_mb or 0.0, rss / (1024 * 1024))
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> "RSSMonitor":
+        if self.process is not None:
+            self._sample()
+            self._thread = threading.Thread(target=self._run, name="rss-monitor", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._sample()
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 2),
+        "p95": round(float(p95), 2),
+        "p99": round(float(p99), 2),
+        "mean": round(float(np.mean(values)), 2),
+        "max": round(float(np.max(values)), 2),
+    }
+
+
+def summarize(samples: List[Sample], duration_s: float, peak_rss_mb: Optional[float]) -> Dict[str, Any]:
+    ok = [s for s in samples if s.ok]
+    return {
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "duration_s": round(duration_s, 3),
+        "throughput_rps": round(len(ok) / duration_s, 3) if duration_s > 0 else None,
+        "latency_ms": percentiles([s.latency_ms for s in ok]),
+        "ttfb_ms": percentiles([s.ttfb_ms for s in ok if s.ttfb_ms is not None]),
+        "peak_rss_mb": round(peak_rss_mb, 1) if peak_rss_mb is not None else None,
+    }
+
+
+def git_info() -> Dict[str, Any]:
+    def git(*args):
+        try:
+            return subprocess.run(
+                ["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(status) if status is not None else None}
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Human-readable regressions of ``report`` against ``baseline``."""
+    problems = []
+    for name, current in report["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if not before:
+            continue
+        checks = [
+            ("latency p95", current["latency_ms"]["p95"], before["latency_ms"]["p95"], 1),
+            ("TTFB p95", current["ttfb_ms"]["p95"], before["ttfb_ms"]["p95"], 1),
+            ("throughput", current["throughput_rps"], before["throughput_rps"], -1),
+            ("peak RSS", current["peak_rss_mb"], before["peak_rss_mb"], 1),
+        ]
+        for label, now, then, sign in checks:
+            if now is None or not then:
+                continue
+            change = (now - then) / then
+            print(f"{name:28s} {label:12s} {then:10.1f} -> {now:10.1f} ({change:+.1%})")
+            if sign * change > max_regression:
+                problems.append(f"{name}: {label} {change:+.1%}")
+    return problems
+
+
+# ---------------------------------------------------------------------------
+# Server under test
+# ---------------------------------------------------------------------------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_backend(ollama_url: str, port: int, workers: int) -> subprocess.Popen:
+    env = {**os.environ, "OLLAMA_URL": ollama_url, "OLLAMA_WARMUP_RETRY_SECONDS": "0.5"}
+    env.update(dict.fromkeys(DISK_CACHE_ENV, ""))
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 180.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.5)
+    raise TimeoutError("backend did not become ready")
+
+
+async def run(args, client: httpx.AsyncClient, server_pid: Optional[int]) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for endpoint in args.endpoints:
+        if endpoint == "chat":
+            conversations = load_conversations(args.transcript)[: args.conversations]
+            job = run_chat(client, conversations, args.concurrency)
+        else:
+            files = audio_files(args.audio_dir)[: args.files]
+            job = run_transcribe(client, endpoint, files, args.concurrency)
+        with RSSMonitor(server_pid) as rss:
+            start = time.perf_counter()
+            samples = await job
+            duration = time.perf_counter() - start
+        results[endpoint] = summarize(samples, duration, rss.peak_mb)
+        print(f"{endpoint}: {json.dumps(results[endpoint])}", file=sys.stderr)
+    return results
+
+
+async def main(args) -> int:
+    problem = missing_audio(args.endpoints, args.audio_dir)
+    if problem:
+        print(f"loadgen: {problem}", file=sys.stderr)
+        return 2
+
+    stub = backend = None
+    base_url = args.base_url
+    try:
+        if base_url is None:
+            from benchmarks.stub_ollama import StubOllama
+
+            stub = StubOllama(ttft_ms=args.stub_ttft_ms, token_ms=args.stub_token_ms).start()
+            port = _free_port()
+            backend = start_backend(stub.url, port, args.workers)
+            base_url = f"http://127.0.0.1:{port}"
+
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            await wait_ready(client)
+            endpoints = await run(args, client, backend.pid if backend else args.server_pid)
+    finally:
+        if backend is not None:
+            backend.terminate()
+            backend.wait(timeout=30)
+        if stub is not None:
+            stub.stop()
+
+    report = {
+        "meta": {
+            "git": git_info(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "settings": {
+                "base_url": args.base_url or "local backend + stub Ollama",
+                "concurrency": args.concurrency,
+                "workers": args.workers,
+                "conversations": args.conversations,
+                "files": args.files,
+                "audio_dir": str(args.audio_dir),
+                "disk_caches": "off" if args.base_url is None else "as configured on the server",
+                "stub_ttft_ms": args.stub_ttft_ms,
+                "stub_token_ms": args.stub_token_ms,
+            },
+        },
+        "endpoints": endpoints,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        problems = compare(report, json.loads(Path(args.compare).read_text()), args.max_regression)
+        for problem in problems:
+            print(f"REGRESSION {problem}", file=sys.stderr)
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark /chat and the transcription endpoints.")
+    parser.add_argument("--base-url", help="Benchmark a running server instead of starting one")
+    parser.add_argument("--server-pid", type=int, help="PID to sample RSS from with --base-url")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=["chat", "transcribe_vosk"])
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the local backend")
+    parser.add_argument("--conversations", type=int, default=20, help="Conversations to replay (chat)")
+    parser.add_argument("--files", type=int, default=100, help="WAV files to post (transcription)")
+    parser.add_argument("--transcript", type=Path, default=TRANSCRIPT_FILE)
+    parser.add_argument("--audio-dir", type=Path, default=AUDIO_DIR)
+    parser.add_argument("--stub-ttft-ms", type=float, default=150.0)
+    parser.add_argument("--stub-token-ms", type=float, default=40.0)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--out", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="Earlier JSON report to check for regressions")
+    parser.add_argument("--max-regression", type=float, default=0.10, help="Allowed relative slowdown")
+    sys.exit(asyncio.run(main(parser.parse_args())))
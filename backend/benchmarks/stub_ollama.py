@@ -0,0 +1,159 @@
+"""
+Deterministic stand-in for the Ollama HTTP API, for load tests.
+
+Implements the calls the backend makes – ``/api/generate`` (warm-up),
+``/api/chat`` streamed and not, and ``/api/tags`` – with fixed timing: the
+first token after ``ttft_ms``, then one token every ``token_ms``. The first
+call for each model also waits ``load_ms`` and reports it as
+``load_duration``, like a cold model load; later calls report none. Symptom
+extraction requests (those with a ``format`` schema) are answered with the
+ICD-10 vocabulary phrases found in the last user message, so sessions
+reach the mapping stage the way they would with a real model. Every other
+chat gets a fixed clarification reply.
+
+Run standalone with:
+
+    python -m benchmarks.stub_ollama --port 11500 --ttft-ms 150 --token-ms 40
+"""
+
+import json
+import time
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+from utils.extractors import LexiconExtractor
+
+
+CLARIFY_REPLY = (
+    "Could you tell me a little more about your symptoms, when they started "
+    "and whether anything makes them better or worse?"
+)
+
+
+def _pieces(text: str, size: int = 4) -> List[str]:
+    """Token-sized pieces (Llama tokens average about four characters)."""
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+class StubOllama:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        ttft_ms: float = 150.0,
+        token_ms: float = 40.0,
+        load_ms: float = 0.0,
+    ):
+        self.ttft = ttft_ms / 1000
+        self.token = token_ms / 1000
+        self.load_ns = int(load_ms * 1e6)
+        self.lexicon = LexiconExtractor()
+        self.requests = 0
+        self._loaded = set()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reply_for(self, body: dict) -> str:
+        if body.get("format"):
+            user = [m["content"] for m in body.get("messages", []) if m.get("role") == "user"]
+            found = self.lexicon.analyse(user[-1] if user else "").symptoms
+            return json.dumps({"symptoms": [{"name": name} for name in found]})
+        return CLARIFY_REPLY
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, lines: List[dict], delays: List[float]) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for line, delay in zip(lines, delays):
+                        if delay:
+                            time.sleep(delay)
+                        data = json.dumps(line).encode() + b"\n"
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                        self.wfile.flush()
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True  # client hung up early (e.g. JSON object closed)
+
+            def do_GET(self):
+                if self.path != "/api/tags":
+                    self.send_error(404)
+                    return
+                self._send([{"models": []}], [0.0])
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                model = body.get("model", "stub")
+                with stub._lock:
+                    stub.requests += 1
+                    load_ns = 0 if model in stub._loaded else stub.load_ns
+                    stub._loaded.add(model)
+                load = load_ns / 1e9
+                base = {"model": model, "created_at": datetime.now(timezone.utc).isoformat()}
+                done = {"done": True, "done_reason": "stop", "load_duration": load_ns}
+                if self.path == "/api/generate":
+                    self._send([{**base, "response": "", **done}], [load])
+                    return
+                if self.path != "/api/chat":
+                    self.send_error(404)
+                    return
+                pieces = _pieces(stub.reply_for(body))
+                if not body.get("stream", True):
+                    message = {"role": "assistant", "content": "".join(pieces)}
+                    delay = load + stub.ttft + stub.token * (len(pieces) - 1)
+                    self._send([{**base, "message": message, **done}], [delay])
+                    return
+                lines = [
+                    {**base, "message": {"role": "assistant", "content": p}, "done": False} for p in pieces
+                ]
+                lines.append({**base, "message": {"role": "assistant", "content": ""}, **done})
+                self._send(lines, [load + stub.ttft] + [stub.token] * len(pieces))
+
+        return Handler
+
+    def start(self) -> "StubOllama":
+        self.lexicon.matcher  # build the automaton before the first timed request
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a deterministic fake Ollama API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--ttft-ms", type=float, default=150.0, help="Delay before the first token")
+    parser.add_argument("--token-ms", type=float, default=40.0, help="Delay between tokens")
+    parser.add_argument("--load-ms", type=float, default=0.0, help="Load time of each model's first call")
+    args = parser.parse_args()
+
+    stub = StubOllama(args.host, args.port, args.ttft_ms, args.token_ms, args.load_ms).start()
+    print(f"Stub Ollama listening on {stub.url}")
+    try:
+        stub._thread.join()
+    except KeyboardInterrupt:
+        stub.stop()
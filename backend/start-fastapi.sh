@@ -9,10 +9,17 @@ export OMP_NUM_THREADS=2
 export MKL_NUM_THREADS=2
 export NUMEXPR_NUM_THREADS=2
 
+# Load ASR models on demand; drop them when idle or when RSS nears the cap
+export ASR_IDLE_UNLOAD_SECONDS=${ASR_IDLE_UNLOAD_SECONDS:-600}
+export ASR_MEMORY_LIMIT_MB=${ASR_MEMORY_LIMIT_MB:-400}
+
 # Optional: log thread setting
 echo "[INFO] Using 2 threads for all compute libraries"
 echo "[INFO] Memory cap set to 500MB"
 
+# Build the ICD-10 index up front so workers only memory-map it
+python -m utils.icd10_index || echo "[WARN] ICD-10 index build failed; workers will fit in memory"
+
 # Restart loop
 while true; do
     echo "[INFO] Starting FastAPI app at $(date)"
@@ -0,0 +1,32 @@
+import pytest
+
+from utils import fhir
+from utils.cache import TieredCache
+
+
+@pytest.fixture(autouse=True)
+def fresh_extraction_cache(monkeypatch):
+    """Keep cached LLM extractions from leaking between tests."""
+    import api.chat as chat
+
+    cache = TieredCache("test_extractions", maxsize=64, namespace=chat.PROMPT_VERSION)
+    monkeypatch.setattr(chat, "_extraction_cache", cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def fresh_candidate_cache(monkeypatch):
+    """Memory-only ICD-10 candidate cache, so tests never touch the shared SQLite tier."""
+    import utils.predict as predict
+
+    cache = TieredCache(
+        "test_icd10_candidates", maxsize=256, namespace=predict._candidate_cache.namespace
+    )
+    monkeypatch.setattr(predict, "_candidate_cache", cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def strict_fhir(monkeypatch):
+    """Validate every FHIR resource the app builds against fhir.resources."""
+    monkeypatch.setattr(fhir, "FHIR_VALIDATE", True)
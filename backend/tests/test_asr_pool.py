@@ -0,0 +1,141 @@
+import io
+import asyncio
+import threading
+import wave
+
+import pytest
+from fastapi import Response
+from httpx import ASGITransport, AsyncClient
+
+from main import app
+from utils.asr_pool import ASRPool, PoolSaturated
+from utils.vad import VADResult
+
+
+@pytest.fixture
+def wav_upload():
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(16000)
+        wf.writeframes(b"\x00\x00" * 1600)
+    return {"file": ("test.wav", buffer.getvalue(), "audio/wav")}
+
+
+@pytest.mark.asyncio
+async def test_run_executes_off_the_event_loop():
+    pool = ASRPool({"vosk": 1})
+    name, timing = await pool.run("vosk", lambda: threading.current_thread().name)
+
+    assert name.startswith("asr-vosk")
+    assert timing.run_ms >= 0 and timing.queue_ms >= 0
+    assert "asr;dur=" in timing.server_timing()
+    assert pool.stats()["vosk"] == {"concurrency": 1, "outstanding": 0, "completed": 1, "rejected": 0}
+
+
+def test_admission_is_bounded_per_engine():
+    pool = ASRPool({"vosk": 1, "faster_whisper": 1}, max_queue=1, retry_after_seconds=7)
+    tickets = [pool.admit("vosk"), pool.admit("vosk")]
+
+    with pytest.raises(PoolSaturated) as exc:
+        pool.admit("vosk")
+    assert exc.value.retry_after == 7
+    pool.admit("faster_whisper").release()  # other engines are unaffected
+
+    tickets[0].release()
+    tickets[0].release()  # idempotent
+    pool.admit("vosk")
+    assert pool.stats()["vosk"]["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_saturated_engine_returns_503(monkeypatch, wav_upload):
+    import api.transcribe as transcribe
+
+    pool = ASRPool({"faster_whisper": 1, "vosk": 1}, max_queue=0, retry_after_seconds=3)
+    monkeypatch.setattr(transcribe, "asr_pool", pool)
+    monkeypatch.setattr(transcribe.models, "enabled", lambda name: True)
+    ticket = pool.admit("vosk")
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.post("/transcribe_vosk", files=wav_upload)
+    ticket.release()
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
+
+
+@pytest.mark.asyncio
+async def test_transcription_reports_server_timing(monkeypatch, wav_upload):
+    import api.transcribe as transcribe
+
+    monkeypatch.setattr(transcribe, "asr_pool", ASRPool({"faster_whisper": 1, "vosk": 1}))
+    monkeypatch.setattr(transcribe.models, "enabled", lambda name: True)
+    monkeypatch.setattr(
+        transcribe, "_vosk_transcribe", lambda data: ("hello", VADResult(total_seconds=2.0, speech_seconds=1.5))
+    )
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.post("/transcribe_vosk", files=wav_upload)
+
+    assert response.status_code == 200
+    assert response.json() == {"text": "hello", "skipped_seconds": 0.5}
+    assert response.headers["Server-Timing"].startswith("queue;dur=")
+
+
+@pytest.mark.asyncio
+async def test_ticket_stays_taken_until_held_work_finishes():
+    pool = ASRPool({"vosk": 1})
+    gate = threading.Event()
+    ticket = pool.admit("vosk")
+    call = asyncio.ensure_future(pool.call("vosk", gate.wait, 5, ticket=ticket))
+    await asyncio.sleep(0.01)
+
+    call.cancel()
+    ticket.release()
+    assert pool.stats()["vosk"]["outstanding"] == 1  # the decode is still running
+
+    gate.set()
+    await _until(lambda: pool.stats()["vosk"]["outstanding"] == 0)
+    assert pool.stats()["vosk"]["completed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_request_keeps_its_slot_until_the_decode_ends(monkeypatch):
+    import api.transcribe as transcribe
+
+    pool = ASRPool({"faster_whisper": 1, "vosk": 1})
+    started, gate = threading.Event(), threading.Event()
+
+    def slow_decode(data):
+        started.set()
+        gate.wait(5)
+        return VADResult(total_seconds=1.0)
+
+    class Upload:
+        filename = "a.wav"
+
+        async def read(self):
+            return b"audio"
+
+    monkeypatch.setattr(transcribe, "asr_pool", pool)
+    monkeypatch.setattr(transcribe.models, "enabled", lambda name: True)
+    monkeypatch.setattr(transcribe, "_whisper_decode", slow_decode)
+
+    request = asyncio.ensure_future(transcribe.transcribe_audio(Response(), Upload()))
+    await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+    request.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await request
+
+    assert pool.stats()["faster_whisper"]["outstanding"] == 1
+    gate.set()
+    await _until(lambda: pool.stats()["faster_whisper"]["outstanding"] == 0)
+
+
+async def _until(condition, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.005)
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+from utils.batching import MicroBatcher
+
+
+async def _inline(call):
+    return call()
+
+
+@pytest.mark.asyncio
+async def test_requests_within_window_share_a_batch():
+    seen = []
+
+    def batch_fn(items):
+        seen.append(list(items))
+        return [item.upper() for item in items]
+
+    batcher = MicroBatcher(batch_fn, runner=_inline, max_batch_size=4, max_wait_ms=20)
+    results = await asyncio.gather(*(batcher.submit(w) for w in ["a", "b", "c"]))
+
+    assert [r.value for r in results] == ["A", "B", "C"]
+    assert seen == [["a", "b", "c"]]
+    assert all(r.batch_size == 3 and r.queue_ms >= 0 for r in results)
+
+
+@pytest.mark.asyncio
+async def test_full_batches_are_dispatched_without_waiting():
+    batcher = MicroBatcher(lambda items: items, runner=_inline, max_batch_size=2, max_wait_ms=10_000)
+    results = await asyncio.wait_for(
+        asyncio.gather(*(batcher.submit(i) for i in range(4))), timeout=1
+    )
+
+    assert [r.value for r in results] == [0, 1, 2, 3]
+    stats = batcher.stats()
+    assert stats["batches"] == 2 and stats["items"] == 4
+    assert stats["batch_sizes"] == {2: 2}
+    assert stats["mean_fill"] == 1.0
+
+
+@pytest.mark.asyncio
+async def test_batch_errors_reach_every_caller():
+    def boom(items):
+        raise RuntimeError("decoder failed")
+
+    batcher = MicroBatcher(boom, runner=_inline, max_batch_size=4, max_wait_ms=5)
+    results = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_whisper_endpoint_batches_the_speech_chunks(monkeypatch):
+    import numpy as np
+    from httpx import ASGITransport, AsyncClient
+
+    import api.transcribe as transcribe
+    from main import app
+    from utils.vad import VADResult
+
+    speech = VADResult(
+        chunks=[np.zeros(16000, dtype=np.float32), np.ones(8000, dtype=np.float32)],
+        total_seconds=4.0,
+        speech_seconds=1.5,
+    )
+    monkeypatch.setattr(transcribe, "WHISPER_BATCH_SIZE", 4)
+    monkeypatch.setattr(transcribe.whisper_batcher, "max_batch_size", 4)
+    monkeypatch.setattr(transcribe.models, "enabled", lambda name: True)
+    monkeypatch.setattr(transcribe, "_whisper_decode", lambda data: speech)
+    monkeypatch.setattr(
+        transcribe.whisper_batcher, "batch_fn", lambda audios: [f"{len(a)} samples" for a in audios]
+    )
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.post("/transcribe_faster_whisper", files={"file": ("a.wav", b"RIFF", "audio/wav")})
+
+    assert response.status_code == 200
+    assert response.json() == {"text": "16000 samples 8000 samples", "skipped_seconds": 2.5}
+    assert "decode;dur=" in response.headers["Server-Timing"]
+
+
+@pytest.mark.asyncio
+async def test_holder_is_held_until_the_batch_finishes_even_if_cancelled():
+    from utils.asr_pool import ASRPool
+
+    pool = ASRPool({"faster_whisper": 1})
+    release_batch = asyncio.Event()
+
+    async def runner(call):
+        await release_batch.wait()
+        return call()
+
+    batcher = MicroBatcher(lambda items: items, runner=runner, max_batch_size=1, max_wait_ms=0)
+    ticket = pool.admit("faster_whisper")
+    caller = asyncio.ensure_future(batcher.submit("x", holder=ticket))
+    await asyncio.sleep(0.01)
+    caller.cancel()
+    ticket.release()
+    await asyncio.sleep(0.01)
+    assert pool.stats()["faster_whisper"]["outstanding"] == 1
+
+    release_batch.set()
+    await asyncio.sleep(0.01)
+    assert pool.stats()["faster_whisper"]["outstanding"] == 0
+
+
+def test_whisper_batches_keep_the_transcribe_guards(monkeypatch):
+    import api.transcribe as transcribe
+
+    single, batched = [], []
+    monkeypatch.setattr(transcribe, "_whisper_transcribe", lambda chunks: single.append(len(chunks)) or "guarded")
+    monkeypatch.setattr(
+        transcribe, "_whisper_generate_batch", lambda audios: batched.append(len(audios)) or ["fine", "la " * 40]
+    )
+
+    # A lone utterance is not sent through the raw batch decoder.
+    assert transcribe._whisper_transcribe_batch(["a"]) == ["guarded"]
+    assert batched == []
+
+    # A repetition loop in a batch is decoded again on its own.
+    assert transcribe._whisper_transcribe_batch(["a", "b"]) == ["fine", "guarded"]
+    assert batched == [2] and single == [1, 1]
+    assert transcribe.WHISPER_BATCH_SIZE == 1  # batching is opt-in
@@ -0,0 +1,114 @@
+from utils.cache import TieredCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = TieredCache("test", maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (3, 1, 1)
+    assert stats["size"] == 2
+
+
+def test_disk_tier_is_shared_and_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    first = TieredCache("test", maxsize=4, namespace="v1", disk_path=path)
+    first.set("headache", [["R51", 0.9]])
+
+    second = TieredCache("test", maxsize=4, namespace="v1", disk_path=path)
+    assert second.get("headache") == [["R51", 0.9]]
+    assert second.stats()["disk_hits"] == 1
+
+
+def test_namespace_change_invalidates_disk_tier(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    TieredCache("test", maxsize=4, namespace="v1", disk_path=path).set("fever", [["R50.9", 1.0]])
+
+    rebuilt = TieredCache("test", maxsize=4, namespace="v2", disk_path=path)
+    assert rebuilt.get("fever") is None
+
+
+def _rows(cache):
+    return [key for (key,) in cache._db.execute("SELECT key FROM entries ORDER BY key")]
+
+
+def test_disk_tier_is_bounded(tmp_path):
+    cache = TieredCache("test", maxsize=1, disk_path=str(tmp_path / "c.sqlite"), disk_maxsize=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+    assert _rows(cache) == ["c"]  # the overflow plus a batch of one slot
+    assert cache.stats()["disk_evictions"] == 2
+
+
+def test_disk_writes_count_rows_only_when_full(tmp_path):
+    cache = TieredCache("test", maxsize=1, disk_path=str(tmp_path / "c.sqlite"), disk_maxsize=32)
+    statements = []
+    cache._db.set_trace_callback(statements.append)
+    for i in range(32):
+        cache.set(f"k{i}", i)
+    assert not [s for s in statements if "COUNT" in s]
+
+    cache.set("k32", 32)
+    assert len([s for s in statements if "COUNT" in s]) == 1
+    assert len(_rows(cache)) == 32 - 32 // 16
+
+
+def test_disk_hits_are_written_back_in_batches(tmp_path, monkeypatch):
+    import utils.cache as cache_module
+
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    path = str(tmp_path / "c.sqlite")
+    writer = TieredCache("test", maxsize=1, disk_path=path, disk_maxsize=4)
+    for key in ("a", "b", "c", "d"):
+        now[0] += 1
+        writer.set(key, key)
+
+    reader = TieredCache("test", maxsize=1, disk_path=path, disk_maxsize=4)
+    statements = []
+    reader._db.set_trace_callback(statements.append)
+    now[0] += 1
+    assert reader.get("a") == "a"
+    assert not [s for s in statements if s.startswith("UPDATE")]
+
+    # Evicting writes the pending access time first, so "a" is kept.
+    now[0] += 1
+    reader.set("e", "e")
+    assert _rows(reader) == ["a", "d", "e"]
+
+
+def test_unwritable_disk_path_falls_back_to_memory(tmp_path):
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    cache = TieredCache("test", maxsize=2, disk_path=str(blocker / "cache" / "c.sqlite"))
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.stats()["disk"] is False
+
+
+def test_zero_size_disables_cache():
+    cache = TieredCache("test", maxsize=0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    import utils.cache as cache_module
+
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    path = str(tmp_path / "ttl.sqlite")
+    cache = TieredCache("test", maxsize=4, disk_path=path, ttl_seconds=60)
+    cache.set("yes", [])
+    assert cache.get("yes") == []
+
+    now[0] += 61
+    assert cache.get("yes") is None
+    assert TieredCache("test", maxsize=4, disk_path=path, ttl_seconds=60).get("yes") is None
+    assert cache.stats()["expired"] == 1
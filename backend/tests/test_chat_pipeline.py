@@ -0,0 +1,129 @@
+import gc
+import json
+import asyncio
+import threading
+
+import pytest
+from ollama import AsyncClient
+
+from benchmarks.stub_ollama import StubOllama
+from utils.ollama_lifecycle import OllamaLifecycle
+from utils.sessions import SessionStore
+from utils.types import ChatRequest
+
+
+async def _turn(chat, **request):
+    events = [e async for e in chat.llm_stream_response(ChatRequest(**request), {})]
+    payloads = [json.loads(e[len("data: "):]) for e in events if e != "data: [DONE]\n\n"]
+    metadata = next(p for p in payloads if p.get("type") == "final_metadata")
+    final = [p for p in payloads if p.get("id", "").startswith("chatcmpl-final")]
+    return metadata, json.loads(final[0]["choices"][0]["delta"]["content"]) if final else None
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    import api.chat as chat
+
+    mapped = []
+    mapping_started = threading.Event()
+
+    def fake_map(symptoms):
+        mapped.append(list(symptoms))
+        mapping_started.set()
+        return [
+            {"label": s, "icd10_candidates": [["R50", 1.0]], "icd10_code": "R50",
+             "similarity": 1.0, "specialty": "General / Internal Medicine"}
+            for s in symptoms
+        ]
+
+    async def fake_extract(messages, context_text=None):
+        # Earlier symptoms are mapped while extraction is still running.
+        if "fever" in context_text:
+            assert await asyncio.get_running_loop().run_in_executor(None, mapping_started.wait, 5)
+        return [n for n in ("cough", "fever", "headache") if n in messages[-1].content.lower()]
+
+    monkeypatch.setattr(chat, "map_symptoms", fake_map)
+    monkeypatch.setattr(chat, "FAST_PATH_ENABLED", False)
+    monkeypatch.setattr(chat, "sessions", SessionStore())
+    monkeypatch.setattr(chat.symptom_extractor, "extract", fake_extract)
+    return chat, mapped
+
+
+@pytest.mark.asyncio
+async def test_symptoms_are_mapped_once_per_session(pipeline):
+    chat, mapped = pipeline
+
+    metadata, final = await _turn(chat, messages=[{"role": "user", "content": "cough"}])
+    assert final is None and "extract" in metadata["timings_ms"]
+    sid = metadata["session_id"]
+
+    await _turn(chat, session_id=sid, messages=[{"role": "user", "content": "fever"}])
+    metadata, final = await _turn(chat, session_id=sid, messages=[{"role": "user", "content": "headache"}])
+
+    # "cough" and "fever" were mapped speculatively during later turns;
+    # only the new symptom is mapped once extraction returns.
+    assert mapped == [["cough"], ["fever"], ["headache"]]
+    assert [m["label"] for m in final["mappings"]] == ["cough", "fever", "headache"]
+    assert final["appointment"]["specialty"] == "General / Internal Medicine"
+    assert set(metadata["timings_ms"]) == {"extract", "map", "payload", "total"}
+
+    # A repeated final turn reuses every stored mapping.
+    await _turn(chat, session_id=sid, messages=[{"role": "user", "content": "still a cough"}])
+    assert len(mapped) == 3
+
+
+@pytest.mark.asyncio
+async def test_streamed_extraction_counts_cold_loads(monkeypatch):
+    import api.chat as chat
+
+    # The stream stops at the closing brace, before Ollama reports load_duration.
+    stub = StubOllama(ttft_ms=1, token_ms=0, load_ms=400).start()
+    try:
+        client = AsyncClient(host=stub.url)
+        lifecycle = OllamaLifecycle(client, models=[], cold_ttft_seconds=0.3)
+        monkeypatch.setattr(chat, "client", client)
+        monkeypatch.setattr(chat, "ollama_lifecycle", lifecycle)
+        monkeypatch.setattr(chat, "EXTRACTION_MODE", "stream")
+
+        for text in ("I have a cough", "and a fever"):
+            await chat.extract_symptoms_json([{"role": "user", "content": text}], "extract:1b")
+    finally:
+        stub.stop()
+
+    stats = lifecycle.stats()["models"]["extract:1b"]
+    assert stats["requests"] == 2
+    assert stats["cold_loads"] == 1
+    assert stats["load_seconds_max"] >= 0.4
+
+
+@pytest.mark.asyncio
+async def test_disconnect_at_the_first_chunk_keeps_the_turn(pipeline, monkeypatch, tmp_path):
+    chat, _ = pipeline
+    path = str(tmp_path / "sessions.sqlite")
+    monkeypatch.setattr(chat, "sessions", SessionStore(disk_path=path))
+    metadata, _ = await _turn(chat, messages=[{"role": "user", "content": "cough"}])
+    sid = metadata["session_id"]
+
+    def failing_map(symptoms):
+        raise RuntimeError("index unavailable")
+
+    monkeypatch.setattr(chat, "map_symptoms", failing_map)
+    loop = asyncio.get_running_loop()
+    errors = []
+    loop.set_exception_handler(lambda loop, context: errors.append(context))
+    try:
+        stream = chat.llm_stream_response(
+            ChatRequest(session_id=sid, messages=[{"role": "user", "content": "headache"}]), {}
+        )
+        await stream.__anext__()
+        await stream.aclose()  # the client hung up
+        await asyncio.sleep(0.05)
+        del stream
+        gc.collect()
+        await asyncio.sleep(0)
+    finally:
+        loop.set_exception_handler(None)
+
+    assert errors == []  # the failed speculative mapping was retrieved
+    session, is_new = SessionStore(disk_path=path).resume(sid)
+    assert not is_new and session.symptoms == ["cough", "headache"]
@@ -0,0 +1,60 @@
+import io
+import wave
+
+import numpy as np
+import pytest
+
+from utils import convert_to_wav
+from utils.convert_to_wav import decode_audio, pcm_to_float32
+
+
+def _wav(samples, rate=16000, channels=1):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(np.asarray(samples, dtype="<i2").tobytes())
+    return buffer.getvalue()
+
+
+class _RecordingDecoder:
+    def __init__(self):
+        self.calls = 0
+
+    def decode(self, file_bytes):
+        self.calls += 1
+        return np.zeros(4, dtype="<i2")
+
+
+@pytest.fixture
+def ffmpeg_decoder(monkeypatch):
+    decoder = _RecordingDecoder()
+    monkeypatch.setattr(convert_to_wav, "_decoder", decoder)
+    return decoder
+
+
+def test_16k_mono_wav_skips_ffmpeg(ffmpeg_decoder):
+    samples = np.array([0, 1000, -1000, 32767, -32768], dtype="<i2")
+    decoded = decode_audio(_wav(samples))
+
+    assert ffmpeg_decoder.calls == 0
+    assert decoded.dtype == np.int16
+    assert decoded.tolist() == samples.tolist()
+
+
+@pytest.mark.parametrize("wav", [_wav([0] * 8, rate=44100), _wav([0] * 8, channels=2)])
+def test_other_wavs_go_through_ffmpeg(ffmpeg_decoder, wav):
+    decode_audio(wav)
+    assert ffmpeg_decoder.calls == 1
+
+
+def test_non_wav_goes_through_ffmpeg(ffmpeg_decoder):
+    decode_audio(b"ID3\x03\x00not really an mp3")
+    assert ffmpeg_decoder.calls == 1
+
+
+def test_pcm_to_float32_range():
+    audio = pcm_to_float32(np.array([-32768, 0, 16384], dtype="<i2"))
+    assert audio.dtype == np.float32
+    assert audio.tolist() == [-1.0, 0.0, 0.5]
@@ -0,0 +1,142 @@
+from types import SimpleNamespace
+
+import pytest
+
+from utils.json_stream import JSONObjectScanner
+
+
+def _feed_all(pieces):
+    scanner = JSONObjectScanner()
+    for n, piece in enumerate(pieces):
+        end = scanner.feed(piece)
+        if end >= 0:
+            return n, end
+    return None
+
+
+def test_scanner_finds_the_closing_brace_across_chunks():
+    pieces = ['{"symptoms": [', '{"name": "sore', ' throat"}', "]}", "\n\n", "  "]
+    assert _feed_all(pieces) == (3, 2)
+
+
+def test_scanner_ignores_braces_inside_strings():
+    pieces = ['{"symptoms": [{"name": "pain } in \\"', 'ear\\" {"}]', "}\n"]
+    assert _feed_all(pieces) == (2, 1)
+
+
+def test_scanner_needs_an_opening_brace():
+    assert _feed_all(["  ", "\n"]) is None
+
+
+class _FakeStream:
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.consumed = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.consumed == len(self.pieces):
+            raise StopAsyncIteration
+        piece = self.pieces[self.consumed]
+        self.consumed += 1
+        return SimpleNamespace(
+            message=SimpleNamespace(content=piece), done=self.consumed == len(self.pieces), model="m"
+        )
+
+    async def aclose(self):
+        self.closed = True
+
+
+class _FakeOllama:
+    def __init__(self, pieces):
+        self.stream = _FakeStream(pieces)
+        self.calls = []
+
+    async def chat(self, **kwargs):
+        self.calls.append(kwargs)
+        if kwargs["stream"]:
+            return self.stream
+        return SimpleNamespace(message=SimpleNamespace(content="".join(self.stream.pieces)))
+
+
+PIECES = ['{"symptoms": [', '{"name": "cough"}', "]}", "\n", "\n", "\n", " ", " "]
+MESSAGES = [{"role": "user", "content": "I have a cough"}]
+
+
+@pytest.mark.asyncio
+async def test_streamed_extraction_stops_when_the_object_closes(monkeypatch):
+    import api.chat as chat
+
+    fake = _FakeOllama(PIECES)
+    monkeypatch.setattr(chat, "client", fake)
+    monkeypatch.setattr(chat, "EXTRACTION_MODE", "stream")
+
+    assert await chat.extract_symptoms_json(MESSAGES, "m") == ["cough"]
+    assert fake.stream.consumed == 3
+    assert fake.stream.closed
+
+
+@pytest.mark.asyncio
+async def test_single_call_extraction(monkeypatch):
+    import api.chat as chat
+
+    fake = _FakeOllama(PIECES)
+    monkeypatch.setattr(chat, "client", fake)
+    monkeypatch.setattr(chat, "EXTRACTION_MODE", "single")
+
+    assert await chat.extract_symptoms_json(MESSAGES, "m") == ["cough"]
+    assert [c["stream"] for c in fake.calls] == [False]
+
+
+@pytest.mark.asyncio
+async def test_invalid_or_hallucinated_output_yields_no_symptoms(monkeypatch):
+    import api.chat as chat
+
+    monkeypatch.setattr(chat, "EXTRACTION_MODE", "stream")
+    monkeypatch.setattr(chat, "client", _FakeOllama(['{"symptoms": [{"name": "fever"}]}']))
+    assert await chat.extract_symptoms_json(MESSAGES, "m") == []
+
+    monkeypatch.setattr(chat, "client", _FakeOllama(["not json"]))
+    assert await chat.extract_symptoms_json(MESSAGES, "m") == []
+
+
+@pytest.mark.asyncio
+async def test_repeated_turns_are_served_from_the_cache(monkeypatch, fresh_extraction_cache):
+    import api.chat as chat
+
+    fake = _FakeOllama(PIECES)
+    monkeypatch.setattr(chat, "client", fake)
+    monkeypatch.setattr(chat, "EXTRACTION_MODE", "single")
+
+    assert await chat.extract_symptoms_json(MESSAGES, "m") == ["cough"]
+    again = [{"role": "user", "content": "  I have a COUGH. "}]
+    assert await chat.extract_symptoms_json(again, "m") == ["cough"]
+    assert len(fake.calls) == 1
+    assert fresh_extraction_cache.stats()["hits"] == 1
+
+    # A different model is a different key.
+    await chat.extract_symptoms_json(MESSAGES, "other")
+    assert len(fake.calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_cached_names_are_filtered_against_the_new_wording(monkeypatch):
+    import api.chat as chat
+
+    monkeypatch.setattr(chat, "EXTRACTION_MODE", "single")
+    monkeypatch.setattr(chat, "client", _FakeOllama(['{"symptoms": [{"name": "cough"}]}']))
+    key = chat._extraction_key([{"role": "user", "content": "no"}], "m")
+    chat._extraction_cache.set(key, ["cough"])
+
+    assert await chat.extract_symptoms_json([{"role": "user", "content": "No"}], "m") == []
+
+
+def test_prompt_edit_changes_the_cache_key(monkeypatch):
+    import api.chat as chat
+
+    before = chat._extraction_key(MESSAGES, "m")
+    monkeypatch.setattr(chat, "PROMPT_VERSION", "edited")
+    assert chat._extraction_key(MESSAGES, "m") != before
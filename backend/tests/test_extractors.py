@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from utils.extractors import HybridExtractor, LexiconExtractor, LLMExtractor, PhraseMatcher, build_extractor
+from utils.types import ChatRequest
+
+VOCABULARY = frozenset({"pain", "chest pain", "sharp chest pain", "fever", "sore throat", "shortness of breath", "nausea"})
+
+
+def test_matcher_prefers_leftmost_longest_phrases():
+    matcher = PhraseMatcher(VOCABULARY)
+    tokens = "sharp chest pain and pain with shortness of breath".split()
+    assert [" ".join(tokens[s:e]) for s, e in matcher.find(tokens)] == [
+        "sharp chest pain", "pain", "shortness of breath",
+    ]
+
+
+def test_matcher_follows_failure_links():
+    matcher = PhraseMatcher({"a b c", "b c d"})
+    assert matcher.find("a b c d".split()) == [(0, 3)]
+    assert matcher.find("a b x b c d".split()) == [(3, 6)]
+
+
+@pytest.mark.parametrize("text, symptoms, negated", [
+    ("I have a sore throat and chest pain", ["sore throat", "chest pain"], []),
+    ("No fever but I have nausea", ["nausea"], ["fever"]),
+    ("I don't have a fever, nausea or chest pain", [], ["fever", "nausea", "chest pain"]),
+    ("Denies fever. Reports shortness of breath", ["shortness of breath"], ["fever"]),
+    ("my throat hurts", [], []),
+])
+def test_lexicon_extraction_with_negation(text, symptoms, negated):
+    result = LexiconExtractor(VOCABULARY).analyse(text)
+    assert result.symptoms == symptoms
+    assert result.negated == negated
+
+
+class _RecordingLLM:
+    def __init__(self, answer):
+        self.answer = answer
+        self.calls = 0
+
+    async def __call__(self, messages, context_text=None):
+        self.calls += 1
+        return self.answer
+
+
+@pytest.mark.asyncio
+async def test_hybrid_only_falls_back_when_the_lexicon_understood_nothing():
+    llm = _RecordingLLM(["ear ache"])
+    hybrid = HybridExtractor(LexiconExtractor(VOCABULARY), LLMExtractor(llm))
+
+    assert await hybrid.extract([{"role": "user", "content": "sore throat"}]) == ["sore throat"]
+    assert await hybrid.extract([{"role": "user", "content": "no fever"}]) == []
+    assert llm.calls == 0
+    assert await hybrid.extract([{"role": "user", "content": "my ear aches"}]) == ["ear ache"]
+    assert llm.calls == 1
+    assert hybrid.stats() == {"lexicon": 2, "llm_fallback": 1}
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        build_extractor("regex", llm_extract=_RecordingLLM([]))
+
+
+class _NoLLM:
+    async def chat(self, **kwargs):
+        raise AssertionError("the LLM should not be called")
+
+
+@pytest.mark.asyncio
+async def test_chat_runs_without_ollama_on_the_lexicon_engine(monkeypatch):
+    import api.chat as chat
+
+    monkeypatch.setattr(chat, "client", _NoLLM())
+    monkeypatch.setattr(chat, "FAST_PATH_ENABLED", False)
+    monkeypatch.setattr(chat, "symptom_extractor", LexiconExtractor(VOCABULARY))
+    request = ChatRequest(messages=[{"role": "user", "content": "Since Monday I have had a fever, no nausea"}])
+
+    events = [e async for e in chat.llm_stream_response(request, {})]
+
+    metadata = json.loads(events[1][len("data: "):])
+    assert metadata["accumulated_symptoms"] == ["fever"]
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from utils.fast_path import FastPath
+from utils.types import ChatRequest
+
+
+@pytest.fixture
+def classifier(tmp_path):
+    csv_path = tmp_path / "icd10_symptoms.csv"
+    csv_path.write_text(
+        "icd10code,symptoms\n"
+        'R07.0,"sore throat, fever"\n'
+        'R51,"headache, no pain, asymptomatic"\n'
+        'R05,"cough, chest pain"\n'
+    )
+    return FastPath(str(csv_path))
+
+
+@pytest.mark.parametrize("text, kind", [
+    ("hi", "greeting"),
+    ("Good morning!", "greeting"),
+    ("yes", "small_talk"),
+    ("Yes, absolutely.", "small_talk"),
+    ("No thanks", "small_talk"),
+    ("That's all", "small_talk"),
+])
+def test_small_talk_needs_no_llm(classifier, text, kind):
+    result = classifier.classify(text)
+    assert result.kind == kind
+    assert result.symptoms == []
+
+
+@pytest.mark.parametrize("text, symptoms", [
+    ("sore throat", ["sore throat"]),
+    ("I have a headache", ["headache"]),
+    ("I've got a bad cough and fever", ["cough", "fever"]),
+    ("headache, fever & chest pain", ["headache", "fever", "chest pain"]),
+])
+def test_bare_symptom_lists_use_the_icd10_vocabulary(classifier, text, symptoms):
+    result = classifier.classify(text)
+    assert result.kind == "symptoms"
+    assert result.symptoms == symptoms
+
+
+@pytest.mark.parametrize("text", [
+    "I have no fever",
+    "no pain",
+    "I had a headache last week",
+    "my son has a cough",
+    "I feel dizzy",
+    "asymptomatic",
+    "yes I have a headache that gets worse at night",
+])
+def test_anything_else_goes_to_the_llm(classifier, text):
+    assert classifier.classify(text) is None
+
+
+def test_short_circuit_counters(classifier):
+    for text in ("hi", "fever", "I have no fever"):
+        classifier.classify(text)
+    stats = classifier.stats()
+    assert (stats["turns"], stats["short_circuited"]) == (3, 2)
+    assert stats["greeting"] == stats["symptoms"] == 1
+
+
+class _NoLLM:
+    async def chat(self, **kwargs):
+        raise AssertionError("the LLM should not be called")
+
+
+@pytest.mark.asyncio
+async def test_chat_answers_trivial_turns_without_the_llm(monkeypatch):
+    import api.chat as chat
+
+    monkeypatch.setattr(chat, "client", _NoLLM())
+    request = ChatRequest(messages=[{"role": "user", "content": "I have a headache"}], accumulated_symptoms=["fever"])
+
+    events = [e async for e in chat.llm_stream_response(request, {})]
+
+    metadata = json.loads(events[1][len("data: "):])
+    assert metadata["type"] == "final_metadata"
+    assert metadata["accumulated_symptoms"] == ["fever", "headache"]
+    assert events[-1] == "data: [DONE]\n\n"
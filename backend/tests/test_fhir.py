@@ -0,0 +1,46 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fhir.resources.appointment import Appointment
+from fhir.resources.codeableconcept import CodeableConcept
+from fhir.resources.condition import Condition
+
+from utils import fhir
+
+
+# The pydantic construction the chat payload used to be built with.
+def _reference_condition(symptom_name):
+    return Condition.model_construct(
+        code=CodeableConcept.model_construct(text=symptom_name),
+        clinicalStatus={"text": "active"},
+        verificationStatus={"text": "unconfirmed"},
+    ).model_dump()
+
+
+def _reference_appointment(specialty, now):
+    return Appointment.model_construct(
+        status="proposed",
+        description=f"Appointment for {specialty}",
+        start=(now + timedelta(days=2)).strftime("%Y-%m-%dT%H:%M:%S+01:00"),
+        end=(now + timedelta(days=2, hours=1)).strftime("%Y-%m-%dT%H:%M:%S+01:00"),
+    ).model_dump()
+
+
+@pytest.mark.filterwarnings("ignore::UserWarning")
+@pytest.mark.parametrize("symptom", ["cough", "sore throat", 'ear "pain" – ünïcode'])
+def test_condition_json_is_byte_compatible(symptom):
+    assert json.dumps(fhir.condition(symptom)) == json.dumps(_reference_condition(symptom))
+
+
+def test_appointment_json_is_byte_compatible():
+    now = datetime(2024, 12, 31, 23, 30, 15)
+    resource = fhir.appointment("Otolaryngology (ENT)", now=now)
+    assert json.dumps(resource) == json.dumps(_reference_appointment("Otolaryngology (ENT)", now))
+    assert resource["start"] == "2025-01-02T23:30:15+01:00"
+
+
+def test_strict_mode_rejects_invalid_elements():
+    fhir.validate(fhir.condition("cough"))  # missing subject is tolerated
+    with pytest.raises(fhir.FHIRValidationError):
+        fhir.validate({"resourceType": "Appointment", "status": "proposed", "start": "next tuesday"})
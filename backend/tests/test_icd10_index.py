@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from utils.icd10_index import (
+    ICD_CSV_PATH,
+    IndexStaleError,
+    build_index,
+    load_index,
+    load_or_build_index,
+)
+
+
+@pytest.fixture
+def small_csv(tmp_path):
+    path = tmp_path / "icd10_symptoms.csv"
+    path.write_text(
+        "icd10code,symptoms\n"
+        'I20.9,"chest pain, shortness of breath"\n'
+        'J02.9,"sore throat, fever"\n'
+        'R51,"headache"\n'
+    )
+    return str(path)
+
+
+def test_load_matches_fitted_index(small_csv, tmp_path):
+    index_dir = str(tmp_path / "index")
+    built = build_index(small_csv, index_dir)
+    loaded = load_index(small_csv, index_dir)
+
+    assert loaded.codes == ["I20.9", "J02.9", "R51"]
+    assert loaded.fingerprint == built.fingerprint
+    assert (loaded.matrix != built.matrix).nnz == 0
+
+    query = ["chest pain", "fever and headache"]
+    diff = loaded.vectorizer.transform(query) - built.vectorizer.transform(query)
+    assert diff.nnz == 0 or abs(diff).max() == 0
+
+
+def test_rows_are_grouped_by_chapter(tmp_path):
+    csv = tmp_path / "icd10_symptoms.csv"
+    csv.write_text(
+        "icd10code,symptoms\n"
+        "R51,headache\n"
+        "I20.9,chest pain\n"
+        "R05,cough\n"
+        "I10,dizziness\n"
+    )
+    build_index(str(csv), str(tmp_path / "index"))
+    loaded = load_index(str(csv), str(tmp_path / "index"))
+
+    assert loaded.codes == ["I20.9", "I10", "R51", "R05"]
+    assert loaded.chapters == {"I": (0, 2), "R": (2, 4)}
+    assert loaded.rows_for_prefixes(["R"]).tolist() == [2, 3]
+    assert loaded.csv_rows.tolist() == [1, 3, 0, 2]
+    # Selections come back in CSV order: R05 is listed before I10.
+    assert loaded.rows_for_prefixes(["R0", "I1"]).tolist() == [3, 1]
+    assert loaded.rows_for_prefixes(["R", "I"]).tolist() == [2, 0, 3, 1]
+    assert loaded.rows_for_prefixes(["Z"]).tolist() == []
+
+
+def test_load_does_not_read_the_csv_with_pandas(small_csv, tmp_path, monkeypatch):
+    import pandas as pd
+
+    index_dir = str(tmp_path / "index")
+    build_index(small_csv, index_dir)
+
+    def refuse(*args, **kwargs):
+        raise AssertionError("load_index parsed the CSV")
+
+    monkeypatch.setattr(pd, "read_csv", refuse)
+    assert load_or_build_index(small_csv, index_dir).codes == ["I20.9", "J02.9", "R51"]
+
+
+def test_load_is_memory_mapped(small_csv, tmp_path):
+    index_dir = str(tmp_path / "index")
+    build_index(small_csv, index_dir)
+    loaded = load_index(small_csv, index_dir)
+
+    base = loaded.matrix.data
+    while not isinstance(base, np.memmap) and getattr(base, "base", None) is not None:
+        base = base.base
+    assert isinstance(base, np.memmap)
+
+
+def test_stale_index_is_rejected_and_rebuilt(small_csv, tmp_path):
+    index_dir = str(tmp_path / "index")
+    build_index(small_csv, index_dir)
+
+    with open(small_csv, "a") as f:
+        f.write('R05,"cough"\n')
+
+    with pytest.raises(IndexStaleError):
+        load_index(small_csv, index_dir)
+
+    rebuilt = load_or_build_index(small_csv, index_dir)
+    assert rebuilt.codes[-1] == "R05"
+    assert len(list((tmp_path / "index").iterdir())) == 1
+
+
+def test_repository_csv_builds(tmp_path):
+    index = build_index(ICD_CSV_PATH, str(tmp_path / "index"))
+    assert index.matrix.shape[0] == len(index.codes)
@@ -0,0 +1,76 @@
+import httpx
+import pytest
+from ollama import AsyncClient
+
+from benchmarks import loadgen
+from benchmarks.loadgen import Sample, compare, load_conversations, missing_audio, run_chat, summarize
+from benchmarks.stub_ollama import StubOllama
+from utils.sessions import SessionStore
+
+
+def test_conversations_are_split_at_the_opening_question(tmp_path):
+    transcript = tmp_path / "t.txt"
+    transcript.write_text(
+        "D: What brought you in today?\n"
+        "P: I have a sore throat\n"
+        "and a cough.\n"
+        "D; Anything else?\n"
+        "P: No.\n"
+        "D: Hi, what brings you to clinic today?\n"
+        "P: Earache.\n"
+    )
+    assert load_conversations(transcript) == [["I have a sore throat and a cough.", "No."], ["Earache."]]
+
+
+def test_backend_runs_without_the_persistent_caches(monkeypatch):
+    launched = {}
+    monkeypatch.setenv("SYMPTOM_CACHE_PATH", "/var/cache/voicemedi/icd10.sqlite")
+    monkeypatch.setattr(loadgen.subprocess, "Popen", lambda cmd, **kwargs: launched.update(kwargs))
+    loadgen.start_backend("http://stub", 8123, 1)
+
+    assert {k: launched["env"][k] for k in loadgen.DISK_CACHE_ENV} == {
+        "EXTRACTION_CACHE_PATH": "", "SYMPTOM_CACHE_PATH": ""
+    }
+
+
+def test_transcription_without_audio_is_refused(tmp_path):
+    problem = missing_audio(["chat", "transcribe_vosk"], tmp_path)
+    assert "transcribe_vosk" in problem and str(tmp_path) in problem
+    assert missing_audio(["chat"], tmp_path) is None
+
+    (tmp_path / "a.wav").write_bytes(b"")
+    assert missing_audio(["transcribe_vosk"], tmp_path) is None
+
+
+def test_summary_and_regression_check():
+    samples = [Sample(float(ms), ms / 2, True) for ms in range(1, 101)] + [Sample(5000.0, None, False)]
+    summary = summarize(samples, duration_s=2.0, peak_rss_mb=180.04)
+    assert summary["requests"] == 101 and summary["errors"] == 1
+    assert summary["throughput_rps"] == 50.0
+    assert summary["latency_ms"]["p50"] == pytest.approx(50.5)
+    assert summary["peak_rss_mb"] == 180.0
+
+    slower = {**summary, "latency_ms": {**summary["latency_ms"], "p95": summary["latency_ms"]["p95"] * 1.5}}
+    baseline = {"endpoints": {"chat": summary}}
+    assert compare({"endpoints": {"chat": summary}}, baseline, 0.1) == []
+    assert compare({"endpoints": {"chat": slower}}, baseline, 0.1) == ["chat: latency p95 +50.0%"]
+
+
+@pytest.mark.asyncio
+async def test_chat_replay_against_the_stub_ollama(monkeypatch):
+    import api.chat as chat
+    from api import create_app
+
+    stub = StubOllama(ttft_ms=1, token_ms=0).start()
+    try:
+        monkeypatch.setattr(chat, "client", AsyncClient(host=stub.url))
+        monkeypatch.setattr(chat, "FAST_PATH_ENABLED", False)
+        monkeypatch.setattr(chat, "sessions", SessionStore())
+        transport = httpx.ASGITransport(app=create_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            samples = await run_chat(client, [["I have a cough", "and a fever"], ["sore throat"]], concurrency=2)
+    finally:
+        stub.stop()
+
+    assert len(samples) == 3 and all(s.ok and s.ttfb_ms is not None for s in samples)
+    assert chat.sessions.stats()["resumed"] == 1  # the second turn reused the session
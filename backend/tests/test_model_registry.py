@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+from utils.model_registry import EngineDisabled, ModelRegistry
+
+
+def test_models_load_lazily_once():
+    calls = []
+    registry = ModelRegistry()
+    registry.register("fake", lambda: calls.append(1) or object())
+
+    assert calls == []
+    first = registry.get("fake")
+    assert registry.get("fake") is first
+    assert calls == [1]
+
+    stats = registry.stats()["fake"]
+    assert stats["loaded"] and stats["loads"] == 1
+    assert stats["load_seconds"] is not None and stats["resident_mb"] is not None
+
+
+def test_disabled_engine_is_never_loaded():
+    registry = ModelRegistry()
+    registry.register("whisper", lambda: pytest.fail("loader called"), enabled=False)
+
+    assert not registry.enabled("whisper")
+    with pytest.raises(EngineDisabled):
+        registry.get("whisper")
+    with pytest.raises(EngineDisabled):
+        registry.get("unknown")
+
+
+def test_idle_models_are_unloaded_but_not_while_in_use():
+    registry = ModelRegistry(idle_unload_seconds=0.01, reap_interval_seconds=3600)
+    registry.register("fake", object)
+
+    with registry.use("fake"):
+        time.sleep(0.02)
+        assert registry.unload_idle() == []
+
+    time.sleep(0.02)
+    assert registry.unload_idle() == ["fake"]
+    assert not registry.stats()["fake"]["loaded"]
+
+    registry.get("fake")
+    assert registry.stats()["fake"]["loads"] == 2
+
+
+def test_memory_pressure_unloads_least_recently_used_first():
+    registry = ModelRegistry(memory_limit_mb=1, reap_interval_seconds=3600)
+    registry.register("old", object)
+    registry.register("new", object)
+    registry.get("old")
+    registry.get("new")
+
+    assert registry.unload_idle() == ["old", "new"]
@@ -0,0 +1,125 @@
+import json
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+from ollama import AsyncClient
+
+from utils.ollama_lifecycle import OllamaLifecycle, client_options, keep_alive_from_env
+
+
+class _FakeOllama(BaseHTTPRequestHandler):
+    """Just enough of the Ollama HTTP API: /api/generate and streamed /api/chat."""
+
+    requests: list = []
+    failures_left = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        type(self).requests.append((self.path, body))
+        if type(self).failures_left > 0:
+            type(self).failures_left -= 1
+            self.send_response(503)
+            self.end_headers()
+            self.wfile.write(b'{"error": "loading"}')
+            return
+        base = {"model": body["model"], "created_at": "2024-01-01T00:00:00Z"}
+        if self.path == "/api/generate":
+            lines = [{**base, "response": "", "done": True, "load_duration": 1_500_000_000}]
+        else:
+            lines = [
+                {**base, "message": {"role": "assistant", "content": "Hi"}, "done": False},
+                {**base, "message": {"role": "assistant", "content": ""}, "done": True, "load_duration": 1000},
+            ]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        self.wfile.write(b"".join(json.dumps(line).encode() + b"\n" for line in lines))
+
+
+@pytest.fixture
+def ollama_server():
+    _FakeOllama.requests = []
+    _FakeOllama.failures_left = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeOllama)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.asyncio
+async def test_warm_up_loads_every_model_with_keep_alive(ollama_server):
+    client = AsyncClient(host=ollama_server, **client_options())
+    lifecycle = OllamaLifecycle(client, ["extract:1b", "fallback:1b", "extract:1b"], keep_alive=-1)
+    assert not lifecycle.ready
+
+    await lifecycle.warm_up()
+
+    assert lifecycle.ready
+    paths = [(path, body["model"], body["keep_alive"]) for path, body in _FakeOllama.requests]
+    assert paths == [
+        ("/api/generate", "extract:1b", -1),
+        ("/api/chat", "extract:1b", -1),
+        ("/api/generate", "fallback:1b", -1),
+        ("/api/chat", "fallback:1b", -1),
+    ]
+    model = lifecycle.stats()["models"]["extract:1b"]
+    assert model["warmup_load_seconds"] == pytest.approx(1.5)
+    assert model["warmup_ttft_ms"] is not None
+
+
+@pytest.mark.asyncio
+async def test_warm_up_retries_until_ollama_answers(ollama_server):
+    _FakeOllama.failures_left = 2
+    lifecycle = OllamaLifecycle(AsyncClient(host=ollama_server), ["m"], retry_seconds=0.01)
+    lifecycle.start()
+    await asyncio.wait_for(lifecycle._task, timeout=5)
+    assert lifecycle.ready
+    assert lifecycle.stats()["models"]["m"]["last_error"] is None
+    await lifecycle.stop()
+
+
+def test_request_metrics_flag_cold_loads():
+    lifecycle = OllamaLifecycle(client=None, models=[])
+    assert lifecycle.ready  # nothing to warm (lexicon-only deployments)
+    lifecycle.record_ttft("m", 0.2)
+    lifecycle.record_ttft("m", 0.4)
+    lifecycle.record_load("m", 2_000_000_000)
+    lifecycle.record_load("m", 1_000)
+    stats = lifecycle.stats()["models"]["m"]
+    assert stats["requests"] == 2
+    assert stats["ttft_ms_mean"] == pytest.approx(300)
+    assert stats["cold_loads"] == 1
+
+
+def test_keep_alive_and_pool_come_from_env(monkeypatch):
+    monkeypatch.setenv("OLLAMA_KEEP_ALIVE", "-1")
+    assert keep_alive_from_env() == -1
+    monkeypatch.setenv("OLLAMA_KEEP_ALIVE", "30m")
+    assert keep_alive_from_env() == "30m"
+    monkeypatch.setenv("OLLAMA_MAX_CONNECTIONS", "3")
+    assert client_options()["limits"].max_connections == 3
+
+
+@pytest.mark.asyncio
+async def test_ready_endpoint_reports_warm_up(monkeypatch):
+    import api.stats as stats_api
+    from api import create_app
+
+    lifecycle = OllamaLifecycle(client=None, models=["m"])
+    monkeypatch.setattr(stats_api, "ollama_lifecycle", lifecycle)
+    transport = httpx.ASGITransport(app=create_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        response = await http.get("/ready")
+        assert response.status_code == 503 and response.json()["status"] == "warming"
+
+        lifecycle._models["m"].warm = True
+        response = await http.get("/ready")
+        assert response.status_code == 200 and response.json()["status"] == "ready"
@@ -0,0 +1,110 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from utils import predict
+from utils.icd10_index import ICD_CSV_PATH
+from utils.predict import (
+    _top_k_rows,
+    clean_symptom,
+    map_symptoms,
+    retrieve_icd10_batch,
+    retrieve_icd10_filtered,
+)
+
+
+@lru_cache(maxsize=None)
+def _csv_tfidf():
+    df = pd.read_csv(ICD_CSV_PATH)
+    vectorizer = TfidfVectorizer()
+    return vectorizer, vectorizer.fit_transform(df["symptoms"].fillna("").tolist()), df["icd10code"].tolist()
+
+
+def _reference(query, top_k):
+    """The pre-index algorithm, independent of utils.predict and the persisted index.
+
+    TF-IDF fitted on the CSV as listed, cosine against every row, full sort,
+    then filter by prefix. Ties go to the earlier CSV row and zero scores are
+    not matches.
+    """
+    vectorizer, matrix, codes = _csv_tfidf()
+    sims = cosine_similarity(vectorizer.transform([query]), matrix).ravel()
+    results = []
+    for i in np.argsort(-sims, kind="stable"):
+        if sims[i] <= 0 or len(results) == top_k:
+            break
+        if codes[i].startswith(predict._ALLOWED_PREFIXES):
+            results.append((codes[i], float(sims[i])))
+    return results
+
+
+# "shortness of breath", "fever", "cough" and "fatigue" have tied scores in their top 3.
+QUERIES = [
+    "chest pain", "headache", "sore throat and fever", "shortness of breath",
+    "fever", "cough", "fatigue", "wheezing", "xyzzy", "",
+]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_retrieve_matches_brute_force(query):
+    results = retrieve_icd10_filtered(query, top_k=5)
+    expected = _reference(query, 5)
+
+    assert [code for code, _ in results] == [code for code, _ in expected]
+    assert np.allclose([s for _, s in results], [s for _, s in expected])
+    assert all(code.startswith(predict._ALLOWED_PREFIXES) for code, _ in results)
+
+
+def test_reference_queries_cover_ties_and_no_overlap():
+    tied = _reference("shortness of breath", 3)
+    assert len({round(score, 12) for _, score in tied}) == 1
+    assert _reference("xyzzy", 3) == _reference("", 3) == []
+
+
+def test_no_overlap_falls_back_to_r99():
+    assert retrieve_icd10_filtered("xyzzy") == []
+    mapped = map_symptoms(["xyzzy", ""])
+    assert [m["icd10_code"] for m in mapped] == ["R99", "R99"]
+    assert mapped[0]["icd10_candidates"] == [("R99", 0.0)]
+
+
+def test_top_k_rows_breaks_ties_by_index():
+    scores = np.array([
+        [0.1, 0.5, 0.5, 0.9, 0.5, 0.0],
+        [0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
+    ])
+    rows, cols = _top_k_rows(scores, 3)
+    assert rows.tolist() == [0, 0, 0, 1, 1, 1]
+    assert cols.tolist() == [3, 1, 2, 0, 1, 2]
+
+    rows, cols = _top_k_rows(scores[:1], 10)
+    assert cols.tolist() == [3, 1, 2, 4, 0, 5]
+
+
+def test_batch_matches_per_query_loop():
+    symptoms = ["Chest pain", "headache!", "sore throat", "fever", "xyzzy", "shortness of breath", "?"]
+    cleaned = [clean_symptom(s) for s in symptoms]
+    expected = [_reference(q, 3) for q in cleaned]
+
+    batch = retrieve_icd10_batch(cleaned, top_k=3)
+    assert batch == [retrieve_icd10_filtered(q, top_k=3) for q in cleaned]
+    assert [[code for code, _ in r] for r in batch] == [[code for code, _ in r] for r in expected]
+
+    mapped = map_symptoms(symptoms)
+    assert [[code for code, _ in m["icd10_candidates"]] for m in mapped] == [
+        [code for code, _ in r] or ["R99"] for r in expected
+    ]
+    assert map_symptoms([]) == []
+
+
+def test_map_symptoms_reuses_cached_candidates():
+    first = map_symptoms(["Headache", "headache", "chest pain"])
+    before = predict.symptom_cache_stats()
+    second = map_symptoms(["headache"])
+
+    assert second[0]["icd10_candidates"] == first[0]["icd10_candidates"]
+    assert predict.symptom_cache_stats()["hits"] == before["hits"] + 1
@@ -0,0 +1,113 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from utils import profiling
+
+
+@pytest.fixture
+def profiles(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "s3cret")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling, "PROFILE_INTERVAL_MS", 1)
+    return tmp_path
+
+
+def _busy_wait(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def _app():
+    app = FastAPI()
+    app.add_middleware(profiling.ProfilingMiddleware)
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="asr-vosk")
+
+    @app.post("/transcribe_vosk")
+    async def transcribe():
+        _busy_wait(0.03)
+        await asyncio.get_running_loop().run_in_executor(executor, _busy_wait, 0.05)
+        return {"text": "ok"}
+
+    @app.get("/stats")
+    async def stats():
+        return {}
+
+    return app
+
+
+async def _post(path, **kwargs):
+    async with AsyncClient(transport=ASGITransport(app=_app()), base_url="http://test") as client:
+        return await client.post(path, **kwargs)
+
+
+def test_sampler_records_loop_and_worker_stacks():
+    worker = threading.Thread(target=_busy_wait, args=(0.05,), name="asr-sampled_0")
+    profiler = profiling.SamplingProfiler(
+        threading.get_ident(), interval_ms=1, worker_prefixes=("asr-sampled",)
+    ).start()
+    worker.start()
+    _busy_wait(0.05)
+    worker.join()
+    profiler.stop()
+
+    roots = {stack.split(";", 1)[0] for stack in profiler.stacks}
+    assert roots == {"event-loop", "asr-sampled_0"}
+    worker_stacks = [s for s in profiler.stacks if s.startswith("asr-")]
+    assert any(s.rsplit(";", 1)[-1].startswith("_busy_wait (test_profiling.py:") for s in worker_stacks)
+    for line in profiler.collapsed().splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0 and ";" in stack
+
+
+@pytest.mark.asyncio
+async def test_token_header_profiles_the_request(profiles):
+    response = await _post("/transcribe_vosk", headers={"X-Profile": "s3cret"})
+
+    assert response.json() == {"text": "ok"}
+    written = profiles / f"{response.headers['x-profile-id']}.folded"
+    folded = written.read_text()
+    assert "\nasr-vosk_0;" in "\n" + folded
+    assert "event-loop;" in folded and "_busy_wait" in folded
+
+
+@pytest.mark.asyncio
+async def test_query_flag_works_too(profiles):
+    response = await _post("/transcribe_vosk?profile=s3cret")
+    assert (profiles / f"{response.headers['x-profile-id']}.folded").exists()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("headers", [{}, {"X-Profile": "wrong"}])
+async def test_no_profile_without_the_token(profiles, headers):
+    response = await _post("/transcribe_vosk", headers=headers)
+    assert "x-profile-id" not in response.headers
+    assert list(profiles.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_only_profiled_routes_and_only_when_configured(profiles, monkeypatch):
+    async with AsyncClient(transport=ASGITransport(app=_app()), base_url="http://test") as client:
+        response = await client.get("/stats", headers={"X-Profile": "s3cret"})
+        assert "x-profile-id" not in response.headers
+
+        monkeypatch.setattr(profiling, "PROFILE_TOKEN", "")
+        response = await client.post("/transcribe_vosk", headers={"X-Profile": ""})
+        assert "x-profile-id" not in response.headers
+    assert list(profiles.iterdir()) == []
+
+
+def test_retention_keeps_the_newest_profiles(tmp_path):
+    profiler = profiling.SamplingProfiler(threading.get_ident())
+    profiler.stacks["event-loop;main (x.py:1)"] = 3
+    for i in range(5):
+        profiling.save(profiler, f"profile-{i}", str(tmp_path), keep=2)
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["profile-3.folded", "profile-4.folded"]
+    assert (tmp_path / "profile-4.folded").read_text() == "event-loop;main (x.py:1) 3\n"
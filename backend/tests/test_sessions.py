@@ -0,0 +1,111 @@
+import json
+
+import pytest
+
+from utils.sessions import Session, SessionStore
+from utils.types import ChatRequest
+
+
+def test_unknown_ids_start_a_new_session():
+    store = SessionStore()
+    session, is_new = store.resume("does-not-exist")
+    assert is_new and session.id != "does-not-exist"
+    assert store.stats()["unknown"] == 1
+
+
+def test_sessions_expire_and_are_evicted(monkeypatch):
+    import utils.sessions as sessions_module
+
+    now = [1000.0]
+    monkeypatch.setattr(sessions_module.time, "time", lambda: now[0])
+    store = SessionStore(ttl_seconds=60, maxsize=2)
+    for sid in ("a", "b", "c"):
+        store.save(Session(id=sid))
+    assert store.resume("a")[1] is True          # evicted (LRU)
+    assert store.resume("c")[1] is False
+
+    now[0] += 61
+    assert store.resume("c")[1] is True          # expired
+    assert store.stats()["evicted"] == 1 and store.stats()["expired"] == 1
+
+
+def test_disk_backend_is_shared_between_stores(tmp_path):
+    path = str(tmp_path / "sessions.sqlite")
+    first = SessionStore(disk_path=path)
+    session, _ = first.resume(None)
+    session.symptoms = ["fever"]
+    session.add_user_text("I have a Fever")
+    first.save(session)
+
+    resumed, is_new = SessionStore(disk_path=path).resume(session.id)
+    assert not is_new
+    assert resumed == session
+    assert resumed.text == "i have a fever"
+
+
+class _NoLLM:
+    async def chat(self, **kwargs):
+        raise AssertionError("the LLM should not be called")
+
+
+async def _turn(chat, **request):
+    events = [e async for e in chat.llm_stream_response(ChatRequest(**request), {})]
+    return next(
+        json.loads(e[len("data: "):]) for e in events if '"final_metadata"' in e
+    )
+
+
+@pytest.mark.asyncio
+async def test_turns_only_need_the_new_message(monkeypatch):
+    import api.chat as chat
+
+    seen = []
+
+    async def fake_extract(messages, context_text=None):
+        seen.append(([m.content for m in messages], context_text))
+        return [n for n in ("cough", "fever") if n in messages[-1].content.lower()]
+
+    monkeypatch.setattr(chat, "client", _NoLLM())
+    monkeypatch.setattr(chat, "FAST_PATH_ENABLED", False)
+    monkeypatch.setattr(chat, "sessions", SessionStore())
+    monkeypatch.setattr(chat.symptom_extractor, "extract", fake_extract)
+
+    first = await _turn(chat, messages=[{"role": "user", "content": "A dry cough"}])
+    second = await _turn(
+        chat,
+        session_id=first["session_id"],
+        messages=[{"role": "user", "content": "and a FEVER"}],
+    )
+
+    assert second["session_id"] == first["session_id"]
+    assert second["accumulated_symptoms"] == ["cough", "fever"]
+    assert seen == [(["A dry cough"], "a dry cough"), (["and a FEVER"], "a dry cough and a fever")]
+
+
+@pytest.mark.asyncio
+async def test_full_history_clients_still_work(monkeypatch):
+    import api.chat as chat
+
+    seen = []
+
+    async def fake_extract(messages, context_text=None):
+        seen.append([m.content for m in messages])
+        return []
+
+    monkeypatch.setattr(chat, "FAST_PATH_ENABLED", False)
+    monkeypatch.setattr(chat, "sessions", SessionStore())
+    monkeypatch.setattr(chat.symptom_extractor, "extract", fake_extract)
+
+    metadata = await _turn(
+        chat,
+        messages=[
+            {"role": "user", "content": "I have a cough"},
+            {"role": "assistant", "content": "Anything else?"},
+            {"role": "user", "content": "my ear hurts"},
+        ],
+        accumulated_symptoms=["cough"],
+    )
+
+    assert seen == [["my ear hurts"]]
+    assert metadata["accumulated_symptoms"] == ["cough"]
+    assert metadata["session_id"]
@@ -0,0 +1,69 @@
+import json
+import time
+import asyncio
+
+import pytest
+
+from utils import sse
+
+
+def _payload(frame: str) -> dict:
+    assert frame.startswith("data: ") and frame.endswith("\n\n")
+    return json.loads(frame[len("data: "):])
+
+
+@pytest.mark.parametrize("serializer", ["orjson", "json"])
+def test_frames_match_the_openai_chunk_format(monkeypatch, serializer):
+    if serializer == "json":
+        monkeypatch.setattr(sse, "orjson", None)
+    encoder = sse.SSEEncoder("fallback", "llama3.2:1b")
+    text = 'Say "ahh" – then\nbreathe \\ slowly 🙂'
+
+    first, second, done = encoder.chunk(text), encoder.chunk("!"), encoder.finish()
+
+    chunk = _payload(first)
+    assert chunk == {
+        "id": encoder.id,
+        "object": "chat.completion.chunk",
+        "created": encoder.created,
+        "model": "llama3.2:1b",
+        "choices": [{"index": 0, "delta": {"role": "assistant", "content": text}, "finish_reason": None}],
+    }
+    assert _payload(second)["id"] == chunk["id"]
+    assert _payload(done)["choices"] == [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+    assert _payload(encoder.chunk("x", finish_reason="stop"))["choices"][0]["finish_reason"] == "stop"
+    assert abs(chunk["created"] - time.time()) < 5  # wall clock, not loop time
+
+
+async def _tokens(delays):
+    for i, delay in enumerate(delays):
+        await asyncio.sleep(delay)
+        yield str(i)
+
+
+async def _collect(stream):
+    return [piece async for piece in stream]
+
+
+@pytest.mark.asyncio
+async def test_coalesce_merges_tokens_within_the_window():
+    # Three quick tokens, a pause longer than the window, then two more.
+    frames = await _collect(sse.coalesce(_tokens([0, 0.001, 0.001, 0.15, 0.001]), window_ms=50))
+    assert "".join(frames) == "01234"
+    assert frames == ["012", "34"]
+
+
+@pytest.mark.asyncio
+async def test_coalesce_window_is_a_latency_bound():
+    # The buffered token is flushed when the window ends, not when the next one arrives.
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    stream = sse.coalesce(_tokens([0, 0.5]), window_ms=20)
+    assert await stream.__anext__() == "0"
+    assert loop.time() - start < 0.3
+    await stream.aclose()
+
+
+@pytest.mark.asyncio
+async def test_coalesce_disabled_passes_tokens_through():
+    assert await _collect(sse.coalesce(_tokens([0, 0, 0]), window_ms=0)) == ["0", "1", "2"]
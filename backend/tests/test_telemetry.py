@@ -0,0 +1,105 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from utils import telemetry
+from utils.telemetry import ResourceSampler
+
+
+@pytest.fixture
+def rss_reads(monkeypatch):
+    reads = []
+
+    def fake_read():
+        reads.append(1)
+        return 100.0 + len(reads)
+
+    monkeypatch.setattr(telemetry, "_read_rss_mb", fake_read)
+    return reads
+
+
+def test_running_sampler_serves_cached_rss(rss_reads):
+    sampler = ResourceSampler(interval_seconds=3600)
+    sampler.start()
+    try:
+        first = sampler.rss_mb()
+        for _ in range(100):
+            assert sampler.rss_mb() == first
+        assert len(rss_reads) == 1
+    finally:
+        sampler.stop()
+
+
+def test_peak_comes_from_getrusage():
+    sampler = ResourceSampler(interval_seconds=0)
+    assert sampler.peak_rss_mb() >= sampler.sample() * 0.5
+    assert sampler.stats()["peak_source"] == "getrusage"
+
+
+def test_checkpoints_attach_to_the_current_request(rss_reads):
+    telemetry.checkpoint("ignored outside a request")
+
+    with telemetry.track_request("test") as usage:
+        assert telemetry.current_request() is usage
+        telemetry.checkpoint("after work")
+    assert telemetry.current_request() is None
+
+    summary = usage.summary()
+    assert list(summary["checkpoints"]) == ["after work"]
+    assert summary["checkpoints"]["after work"]["peak_delta_mb"] >= 0
+
+
+def test_request_rss_delta_is_read_live(rss_reads, monkeypatch):
+    # A running sampler's value can be seconds old; requests read RSS themselves.
+    sampler = ResourceSampler(interval_seconds=3600)
+    monkeypatch.setattr(telemetry, "sampler", sampler)
+    sampler.start()
+    try:
+        with telemetry.track_request("test") as usage:
+            pass
+    finally:
+        sampler.stop()
+
+    # 1 sampler read, then one read at the start and one at the end.
+    assert len(rss_reads) == 3
+    assert usage.start_rss_mb == 102.0
+    assert usage.summary()["rss_delta_mb"] == 2.0  # summary() reads again: 104 - 102
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_keep_separate_contexts():
+    async def request(tag):
+        with telemetry.track_request(tag) as usage:
+            await asyncio.sleep(0.01)
+            return telemetry.current_request() is usage
+
+    assert await asyncio.gather(request("a"), request("b")) == [True, True]
+
+
+class _FakeOllama:
+    def __init__(self, pieces):
+        self.pieces = pieces
+
+    async def chat(self, **kwargs):
+        async def stream():
+            for i, piece in enumerate(self.pieces):
+                yield SimpleNamespace(
+                    message=SimpleNamespace(content=piece), done=i == len(self.pieces) - 1, model="m"
+                )
+
+        return stream()
+
+
+@pytest.mark.asyncio
+async def test_llm_stream_does_not_sample_memory_per_chunk(monkeypatch, rss_reads):
+    import api.chat as chat
+
+    pieces = list('{"symptoms": [{"name": "cough"}]}') + [""]
+    monkeypatch.setattr(chat, "client", _FakeOllama(pieces))
+
+    with telemetry.track_request("chat"):
+        names = await chat.extract_symptoms_json([{"role": "user", "content": "I have a cough"}], "m")
+
+    assert names == ["cough"]
+    assert len(rss_reads) < 10 < len(pieces)
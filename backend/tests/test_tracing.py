@@ -0,0 +1,141 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from httpx import ASGITransport, AsyncClient
+
+from utils import tracing
+from utils.asr_pool import ASRPool
+
+
+@pytest.fixture
+def traced(monkeypatch):
+    monkeypatch.setattr(tracing, "ENABLED", True)
+    tracing.stage_seconds.clear()
+    tracing.request_seconds.clear()
+    yield
+    tracing.stage_seconds.clear()
+    tracing.request_seconds.clear()
+
+
+def _app():
+    app = FastAPI()
+    app.add_middleware(tracing.RequestTracingMiddleware)
+
+    @app.get("/items/{item}")
+    async def item(item: str):
+        with tracing.span("test.lookup"):
+            return {"request_id": tracing.current_request_id()}
+
+    @app.get("/stream")
+    async def stream():
+        async def body():
+            with tracing.span("test.chunk"):
+                yield "a"
+
+        return StreamingResponse(body())
+
+    return app
+
+
+def test_disabled_spans_are_a_shared_noop(monkeypatch):
+    monkeypatch.setattr(tracing, "ENABLED", False)
+    tracing.stage_seconds.clear()
+
+    assert tracing.span("chat.extract") is tracing.span("audio.vad")
+    with tracing.span("chat.extract"):
+        pass
+    assert tracing.traced("x")(lambda: 42)() == 42
+    assert tracing.stage_seconds.snapshot() == {}
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = tracing.Histogram("t_seconds", "Test.", ("stage",), buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(("a\"b",), seconds)
+
+    lines = histogram.render().splitlines()
+    assert lines[:2] == ["# HELP t_seconds Test.", "# TYPE t_seconds histogram"]
+    assert lines[2:] == [
+        't_seconds_bucket{stage="a\\"b",le="0.1"} 1',
+        't_seconds_bucket{stage="a\\"b",le="1.0"} 3',
+        't_seconds_bucket{stage="a\\"b",le="+Inf"} 4',
+        't_seconds_sum{stage="a\\"b"} 6.050000',
+        't_seconds_count{stage="a\\"b"} 4',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_traced_wraps_sync_and_async_functions(traced):
+    @tracing.traced("test.sync")
+    def add(a, b):
+        return a + b
+
+    @tracing.traced("test.async")
+    async def double(a):
+        return 2 * a
+
+    assert add(1, 2) == 3
+    assert await double(4) == 8
+    assert set(tracing.stage_seconds.snapshot()) == {("test.sync",), ("test.async",)}
+
+
+@pytest.mark.asyncio
+async def test_middleware_assigns_and_echoes_request_ids(traced):
+    async with AsyncClient(transport=ASGITransport(app=_app()), base_url="http://test") as client:
+        fresh = await client.get("/items/1")
+        echoed = await client.get("/items/2", headers={"X-Request-ID": "abc-123"})
+        rejected = await client.get("/items/3", headers={"X-Request-ID": "bad id\n"})
+
+    assert fresh.headers["x-request-id"] == fresh.json()["request_id"]
+    assert echoed.headers["x-request-id"] == echoed.json()["request_id"] == "abc-123"
+    assert rejected.headers["x-request-id"] != "bad id\n"
+
+    requests = tracing.request_seconds.snapshot()
+    counts, _ = requests[("GET", "/items/{item}", "200")]
+    assert sum(counts) == 3
+    counts, _ = tracing.stage_seconds.snapshot()[("test.lookup",)]
+    assert sum(counts) == 3
+
+
+@pytest.mark.asyncio
+async def test_streamed_bodies_run_inside_the_request(traced, tmp_path, monkeypatch):
+    spans = tmp_path / "spans.jsonl"
+    monkeypatch.setattr(tracing, "SPANS_PATH", str(spans))
+
+    async with AsyncClient(transport=ASGITransport(app=_app()), base_url="http://test") as client:
+        response = await client.get("/stream", headers={"X-Request-ID": "stream-1"})
+    assert response.text == "a"
+
+    records = [json.loads(line) for line in spans.read_text().splitlines()]
+    assert [(r["name"], r["request_id"]) for r in records] == [("test.chunk", "stream-1")]
+    assert records[0]["duration_ms"] >= 0
+    assert ("GET", "/stream", "200") in tracing.request_seconds.snapshot()
+
+
+@pytest.mark.asyncio
+async def test_asr_pool_keeps_the_request_id_on_worker_threads(traced):
+    pool = ASRPool({"vosk": 1})
+    token = tracing._request_id.set("req-7")
+    try:
+        assert await pool.call("vosk", tracing.current_request_id) == "req-7"
+        value, _ = await pool.run("vosk", tracing.current_request_id)
+        assert value == "req-7"
+    finally:
+        tracing._request_id.reset(token)
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_serves_prometheus_text(traced):
+    from api import create_app
+
+    with tracing.span("predict.retrieve"):
+        pass
+    async with AsyncClient(transport=ASGITransport(app=create_app()), base_url="http://test") as client:
+        response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "voicemedi_tracing_enabled 1" in response.text
+    assert 'voicemedi_stage_duration_seconds_count{stage="predict.retrieve"} 1' in response.text
@@ -0,0 +1,66 @@
+import numpy as np
+
+from utils.vad import SpeechGate, detect_speech, split_speech
+
+SR = 16000
+_rng = np.random.default_rng(0)
+
+
+def _tone(seconds, amplitude=8000):
+    t = np.arange(int(seconds * SR)) / SR
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.int16)
+
+
+def _silence(seconds, noise=30):
+    return _rng.normal(0, noise, int(seconds * SR)).astype(np.int16)
+
+
+def test_leading_trailing_and_long_pauses_are_skipped():
+    audio = np.concatenate([_silence(2), _tone(1.5), _silence(0.2), _tone(1), _silence(3), _tone(2), _silence(2)])
+    result = split_speech(audio, enabled=True)
+
+    # The 0.2 s pause is kept inside the first region, the 3 s pause is dropped.
+    assert len(detect_speech(audio)) == 2
+    assert len(result.chunks) == 1
+    assert 4.7 <= result.speech_seconds <= 5.5
+    assert result.skipped_seconds == round(result.total_seconds - result.speech_seconds, 3)
+    assert result.skipped_seconds > 6
+
+
+def test_long_speech_is_split_into_whisper_windows_at_pauses():
+    audio = np.concatenate([_tone(20), _silence(1), _tone(25)])
+    result = split_speech(audio, max_chunk_seconds=30, enabled=True)
+
+    assert [round(len(c) / SR) for c in result.chunks] == [20, 25]
+    assert all(len(c) <= 30 * SR for c in split_speech(_tone(70), enabled=True).chunks)
+
+
+def test_silence_only_recording_has_no_chunks():
+    result = split_speech(_silence(5), enabled=True)
+    assert result.chunks == []
+    assert result.skipped_seconds == 5.0
+
+
+def test_disabled_vad_keeps_everything():
+    audio = np.concatenate([_silence(2), _tone(1)])
+    result = split_speech(audio, enabled=False)
+    assert sum(len(c) for c in result.chunks) == len(audio)
+    assert result.skipped_seconds == 0.0
+
+
+def test_speech_gate_keeps_a_hangover_then_drops_silence():
+    gate = SpeechGate(hangover_ms=500, enabled=True)
+    chunk = 4000  # 250 ms
+    decisions = []
+    for audio in [_silence(0.25), _tone(0.25), _silence(0.25), _silence(0.25), _silence(0.25), _silence(0.25)]:
+        decisions.append((gate.accept(audio[:chunk].tobytes()), gate.ended))
+
+    assert decisions == [
+        (False, False),
+        (True, False),
+        (True, False),
+        (True, False),
+        (False, True),
+        (False, False),
+    ]
+    assert gate.skipped_seconds == 0.75
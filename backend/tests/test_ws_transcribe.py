@@ -0,0 +1,152 @@
+import json
+
+import numpy as np
+import pytest
+import vosk
+
+from main import app
+
+
+class FakeRecognizer:
+    """Reports an endpoint on every third chunk."""
+
+    def __init__(self, model, sample_rate):
+        self.chunks = 0
+
+    def SetWords(self, enabled):
+        pass
+
+    def AcceptWaveform(self, data):
+        self.chunks += 1
+        return self.chunks % 3 == 0
+
+    def Result(self):
+        return json.dumps({"text": f"utterance {self.chunks // 3}"})
+
+    def PartialResult(self):
+        return json.dumps({"partial": "utter" if self.chunks % 3 == 1 else "utterance"})
+
+    def FinalResult(self):
+        return json.dumps({"text": "tail"})
+
+
+@pytest.fixture
+def fake_vosk(monkeypatch):
+    import api.transcribe as transcribe
+
+    monkeypatch.setattr(vosk, "KaldiRecognizer", FakeRecognizer)
+    monkeypatch.setattr(transcribe.models, "enabled", lambda name: True)
+    monkeypatch.setattr(transcribe.models, "get", lambda name: object())
+    monkeypatch.setattr(transcribe.models, "use", lambda name: _Borrow())
+
+
+class _Borrow:
+    def __enter__(self):
+        return object()
+
+    def __exit__(self, *exc):
+        return False
+
+
+def _tone(n_samples=4000):
+    t = np.arange(n_samples) / 16000
+    return (8000 * np.sin(2 * np.pi * 220 * t)).astype("<i2").tobytes()
+
+
+async def _websocket_session(path, query, client_messages):
+    """Drive the ASGI app over a websocket; returns what the server sent."""
+    incoming = [{"type": "websocket.connect"}, *client_messages]
+    sent = []
+
+    async def receive():
+        if incoming:
+            return incoming.pop(0)
+        return {"type": "websocket.disconnect", "code": 1000}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "websocket",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": [],
+        "scheme": "ws",
+        "server": ("test", 80),
+        "client": ("test", 1234),
+        "root_path": "",
+        "subprotocols": [],
+    }
+    await app(scope, receive, send)
+    return sent
+
+
+def _json_frames(sent):
+    return [json.loads(m["text"]) for m in sent if m["type"] == "websocket.send"]
+
+
+@pytest.mark.asyncio
+async def test_websocket_streams_partials_and_finals(fake_vosk):
+    chunks = [{"type": "websocket.receive", "bytes": _tone()} for _ in range(4)]
+    sent = await _websocket_session(
+        "/ws/transcribe_vosk", "", [*chunks, {"type": "websocket.receive", "text": '{"type": "eof"}'}]
+    )
+
+    assert sent[0]["type"] == "websocket.accept"
+    assert sent[-1]["type"] == "websocket.close"
+    assert _json_frames(sent) == [
+        {"type": "partial", "text": "utter"},
+        {"type": "partial", "text": "utterance"},
+        {"type": "final", "text": "utterance 1", "endpoint": True},
+        {"type": "partial", "text": "utter"},
+        {"type": "final", "text": "tail", "endpoint": False},
+        {"type": "vad", "skipped_seconds": 0.0},
+    ]
+
+    import api.transcribe as transcribe
+    assert transcribe.asr_pool.stats()["vosk"]["outstanding"] == 0
+
+
+@pytest.mark.asyncio
+async def test_websocket_rejects_unknown_format(fake_vosk):
+    sent = await _websocket_session("/ws/transcribe_vosk", "format=mp3", [])
+    assert sent[-1]["type"] == "websocket.close"
+    assert sent[-1]["code"] == 1003
+
+
+@pytest.mark.asyncio
+async def test_websocket_does_not_feed_silence(fake_vosk):
+    silence = {"type": "websocket.receive", "bytes": b"\x00\x00" * 4000}
+    speech = {"type": "websocket.receive", "bytes": _tone()}
+    sent = await _websocket_session(
+        "/ws/transcribe_vosk", "", [silence, silence, speech, speech, {"type": "websocket.receive", "text": "eof"}]
+    )
+
+    frames = _json_frames(sent)
+    assert frames[-1] == {"type": "vad", "skipped_seconds": 0.5}
+    # Only the two speech chunks reached the recognizer.
+    assert {"type": "partial", "text": "utterance"} in frames
+    assert not any(f["type"] == "final" and f["endpoint"] for f in frames)
+
+
+@pytest.mark.asyncio
+async def test_client_disconnect_is_not_an_error(fake_vosk, caplog, monkeypatch):
+    flushed = []
+    monkeypatch.setattr(FakeRecognizer, "FinalResult", lambda self: flushed.append(1) or json.dumps({"text": ""}))
+    chunks = [{"type": "websocket.receive", "bytes": _tone()} for _ in range(2)]
+
+    with caplog.at_level("INFO"):
+        sent = await _websocket_session(
+            "/ws/transcribe_vosk", "", [*chunks, {"type": "websocket.disconnect", "code": 1001}]
+        )
+
+    assert not [r for r in caplog.records if r.levelname == "ERROR"]
+    assert "client disconnected" in caplog.text
+    # No final flush on the pool and nothing sent to the closed socket.
+    assert flushed == []
+    assert [f["type"] for f in _json_frames(sent)] == ["partial", "partial"]
+    assert sent[-1]["type"] == "websocket.send"
+
+    import api.transcribe as transcribe
+    assert transcribe.asr_pool.stats()["vosk"]["outstanding"] == 0
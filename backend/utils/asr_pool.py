@@ -0,0 +1,184 @@
+"""
+Bounded worker pool for blocking ASR work (ffmpeg + model decode).
+
+Each engine gets its own small thread pool, so its concurrency limit is
+simply the pool size and a slow engine cannot starve another. Admission
+is checked before anything is queued: once an engine has ``concurrency +
+max_queue`` jobs outstanding, new requests are rejected with
+``PoolSaturated`` so the endpoint can answer 503 + Retry-After instead of
+piling up work the box cannot finish.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class PoolSaturated(RuntimeError):
+    """Raised when an engine's queue is full."""
+
+    def __init__(self, engine: str, retry_after: int):
+        super().__init__(f"ASR engine {engine!r} is busy")
+        self.engine = engine
+        self.retry_after = retry_after
+
+
+class ASRTiming:
+    def __init__(self, queued: float, started: float, finished: float):
+        self.queue_ms = (started - queued) * 1000
+        self.run_ms = (finished - started) * 1000
+
+    def server_timing(self) -> str:
+        """Value for the ``Server-Timing`` response header."""
+        return f"queue;dur={self.queue_ms:.1f}, asr;dur={self.run_ms:.1f}"
+
+
+class Ticket:
+    """An admitted slot; `release` must be called exactly once per request.
+
+    Work handed to the pool under the ticket (``call(..., ticket=...)``) is
+    held: the slot only goes back once the request has released it *and*
+    that work has finished, so a cancelled request cannot free a slot while
+    its decode is still queued or running.
+    """
+
+    def __init__(self, pool: "ASRPool", engine: str):
+        self._pool = pool
+        self._engine = engine
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._closed = False
+        self._released = False
+
+    def hold(self, future) -> None:
+        """Keep the slot taken until ``future`` (concurrent or asyncio) is done."""
+        with self._lock:
+            self._pending += 1
+        future.add_done_callback(self._finished)
+
+    def _finished(self, _future) -> None:
+        with self._lock:
+            self._pending -= 1
+        self._maybe_release()
+
+    def release(self) -> None:
+        with self._lock:
+            self._closed = True
+        self._maybe_release()
+
+    def _maybe_release(self) -> None:
+        with self._lock:
+            if not self._closed or self._pending or self._released:
+                return
+            self._released = True
+        self._pool._release(self._engine)
+
+
+class ASRPool:
+    def __init__(self, concurrency: Dict[str, int], max_queue: int = 4, retry_after_seconds: int = 2):
+        self.max_queue = max_queue
+        self.retry_after_seconds = retry_after_seconds
+        self._limits = dict(concurrency)
+        self._executors = {
+            engine: ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"asr-{engine}")
+            for engine, limit in self._limits.items()
+        }
+        self._lock = threading.Lock()
+        self._outstanding = {engine: 0 for engine in self._limits}
+        self._counters = {engine: {"completed": 0, "rejected": 0} for engine in self._limits}
+
+    def admit(self, engine: str) -> Ticket:
+        """Reserve a slot for ``engine`` or raise PoolSaturated."""
+        with self._lock:
+            if self._outstanding[engine] >= self._limits[engine] + self.max_queue:
+                self._counters[engine]["rejected"] += 1
+                raise PoolSaturated(engine, self.retry_after_seconds)
+            self._outstanding[engine] += 1
+        return Ticket(self, engine)
+
+    def _release(self, engine: str) -> None:
+        with self._lock:
+            self._outstanding[engine] -= 1
+            self._counters[engine]["completed"] += 1
+
+    def _submit(self, engine: str, fn: Callable[..., Any], args: Tuple[Any, ...], ticket: Optional[Ticket]):
+        # Executors do not carry contextvars (e.g. the request id) by themselves.
+        future = self._executors[engine].submit(contextvars.copy_context().run, fn, *args)
+        if ticket is not None:
+            ticket.hold(future)
+        return future
+
+    async def call(self, engine: str, fn: Callable[..., Any], *args: Any, ticket: Optional[Ticket] = None) -> Any:
+        """Run ``fn`` on the engine's worker threads (no admission check).
+
+        Pass the request's ``ticket`` so its slot stays taken until the work
+        ends, even if the request is cancelled first.
+        """
+        return await asyncio.wrap_future(self._submit(engine, fn, args, ticket))
+
+    async def timed_call(
+        self, engine: str, fn: Callable[..., Any], *args: Any, ticket: Optional[Ticket] = None
+    ) -> Tuple[Any, ASRTiming]:
+        """Like call(), but also time queueing vs. work."""
+        queued = time.perf_counter()
+        started = queued
+
+        def timed():
+            nonlocal started
+            started = time.perf_counter()
+            return fn(*args)
+
+        result = await self.call(engine, timed, ticket=ticket)
+        return result, ASRTiming(queued, started, time.perf_counter())
+
+    async def run(self, engine: str, fn: Callable[..., Any], *args: Any) -> Tuple[Any, ASRTiming]:
+        """Admit, run ``fn`` off the event loop and time queueing vs. work."""
+        ticket = self.admit(engine)
+        queued = time.perf_counter()
+        started = queued
+
+        def timed():
+            nonlocal started
+            started = time.perf_counter()
+            return fn(*args)
+
+        try:
+            future = self._submit(engine, timed, (), ticket)
+        finally:
+            # The slot goes back when the work really ends, even if the request is cancelled.
+            ticket.release()
+        result = await asyncio.wrap_future(future)
+        timing = ASRTiming(queued, started, time.perf_counter())
+        logger.info(
+            "ASR %s: queued %.1f ms, ran %.1f ms", engine, timing.queue_ms, timing.run_ms
+        )
+        return result, timing
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                engine: {
+                    "concurrency": self._limits[engine],
+                    "outstanding": self._outstanding[engine],
+                    **self._counters[engine],
+                }
+                for engine in self._limits
+            }
+
+
+def concurrency_from_env(engines, default: int = 1) -> Dict[str, int]:
+    """ASR_CONCURRENCY_<ENGINE>, falling back to ASR_CONCURRENCY."""
+    base = int(os.getenv("ASR_CONCURRENCY", str(default)))
+    return {
+        engine: max(1, int(os.getenv(f"ASR_CONCURRENCY_{engine.upper()}", str(base))))
+        for engine in engines
+    }
@@ -0,0 +1,133 @@
+"""
+Cross-request micro-batching.
+
+Items submitted within ``max_wait_ms`` of each other (up to
+``max_batch_size``) are handed to ``batch_fn`` together, and each caller
+gets back its own result. ``batch_fn`` is blocking and is executed through
+``runner`` (e.g. the ASR pool), so the event loop only does bookkeeping.
+
+A submitted item runs even if its caller is cancelled; ``submit(item,
+holder=ticket)`` keeps an ASR pool ticket held until the batch carrying the
+item has finished.
+"""
+
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchResult:
+    value: Any
+    queue_ms: float     # submit → batch started running
+    run_ms: float       # batch_fn wall time
+    batch_size: int
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        runner: Callable[[Callable[[], List[Any]]], Awaitable[List[Any]]],
+        max_batch_size: int = 4,
+        max_wait_ms: float = 50.0,
+    ):
+        self.batch_fn = batch_fn
+        self.runner = runner
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max_wait_ms
+        # (item, result future, submitted at, batch-finished future)
+        self._pending: List[Tuple[Any, asyncio.Future, float, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+        self._counters = {
+            "batches": 0,
+            "items": 0,
+            "queue_ms_total": 0.0,
+            "queue_ms_max": 0.0,
+        }
+        self._sizes: Dict[int, int] = {}
+
+    async def submit(self, item: Any, holder: Optional[Any] = None) -> BatchResult:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        finished = loop.create_future()
+        if holder is not None:
+            holder.hold(finished)
+        self._pending.append((item, future, time.perf_counter(), finished))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = self._pending[: self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future, float, asyncio.Future]]) -> None:
+        items = [item for item, _, _, _ in batch]
+        started = 0.0
+
+        def call():
+            nonlocal started
+            started = time.perf_counter()
+            return self.batch_fn(items)
+
+        try:
+            try:
+                results = await self.runner(call)
+            except Exception as e:
+                for _, future, _, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            run_ms = (time.perf_counter() - started) * 1000
+            self._record(batch, started)
+            for (_, future, submitted, _), value in zip(batch, results):
+                if not future.done():
+                    future.set_result(
+                        BatchResult(value, (started - submitted) * 1000, run_ms, len(batch))
+                    )
+        finally:
+            for _, _, _, finished in batch:
+                if not finished.done():
+                    finished.set_result(None)
+
+    def _record(self, batch, started: float) -> None:
+        size = len(batch)
+        self._counters["batches"] += 1
+        self._counters["items"] += size
+        self._sizes[size] = self._sizes.get(size, 0) + 1
+        for _, _, submitted, _ in batch:
+            queue_ms = (started - submitted) * 1000
+            self._counters["queue_ms_total"] += queue_ms
+            self._counters["queue_ms_max"] = max(self._counters["queue_ms_max"], queue_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        batches = self._counters["batches"]
+        items = self._counters["items"]
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "batches": batches,
+            "items": items,
+            "batch_sizes": dict(sorted(self._sizes.items())),
+            "mean_fill": items / (batches * self.max_batch_size) if batches else 0.0,
+            "mean_queue_ms": self._counters["queue_ms_total"] / items if items else 0.0,
+            "max_queue_ms": self._counters["queue_ms_max"],
+        }
@@ -0,0 +1,225 @@
+"""
+Bounded two-tier cache.
+
+An in-process LRU sits in front of an optional SQLite file. The SQLite tier
+is shared by every uvicorn worker on the node and survives restarts. Each
+cache has a ``namespace`` (e.g. the fingerprint of the data it was computed
+from); entries written under any other namespace are dropped when the cache
+is opened, so a changed artifact invalidates the cache automatically. With
+``ttl_seconds`` set, entries also expire that long after they were written.
+
+The disk tier evicts least-recently-used entries. To keep hits and writes
+cheap, access times of disk hits are written back in batches and rows are
+counted only when this process's running count says the bound is reached;
+eviction then frees a batch of slots at once. With several workers writing
+the same file, the bound is approximate between recounts.
+
+Values must be JSON-serialisable.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_EXPIRED = object()
+
+# Disk hits whose access time is written back in one statement.
+_TOUCH_BATCH = 64
+
+
+class TieredCache:
+    def __init__(
+        self,
+        name: str,
+        maxsize: int,
+        namespace: str = "",
+        disk_path: Optional[str] = None,
+        disk_maxsize: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+    ):
+        self.name = name
+        self.maxsize = maxsize
+        self.namespace = namespace
+        self.disk_maxsize = disk_maxsize if disk_maxsize is not None else maxsize * 8
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+
+        # key -> (value, expires_at or None)
+        self._memory: "OrderedDict[str, Tuple[Any, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "disk_hits": 0,
+            "disk_evictions": 0,
+            "expired": 0,
+        }
+        self._db: Optional[sqlite3.Connection] = None
+        # Running row count of the disk tier (recounted before evicting) and
+        # access times of disk hits not yet written back.
+        self._disk_count = 0
+        self._touched: Dict[str, float] = {}
+        if disk_path and maxsize > 0:
+            self._open_disk(disk_path)
+
+    # ------------------------------------------------------------------
+    # Disk tier
+    # ------------------------------------------------------------------
+    def _open_disk(self, path: str) -> None:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            db = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " namespace TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " accessed REAL NOT NULL,"
+                " expires REAL)"
+            )
+            columns = {row[1] for row in db.execute("PRAGMA table_info(entries)")}
+            if "expires" not in columns:  # file written before TTL support
+                db.execute("ALTER TABLE entries ADD COLUMN expires REAL")
+            db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            db.execute("DELETE FROM entries WHERE namespace != ?", (self.namespace,))
+            (self._disk_count,) = db.execute("SELECT COUNT(*) FROM entries").fetchone()
+            self._db = db
+        except (OSError, sqlite3.Error) as e:
+            # e.g. a read-only data directory: keep serving from memory.
+            logger.warning("%s cache: disk tier disabled (%s)", self.name, e)
+            self._db = None
+
+    def _disk_get(self, key: str) -> Any:
+        """(value, expires), None on a miss, or _EXPIRED."""
+        row = self._db.execute(
+            "SELECT value, expires FROM entries WHERE key = ? AND namespace = ?",
+            (key, self.namespace),
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] is not None and row[1] <= time.time():
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._touched.pop(key, None)
+            return _EXPIRED
+        self._touched[key] = time.time()
+        if len(self._touched) >= _TOUCH_BATCH:
+            self._flush_touched()
+        return json.loads(row[0]), row[1]
+
+    def _flush_touched(self) -> None:
+        touched = [(accessed, key) for key, accessed in self._touched.items()]
+        self._touched.clear()
+        self._db.executemany("UPDATE entries SET accessed = ? WHERE key = ?", touched)
+
+    def _disk_set(self, key: str, value: Any, expires: Optional[float]) -> None:
+        self._touched.pop(key, None)
+        self._db.execute(
+            "INSERT OR REPLACE INTO entries (key, namespace, value, accessed, expires)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (key, self.namespace, json.dumps(value), time.time(), expires),
+        )
+        self._disk_count += 1  # over-counts replacements until the next recount
+        if self._disk_count > self.disk_maxsize:
+            self._disk_evict()
+
+    def _disk_evict(self) -> None:
+        """Recount, and if over the bound free a batch of least recently used rows."""
+        (count,) = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()
+        overflow = count - self.disk_maxsize
+        if overflow > 0:
+            self._flush_touched()
+            overflow += max(1, self.disk_maxsize // 16)
+            deleted = self._db.execute(
+                "DELETE FROM entries WHERE key IN"
+                " (SELECT key FROM entries ORDER BY accessed LIMIT ?)",
+                (overflow,),
+            ).rowcount
+            self._counters["disk_evictions"] += deleted
+            count -= deleted
+        self._disk_count = count
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None on a miss."""
+        if self.maxsize <= 0:
+            return None
+        with self._lock:
+            expired = False
+            if key in self._memory:
+                value, expires = self._memory[key]
+                if expires is None or expires > time.time():
+                    self._memory.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return value
+                del self._memory[key]
+                expired = True
+            entry = None
+            if self._db is not None:
+                try:
+                    entry = self._disk_get(key)
+                except sqlite3.Error as e:
+                    logger.warning("%s cache: disk read failed (%s)", self.name, e)
+            if entry is _EXPIRED:
+                entry, expired = None, True
+            if entry is None:
+                self._counters["expired"] += expired
+                self._counters["misses"] += 1
+                return None
+            self._counters["hits"] += 1
+            self._counters["disk_hits"] += 1
+            self._memory_set(key, *entry)
+            return entry[0]
+
+    def set(self, key: str, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        expires = time.time() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._memory_set(key, value, expires)
+            if self._db is not None:
+                try:
+                    self._disk_set(key, value, expires)
+                except sqlite3.Error as e:
+                    logger.warning("%s cache: disk write failed (%s)", self.name, e)
+
+    def _memory_set(self, key: str, value: Any, expires: Optional[float]) -> None:
+        self._memory[key] = (value, expires)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._touched.clear()
+                self._db.execute("DELETE FROM entries")
+                self._disk_count = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._memory)
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            **counters,
+            "size": size,
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl_seconds,
+            "disk": self._db is not None,
+            "hit_rate": counters["hits"] / lookups if lookups else 0.0,
+        }
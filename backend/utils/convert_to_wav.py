@@ -1,24 +1,127 @@
 """
-Utility module for audio conversion to WAV format using ffmpeg.
+Utility module for audio decoding to 16 kHz mono PCM.
+
+`decode_audio` returns a NumPy int16 buffer that goes straight to
+faster-whisper (as float32) and Vosk, without a WAV container or temp file.
+Uploads that already are 16 kHz mono 16-bit PCM WAV are read in-process;
+everything else is decoded by ffmpeg.
 """
 
+import atexit
 import logging
-import ffmpeg
+import threading
+import subprocess
+import wave
+from io import BytesIO
+from typing import Optional
+
+import numpy as np
+
+from utils import tracing
 
 logging.basicConfig(level=logging.INFO)
 
-def convert_to_wav_bytes(file_bytes: bytes) -> bytes:
-    """
-    Convert input audio to 16kHz mono WAV using ffmpeg.
-    """
+SAMPLE_RATE = 16000
+
+_FFMPEG_ARGS = [
+    "ffmpeg", "-hide_banner", "-loglevel", "error",
+    "-i", "pipe:0",
+    "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(SAMPLE_RATE),
+    "pipe:1",
+]
+
+
+def _wav_fast_path(file_bytes: bytes) -> Optional[np.ndarray]:
+    """Return the samples if the upload is already 16 kHz mono PCM16 WAV."""
+    if file_bytes[:4] != b"RIFF" or file_bytes[8:12] != b"WAVE":
+        return None
     try:
-        out, _ = (
-            ffmpeg
-            .input('pipe:0')
-            .output('pipe:1', format='wav', acodec='pcm_s16le', ac=1, ar='16k')
-            .run(input=file_bytes, capture_stdout=True, capture_stderr=True)
+        with wave.open(BytesIO(file_bytes), "rb") as wf:
+            if (
+                wf.getnchannels() != 1
+                or wf.getsampwidth() != 2
+                or wf.getframerate() != SAMPLE_RATE
+                or wf.getcomptype() != "NONE"
+            ):
+                return None
+            frames = wf.readframes(wf.getnframes())
+    except (wave.Error, EOFError):
+        return None
+    return np.frombuffer(frames, dtype="<i2")
+
+
+class FFmpegDecoder:
+    """Decodes with a pre-spawned ffmpeg process.
+
+    ffmpeg handles one input stream per process, so instead of spawning on
+    the request path we always keep one idle process waiting on stdin; a
+    decode takes it and a replacement is started in the background.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spare: Optional[subprocess.Popen] = None
+        atexit.register(self.close)
+
+    @staticmethod
+    def _spawn() -> subprocess.Popen:
+        return subprocess.Popen(
+            _FFMPEG_ARGS,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
         )
-        return out
-    except ffmpeg.Error as e:
-        logging.error("ffmpeg error: %s", e.stderr.decode())
-        raise RuntimeError("Audio conversion failed.") from e
+
+    def _take(self) -> subprocess.Popen:
+        with self._lock:
+            proc, self._spare = self._spare, None
+        if proc is None or proc.poll() is not None:
+            proc = self._spawn()
+        threading.Thread(target=self._refill, name="ffmpeg-spare", daemon=True).start()
+        return proc
+
+    def _refill(self) -> None:
+        try:
+            proc = self._spawn()
+        except OSError as e:
+            logging.error("Could not start ffmpeg: %s", e)
+            return
+        with self._lock:
+            if self._spare is None:
+                self._spare = proc
+                return
+        proc.kill()
+        proc.wait()
+
+    def decode(self, file_bytes: bytes) -> np.ndarray:
+        proc = self._take()
+        out, err = proc.communicate(input=file_bytes)
+        if proc.returncode != 0:
+            logging.error("ffmpeg error: %s", err.decode(errors="replace"))
+            raise RuntimeError("Audio conversion failed.")
+        return np.frombuffer(out, dtype="<i2")
+
+    def close(self) -> None:
+        with self._lock:
+            proc, self._spare = self._spare, None
+        if proc is not None and proc.poll() is None:
+            proc.kill()
+            proc.wait()
+
+
+_decoder = FFmpegDecoder()
+
+
+def decode_audio(file_bytes: bytes) -> np.ndarray:
+    """Decode any upload to 16 kHz mono int16 samples."""
+    with tracing.span("audio.wav_read", bytes=len(file_bytes)):
+        samples = _wav_fast_path(file_bytes)
+    if samples is not None:
+        return samples
+    with tracing.span("audio.ffmpeg", bytes=len(file_bytes)):
+        return _decoder.decode(file_bytes)
+
+
+def pcm_to_float32(samples: np.ndarray) -> np.ndarray:
+    """int16 samples → float32 in [-1, 1), the format faster-whisper takes."""
+    return samples.astype(np.float32) / 32768.0
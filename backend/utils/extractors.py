@@ -0,0 +1,229 @@
+"""
+Symptom extraction engines behind one interface.
+
+* ``llm``     – the Ollama structured-output extractor (default);
+* ``lexicon`` – Aho-Corasick over the symptom phrases of the ICD-10 CSV,
+  with NegEx-style negation; needs no model at all, so it also runs on
+  nodes without room for Ollama;
+* ``hybrid``  – the lexicon first, the LLM only when the lexicon found
+  nothing it could interpret.
+
+Select one per deployment with ``SYMPTOM_EXTRACTOR``. Every engine
+takes the new chat messages (plus, optionally, the session's user text so
+far for the hallucination check) and returns symptom names found in the
+latest user turn.
+"""
+
+import re
+import time
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from utils.fast_path import symptom_vocabulary
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Word-level Aho-Corasick automaton
+# ---------------------------------------------------------------------------
+class PhraseMatcher:
+    """Finds every vocabulary phrase in a token sequence in one pass."""
+
+    def __init__(self, phrases):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]   # lengths of phrases ending here
+        for phrase in phrases:
+            self._add(phrase.split())
+        self._link()
+
+    def _add(self, words: List[str]) -> None:
+        node = 0
+        for word in words:
+            nxt = self._goto[node].get(word)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+                self._goto[node][word] = nxt
+            node = nxt
+        self._out[node] = (len(words),)
+
+    def _link(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for word, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and word not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(word, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find(self, tokens: List[str]) -> List[Tuple[int, int]]:
+        """Leftmost-longest, non-overlapping matches as (start, end) token spans."""
+        matches = []
+        node = 0
+        for i, token in enumerate(tokens):
+            while node and token not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(token, 0)
+            for length in self._out[node]:
+                matches.append((i + 1 - length, i + 1))
+        matches.sort(key=lambda m: (m[0], m[0] - m[1]))
+        chosen, covered = [], 0
+        for start, end in matches:
+            if start >= covered:
+                chosen.append((start, end))
+                covered = end
+        return chosen
+
+
+# ---------------------------------------------------------------------------
+# Lexicon extractor
+# ---------------------------------------------------------------------------
+_TOKEN = re.compile(r"[a-z0-9]+|[.,;!?]")
+
+# Single- and multi-word cues that negate the symptoms following them.
+_NEGATION_CUES = (
+    ("no",), ("not",), ("without",), ("never",), ("none",), ("nor",),
+    ("denies",), ("deny",), ("dont",), ("doesnt",), ("didnt",),
+    ("free", "of"), ("negative", "for"),
+)
+# Words and punctuation that end a negation's scope.
+_SCOPE_END = {"but", "however", "although", "though", "except", "yet", ".", ";", "!", "?"}
+_NEGATION_WINDOW = 5  # tokens a cue reaches forward
+# A negation carries over a list: "no fever, nausea or chest pain".
+_LIST_JOINERS = {",", "or", "and", "nor", "a", "an", "any"}
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(re.sub(r"['’]", "", text.casefold()))
+
+
+@dataclass
+class LexiconResult:
+    symptoms: List[str] = field(default_factory=list)
+    negated: List[str] = field(default_factory=list)
+
+
+class LexiconExtractor:
+    name = "lexicon"
+
+    def __init__(self, vocabulary: Optional[FrozenSet[str]] = None):
+        self._vocabulary = vocabulary
+        self._matcher: Optional[PhraseMatcher] = None
+        self._lock = threading.Lock()
+        self.build_seconds: Optional[float] = None
+
+    @property
+    def matcher(self) -> PhraseMatcher:
+        if self._matcher is None:
+            with self._lock:
+                if self._matcher is None:
+                    start = time.perf_counter()
+                    vocabulary = self._vocabulary if self._vocabulary is not None else symptom_vocabulary()
+                    self._matcher = PhraseMatcher(vocabulary)
+                    self.build_seconds = time.perf_counter() - start
+                    logger.info(
+                        "Symptom lexicon: %d phrases indexed in %.3fs", len(vocabulary), self.build_seconds
+                    )
+        return self._matcher
+
+    @staticmethod
+    def _negated(tokens: List[str], start: int) -> bool:
+        for i in range(start - 1, max(-1, start - 1 - _NEGATION_WINDOW), -1):
+            if tokens[i] in _SCOPE_END:
+                return False
+            for cue in _NEGATION_CUES:
+                if tuple(tokens[i : i + len(cue)]) == cue and i + len(cue) <= start:
+                    return True
+        return False
+
+    def analyse(self, text: str) -> LexiconResult:
+        tokens = tokenize(text)
+        result = LexiconResult()
+        prev_end, prev_negated = 0, False
+        for start, end in self.matcher.find(tokens):
+            phrase = " ".join(tokens[start:end])
+            negated = self._negated(tokens, start) or (
+                prev_negated and all(t in _LIST_JOINERS for t in tokens[prev_end:start])
+            )
+            target = result.negated if negated else result.symptoms
+            if phrase not in target:
+                target.append(phrase)
+            prev_end, prev_negated = end, negated
+        return result
+
+    async def extract(self, messages: list, context_text: Optional[str] = None) -> List[str]:
+        return self.analyse(_latest_user_text(messages)).symptoms
+
+
+def _latest_user_text(messages: list) -> str:
+    for m in reversed(messages):
+        role = m.role if hasattr(m, "role") else m["role"]
+        if role == "user":
+            return m.content if hasattr(m, "content") else m["content"]
+    return ""
+
+
+# ---------------------------------------------------------------------------
+# LLM and hybrid extractors
+# ---------------------------------------------------------------------------
+class LLMExtractor:
+    name = "llm"
+
+    def __init__(self, extract_fn: Callable[..., Awaitable[List[str]]]):
+        self._extract_fn = extract_fn
+
+    async def extract(self, messages: list, context_text: Optional[str] = None) -> List[str]:
+        return await self._extract_fn(messages, context_text)
+
+
+class HybridExtractor:
+    """Lexicon first; the LLM only when the lexicon recognised nothing."""
+
+    name = "hybrid"
+
+    def __init__(self, lexicon: LexiconExtractor, llm: LLMExtractor):
+        self.lexicon = lexicon
+        self.llm = llm
+        self._lock = threading.Lock()
+        self._counters = {"lexicon": 0, "llm_fallback": 0}
+
+    async def extract(self, messages: list, context_text: Optional[str] = None) -> List[str]:
+        found = self.lexicon.analyse(_latest_user_text(messages))
+        # A negated mention ("no fever") is understood too: nothing to ask the LLM.
+        if found.symptoms or found.negated:
+            with self._lock:
+                self._counters["lexicon"] += 1
+            return found.symptoms
+        with self._lock:
+            self._counters["llm_fallback"] += 1
+        return await self.llm.extract(messages, context_text)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+
+EXTRACTORS = ("llm", "lexicon", "hybrid")
+
+
+def build_extractor(kind: str, llm_extract: Callable[..., Awaitable[List[str]]]):
+    if kind not in EXTRACTORS:
+        raise ValueError(f"SYMPTOM_EXTRACTOR must be one of {', '.join(EXTRACTORS)}, got {kind!r}")
+    if kind == "llm":
+        return LLMExtractor(llm_extract)
+    if kind == "lexicon":
+        return LexiconExtractor()
+    return HybridExtractor(LexiconExtractor(), LLMExtractor(llm_extract))
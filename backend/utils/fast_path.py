@@ -0,0 +1,140 @@
+"""
+Rule-based pre-classifier that answers trivial chat turns without the LLM.
+
+Two kinds of turn never need a model call:
+
+* small talk – greetings, affirmations, negations, thanks ("hi", "yes",
+  "no thanks"): no symptoms;
+* a bare symptom list made only of phrases from the ICD-10 symptom
+  vocabulary ("sore throat", "I have a headache and fever").
+
+Anything else – negations of symptoms, past tense, free description – is
+left to the LLM. Matching is a set lookup on the normalised utterance, so
+it costs microseconds.
+"""
+
+import os
+import re
+import csv
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional
+
+from utils.icd10_index import ICD_CSV_PATH
+
+
+GREETINGS = {"hi", "hello", "hey", "good morning", "good afternoon", "good evening", "hi there", "hello there", "hey there"}
+
+# Every word of a small-talk turn must come from this list.
+_SMALL_TALK_WORDS = frozenset(
+    """
+    hi hello hey there good morning afternoon evening
+    yes yeah yep yup sure ok okay absolutely definitely correct right exactly please
+    no nope nah not really nothing else thats all thanks thank you
+    """.split()
+)
+
+# Phrases that turn a bare symptom into a different statement.
+_NEGATION_START = ("no ", "not ", "without ", "never ")
+
+# Leading words of a present-tense complaint ("I have a ...").
+_COMPLAINT_PREFIX = re.compile(
+    r"^(?:(?:i have|ive|i got|i am|im)(?: got| been)?(?: having| suffering from| experiencing)? )?"
+    r"(?:(?:a|an|some|the|really|very|bad|terrible) )*"
+)
+_LIST_SPLIT = re.compile(r"\s*(?:,|\band\b|&|\bplus\b)\s*")
+_ARTICLE = re.compile(r"^(?:(?:a|an|some|the)\s+)+")
+
+
+def normalize(text: str) -> str:
+    """Casefold, drop apostrophes ("I've" → "ive") and other punctuation."""
+    text = re.sub(r"['’]", "", text.casefold())
+    text = re.sub(r"[^\w\s,&]", " ", text)
+    return " ".join(text.replace(",", " , ").split()).replace(" ,", ",")
+
+
+def symptom_vocabulary(csv_path: str = ICD_CSV_PATH) -> FrozenSet[str]:
+    """Normalised symptom phrases of the ICD-10 CSV a patient could state."""
+    phrases = set()
+    try:
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                for phrase in (row.get("symptoms") or "").split(","):
+                    phrase = normalize(phrase)
+                    if len(phrase) >= 4 and not phrase.startswith(_NEGATION_START):
+                        phrases.add(phrase)
+    except OSError:
+        return frozenset()
+    phrases.discard("asymptomatic")
+    return frozenset(phrases)
+
+
+def is_greeting(text: str) -> bool:
+    return normalize(text) in GREETINGS
+
+
+@dataclass
+class FastPathResult:
+    kind: str                       # "greeting" | "small_talk" | "symptoms"
+    symptoms: List[str] = field(default_factory=list)
+
+
+class FastPath:
+    def __init__(self, csv_path: str = ICD_CSV_PATH):
+        self.csv_path = csv_path
+        self._vocabulary: Optional[FrozenSet[str]] = None
+        self._load_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {"turns": 0, "greeting": 0, "small_talk": 0, "symptoms": 0}
+
+    @property
+    def vocabulary(self) -> FrozenSet[str]:
+        if self._vocabulary is None:
+            with self._load_lock:
+                if self._vocabulary is None:
+                    self._vocabulary = self._load_vocabulary()
+        return self._vocabulary
+
+    def _load_vocabulary(self) -> FrozenSet[str]:
+        return symptom_vocabulary(self.csv_path)
+
+    def _symptom_list(self, text: str) -> Optional[List[str]]:
+        body = _COMPLAINT_PREFIX.sub("", text, count=1)
+        parts = [_ARTICLE.sub("", p) for p in _LIST_SPLIT.split(body) if p]
+        if not parts or not all(p in self.vocabulary for p in parts):
+            return None
+        return list(dict.fromkeys(parts))
+
+    def classify(self, text: str) -> Optional[FastPathResult]:
+        """A result if the turn can be answered without the LLM, else None."""
+        normalized = normalize(text)
+        result = None
+        if normalized in GREETINGS:
+            result = FastPathResult("greeting")
+        elif normalized and all(w in _SMALL_TALK_WORDS for w in re.findall(r"\w+", normalized)):
+            result = FastPathResult("small_talk")
+        elif normalized:
+            symptoms = self._symptom_list(normalized)
+            # Same rule as the LLM path: names must appear in the user's text.
+            if symptoms and all(s in text.lower() for s in symptoms):
+                result = FastPathResult("symptoms", symptoms)
+        with self._lock:
+            self._counters["turns"] += 1
+            if result is not None:
+                self._counters[result.kind] += 1
+        return result
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            counters = dict(self._counters)
+        short_circuited = counters["greeting"] + counters["small_talk"] + counters["symptoms"]
+        return {
+            **counters,
+            "short_circuited": short_circuited,
+            "short_circuit_rate": short_circuited / counters["turns"] if counters["turns"] else 0.0,
+        }
+
+
+FAST_PATH_ENABLED = os.getenv("CHAT_FAST_PATH", "1").lower() not in ("0", "false", "no")
+
+fast_path = FastPath()
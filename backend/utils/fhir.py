@@ -0,0 +1,71 @@
+"""
+FHIR resources for the intake summary, as plain dicts.
+
+The chat payload carries one Condition per symptom and a proposed
+Appointment. Building them as ``fhir.resources`` models only to call
+``model_dump()`` cost a pydantic model per symptom and a slow import at
+startup; these builders emit the same JSON, key for key, directly.
+
+``fhir.resources`` is imported only by `validate`, which runs when
+``FHIR_VALIDATE`` is set (the tests do). The resources are deliberately
+minimal: validation reports every invalid element but not the missing
+mandatory references (Condition.subject, Appointment.participant) the
+intake does not know yet.
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+
+FHIR_VALIDATE = os.getenv("FHIR_VALIDATE", "0").lower() in ("1", "true", "yes")
+
+# Offset the appointment times are stamped with (clinic local time).
+APPOINTMENT_TZ = "+01:00"
+
+
+class FHIRValidationError(ValueError):
+    pass
+
+
+def validate(resource: Dict[str, Any]) -> None:
+    """Validate a resource dict against fhir.resources (imported lazily)."""
+    from fhir.resources import get_fhir_model_class
+    from pydantic import ValidationError
+
+    model = get_fhir_model_class(resource["resourceType"])
+    try:
+        model.model_validate(resource)
+    except ValidationError as e:
+        errors = [err for err in e.errors() if err["type"] != "missing"]
+        if errors:
+            raise FHIRValidationError(f"{resource['resourceType']}: {errors}") from e
+
+
+def condition(symptom_name: str) -> Dict[str, Any]:
+    """An unconfirmed, active Condition coded by the symptom's text."""
+    resource = {
+        "resourceType": "Condition",
+        "clinicalStatus": {"text": "active"},
+        "verificationStatus": {"text": "unconfirmed"},
+        "code": {"text": symptom_name},
+    }
+    if FHIR_VALIDATE:
+        validate(resource)
+    return resource
+
+
+def appointment(specialty: str, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """A proposed one-hour Appointment two days from now."""
+    start = (now or datetime.now()) + timedelta(days=2)
+    end = start + timedelta(hours=1)
+    resource = {
+        "resourceType": "Appointment",
+        "status": "proposed",
+        "description": f"Appointment for {specialty}",
+        "start": start.strftime(f"%Y-%m-%dT%H:%M:%S{APPOINTMENT_TZ}"),
+        "end": end.strftime(f"%Y-%m-%dT%H:%M:%S{APPOINTMENT_TZ}"),
+    }
+    if FHIR_VALIDATE:
+        validate(resource)
+    return resource
@@ -0,0 +1,243 @@
+"""
+Persisted ICD-10 TF-IDF index.
+
+The index (vocabulary, IDF weights and the CSR matrix) is built once from
+``data/icd10_symptoms.csv`` and written to a versioned directory next to it.
+Workers memory-map the arrays instead of refitting the vectorizer, so the
+pages are shared between uvicorn workers.
+
+Rows are grouped by ICD-10 chapter (first letter of the code) at build time,
+so callers can score only the chapters they are interested in. Each row keeps
+its position in the CSV, and row selections come back in CSV order, so equal
+scores are still broken the way the CSV lists the codes.
+
+Build offline with:
+
+    python -m utils.icd10_index
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+import argparse
+from dataclasses import dataclass
+from typing import List, Dict, Any, Tuple, Iterable
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bump whenever the on-disk layout or the vectorizer settings change.
+INDEX_FORMAT_VERSION = 3
+
+ICD_CACHE_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+ICD_CSV_PATH = os.path.join(ICD_CACHE_DIR, "icd10_symptoms.csv")
+ICD_INDEX_DIR = os.getenv("ICD10_INDEX_DIR", os.path.join(ICD_CACHE_DIR, "icd10_index"))
+
+_ARRAYS = ("idf", "data", "indices", "indptr", "csv_rows")
+
+
+class IndexStaleError(RuntimeError):
+    """Raised when the persisted index does not match the CSV it was built from."""
+
+
+@dataclass
+class ICD10Index:
+    vectorizer: TfidfVectorizer
+    matrix: csr_matrix
+    codes: List[str]
+    fingerprint: str
+    chapters: Dict[str, Tuple[int, int]]
+    csv_rows: np.ndarray  # row i of the index is row csv_rows[i] of the CSV
+
+    def rows_for_prefixes(self, prefixes: Iterable[str]) -> np.ndarray:
+        """Return the row indices whose code starts with any prefix, in CSV order."""
+        rows = []
+        for prefix in prefixes:
+            start, end = self.chapters.get(prefix[:1], (0, 0))
+            if len(prefix) == 1:
+                rows.extend(range(start, end))
+            else:
+                rows.extend(i for i in range(start, end) if self.codes[i].startswith(prefix))
+        rows = np.unique(np.asarray(rows, dtype=np.int64))
+        return rows[np.argsort(self.csv_rows[rows], kind="stable")]
+
+
+def file_sha256(path: str) -> str:
+    """Return the hex SHA-256 digest of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _artifact_dir(index_dir: str, csv_sha: str) -> str:
+    return os.path.join(index_dir, f"v{INDEX_FORMAT_VERSION}-{csv_sha[:16]}")
+
+
+def _chapter_ranges(codes: List[str]) -> Dict[str, Tuple[int, int]]:
+    """Map chapter letter -> [start, end) row range; codes must be grouped."""
+    chapters: Dict[str, Tuple[int, int]] = {}
+    for i, code in enumerate(codes):
+        chapter = code[:1]
+        start, _ = chapters.get(chapter, (i, i))
+        chapters[chapter] = (start, i + 1)
+    return chapters
+
+
+def _make_vectorizer(vocabulary: Dict[str, int], idf: np.ndarray) -> TfidfVectorizer:
+    vectorizer = TfidfVectorizer(vocabulary=vocabulary)
+    vectorizer.idf_ = idf
+    return vectorizer
+
+
+# ---------------------------------------------------------------------------
+# Build
+# ---------------------------------------------------------------------------
+def _fit(csv_path: str) -> ICD10Index:
+    import pandas as pd  # only needed when (re)building
+
+    df = pd.read_csv(csv_path)
+    # Group rows by chapter; the stable sort keeps CSV order within a chapter.
+    order = df["icd10code"].str[:1].argsort(kind="stable").to_numpy()
+    df = df.iloc[order]
+    texts: List[str] = df["symptoms"].fillna("").tolist()
+    codes: List[str] = df["icd10code"].tolist()
+    vectorizer = TfidfVectorizer()
+    return ICD10Index(
+        vectorizer=vectorizer,
+        matrix=vectorizer.fit_transform(texts).tocsr(),
+        codes=codes,
+        fingerprint=f"v{INDEX_FORMAT_VERSION}-{file_sha256(csv_path)}",
+        chapters=_chapter_ranges(codes),
+        csv_rows=order.astype(np.int64),
+    )
+
+
+def build_index(csv_path: str = ICD_CSV_PATH, index_dir: str = ICD_INDEX_DIR) -> ICD10Index:
+    """Fit the TF-IDF index from the CSV and persist it under ``index_dir``."""
+    csv_sha = file_sha256(csv_path)
+    index = _fit(csv_path)
+    vectorizer, matrix, codes = index.vectorizer, index.matrix, index.codes
+    terms = vectorizer.get_feature_names_out().tolist()
+
+    meta: Dict[str, Any] = {
+        "format_version": INDEX_FORMAT_VERSION,
+        "csv_sha256": csv_sha,
+        "shape": list(matrix.shape),
+        "nnz": int(matrix.nnz),
+        "chapters": index.chapters,
+    }
+
+    final_dir = _artifact_dir(index_dir, csv_sha)
+    tmp_dir = f"{final_dir}.tmp-{os.getpid()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+    try:
+        arrays = {
+            "idf": vectorizer.idf_,
+            "data": matrix.data,
+            "indices": matrix.indices,
+            "indptr": matrix.indptr,
+            "csv_rows": index.csv_rows,
+        }
+        for name, arr in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), arr)
+        with open(os.path.join(tmp_dir, "vocabulary.json"), "w") as f:
+            json.dump(terms, f)
+        with open(os.path.join(tmp_dir, "codes.json"), "w") as f:
+            json.dump(codes, f)
+        # meta.json is written last: its presence marks a complete artifact.
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+        try:
+            os.rename(tmp_dir, final_dir)
+        except OSError:
+            # Another worker finished the same build first.
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    # Drop artifacts built from older CSVs / formats.
+    for entry in os.listdir(index_dir):
+        path = os.path.join(index_dir, entry)
+        if path != final_dir and os.path.isdir(path) and ".tmp-" not in entry:
+            shutil.rmtree(path, ignore_errors=True)
+
+    logger.info("Built ICD-10 index %s (%d rows, %d terms)", final_dir, matrix.shape[0], len(terms))
+    return index
+
+
+# ---------------------------------------------------------------------------
+# Load
+# ---------------------------------------------------------------------------
+def load_index(csv_path: str = ICD_CSV_PATH, index_dir: str = ICD_INDEX_DIR) -> ICD10Index:
+    """Memory-map a persisted index, verifying it against the CSV's hash."""
+    csv_sha = file_sha256(csv_path)
+    artifact = _artifact_dir(index_dir, csv_sha)
+    meta_path = os.path.join(artifact, "meta.json")
+    if not os.path.exists(meta_path):
+        raise IndexStaleError(f"No ICD-10 index for CSV {csv_sha[:16]} in {index_dir}")
+
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get("format_version") != INDEX_FORMAT_VERSION or meta.get("csv_sha256") != csv_sha:
+        raise IndexStaleError(f"ICD-10 index in {artifact} does not match {csv_path}")
+
+    arrays = {
+        name: np.load(os.path.join(artifact, f"{name}.npy"), mmap_mode="r")
+        for name in _ARRAYS
+    }
+    with open(os.path.join(artifact, "vocabulary.json")) as f:
+        terms: List[str] = json.load(f)
+    with open(os.path.join(artifact, "codes.json")) as f:
+        codes: List[str] = json.load(f)
+
+    matrix = csr_matrix(
+        (arrays["data"], arrays["indices"], arrays["indptr"]),
+        shape=tuple(meta["shape"]),
+        copy=False,
+    )
+    vocabulary = {term: i for i, term in enumerate(terms)}
+    return ICD10Index(
+        vectorizer=_make_vectorizer(vocabulary, arrays["idf"]),
+        matrix=matrix,
+        codes=codes,
+        fingerprint=f"v{INDEX_FORMAT_VERSION}-{csv_sha}",
+        chapters={k: tuple(v) for k, v in meta["chapters"].items()},
+        csv_rows=arrays["csv_rows"],
+    )
+
+
+def load_or_build_index(csv_path: str = ICD_CSV_PATH, index_dir: str = ICD_INDEX_DIR) -> ICD10Index:
+    """Load the persisted index, rebuilding it if it is missing or stale."""
+    try:
+        return load_index(csv_path, index_dir)
+    except IndexStaleError as e:
+        logger.warning("%s – rebuilding (run `python -m utils.icd10_index` at deploy time)", e)
+
+    try:
+        os.makedirs(index_dir, exist_ok=True)
+        build_index(csv_path, index_dir)
+        return load_index(csv_path, index_dir)
+    except OSError as e:
+        # Read-only data directory: fall back to an in-memory index.
+        logger.warning("Could not persist ICD-10 index (%s); using in-memory index", e)
+        return _fit(csv_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the persisted ICD-10 TF-IDF index.")
+    parser.add_argument("--csv", default=ICD_CSV_PATH, help="ICD-10 symptoms CSV")
+    parser.add_argument("--out", default=ICD_INDEX_DIR, help="Index output directory")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    build_index(args.csv, args.out)
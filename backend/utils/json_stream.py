@@ -0,0 +1,43 @@
+"""
+Incremental detection of the end of a streamed JSON object.
+
+Structured-output generations are complete as soon as the top-level
+object closes; anything the model emits afterwards is whitespace. Feeding
+each streamed piece to `JSONObjectScanner` tells the caller when to stop
+reading (and close the stream, which makes Ollama stop generating).
+"""
+
+
+class JSONObjectScanner:
+    """Tracks brace depth outside of strings across arbitrary chunk splits."""
+
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.complete = False
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, piece: str) -> int:
+        """Scan ``piece``; return the index just past the closing brace, or -1."""
+        if self.complete:
+            return 0
+        for i, ch in enumerate(piece):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self.depth += 1
+                self.started = True
+            elif ch in "}]":
+                self.depth -= 1
+                if self.started and self.depth == 0:
+                    self.complete = True
+                    return i + 1
+        return -1
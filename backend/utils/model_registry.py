@@ -0,0 +1,165 @@
+"""
+Lazy model registry for the ASR engines.
+
+Engines are registered with a loader and only built on first use. Loaded
+models can be dropped again once they have been idle for a while, or, when
+the process RSS exceeds a limit, least recently used first. Load time and
+the RSS growth caused by each load are recorded for ``/stats``.
+"""
+
+import gc
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import psutil
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class EngineDisabled(LookupError):
+    """Raised when an engine is not enabled for this deployment."""
+
+
+def _rss_mb() -> float:
+    return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+
+
+class _Entry:
+    def __init__(self, name: str, loader: Callable[[], Any], enabled: bool):
+        self.name = name
+        self.loader = loader
+        self.enabled = enabled
+        self.model: Any = None
+        self.lock = threading.Lock()
+        self.in_use = 0
+        self.last_used = 0.0
+        self.loads = 0
+        self.load_seconds: Optional[float] = None
+        self.resident_mb: Optional[float] = None
+
+
+class ModelRegistry:
+    def __init__(
+        self,
+        idle_unload_seconds: float = 0.0,
+        memory_limit_mb: float = 0.0,
+        reap_interval_seconds: float = 30.0,
+    ):
+        self.idle_unload_seconds = idle_unload_seconds
+        self.memory_limit_mb = memory_limit_mb
+        self.reap_interval_seconds = reap_interval_seconds
+        self._entries: Dict[str, _Entry] = {}
+        self._reaper: Optional[threading.Thread] = None
+
+    def register(self, name: str, loader: Callable[[], Any], enabled: bool = True) -> None:
+        self._entries[name] = _Entry(name, loader, enabled)
+        if not enabled:
+            logger.info("ASR engine %r disabled for this deployment", name)
+
+    def enabled(self, name: str) -> bool:
+        entry = self._entries.get(name)
+        return bool(entry and entry.enabled)
+
+    def _entry(self, name: str) -> _Entry:
+        entry = self._entries.get(name)
+        if entry is None or not entry.enabled:
+            raise EngineDisabled(f"ASR engine {name!r} is not enabled")
+        return entry
+
+    def _load_locked(self, entry: _Entry) -> Any:
+        if entry.model is None:
+            rss_before = _rss_mb()
+            start = time.perf_counter()
+            entry.model = entry.loader()
+            entry.load_seconds = time.perf_counter() - start
+            entry.resident_mb = max(_rss_mb() - rss_before, 0.0)
+            entry.loads += 1
+            logger.info(
+                "Loaded ASR engine %r in %.2fs (+%.1f MB RSS)",
+                entry.name, entry.load_seconds, entry.resident_mb,
+            )
+            self._start_reaper()
+        entry.last_used = time.monotonic()
+        return entry.model
+
+    def get(self, name: str) -> Any:
+        """Return the model, loading it on first use."""
+        entry = self._entry(name)
+        with entry.lock:
+            return self._load_locked(entry)
+
+    @contextmanager
+    def use(self, name: str) -> Iterator[Any]:
+        """Borrow a model; it will not be unloaded while borrowed."""
+        entry = self._entry(name)
+        with entry.lock:
+            model = self._load_locked(entry)
+            entry.in_use += 1
+        try:
+            yield model
+        finally:
+            with entry.lock:
+                entry.in_use -= 1
+                entry.last_used = time.monotonic()
+
+    def unload(self, name: str) -> bool:
+        entry = self._entries.get(name)
+        if entry is None:
+            return False
+        with entry.lock:
+            if entry.model is None or entry.in_use:
+                return False
+            entry.model = None
+        gc.collect()
+        logger.info("Unloaded ASR engine %r", name)
+        return True
+
+    def unload_idle(self) -> List[str]:
+        """Unload idle models; under memory pressure, unload LRU models first."""
+        now = time.monotonic()
+        loaded = sorted(
+            (e for e in self._entries.values() if e.model is not None),
+            key=lambda e: e.last_used,
+        )
+        unloaded = []
+        for entry in loaded:
+            idle = now - entry.last_used
+            over_idle = self.idle_unload_seconds > 0 and idle >= self.idle_unload_seconds
+            over_memory = self.memory_limit_mb > 0 and _rss_mb() > self.memory_limit_mb
+            if (over_idle or over_memory) and self.unload(entry.name):
+                unloaded.append(entry.name)
+        return unloaded
+
+    def _start_reaper(self) -> None:
+        if self._reaper is not None or not (self.idle_unload_seconds > 0 or self.memory_limit_mb > 0):
+            return
+
+        def reap():
+            while True:
+                time.sleep(self.reap_interval_seconds)
+                try:
+                    self.unload_idle()
+                except Exception as e:
+                    logger.error("Model reaper failed: %s", e)
+
+        self._reaper = threading.Thread(target=reap, name="asr-model-reaper", daemon=True)
+        self._reaper.start()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            name: {
+                "enabled": e.enabled,
+                "loaded": e.model is not None,
+                "in_use": e.in_use,
+                "loads": e.loads,
+                "load_seconds": e.load_seconds,
+                "resident_mb": e.resident_mb,
+            }
+            for name, e in self._entries.items()
+        }
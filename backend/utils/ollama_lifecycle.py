@@ -0,0 +1,216 @@
+"""
+Ollama model lifecycle: warm-up, keep-alive and latency metrics.
+
+At startup every model the chat path uses is loaded into Ollama (an empty
+``generate`` call) and probed with a one-token chat, so the first patient
+does not pay for the model load. Every request passes ``keep_alive`` so
+the models stay resident between sparse clinic visits. Warm-up retries in
+the background until Ollama answers; `/ready` reports ready only once all
+models are warm.
+
+The HTTP pool of the shared ``ollama.AsyncClient`` is configured from the
+environment as well (see `client_options`).
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import httpx
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def keep_alive_from_env() -> Union[str, float]:
+    """OLLAMA_KEEP_ALIVE as Ollama expects it: a duration ("24h") or seconds (-1 = forever)."""
+    value = os.getenv("OLLAMA_KEEP_ALIVE", "24h").strip()
+    try:
+        return float(value) if "." in value else int(value)
+    except ValueError:
+        return value
+
+
+def client_options() -> Dict[str, Any]:
+    """httpx options for ollama.AsyncClient (connection pool and timeouts)."""
+    return {
+        "limits": httpx.Limits(
+            max_connections=int(os.getenv("OLLAMA_MAX_CONNECTIONS", "8")),
+            max_keepalive_connections=int(os.getenv("OLLAMA_MAX_KEEPALIVE_CONNECTIONS", "8")),
+            keepalive_expiry=float(os.getenv("OLLAMA_KEEPALIVE_EXPIRY_SECONDS", "300")),
+        ),
+        "timeout": httpx.Timeout(
+            float(os.getenv("OLLAMA_TIMEOUT_SECONDS", "120")),
+            connect=float(os.getenv("OLLAMA_CONNECT_TIMEOUT_SECONDS", "5")),
+        ),
+    }
+
+
+class _ModelState:
+    def __init__(self, name: str):
+        self.name = name
+        self.warm = False
+        self.warmup_load_seconds: Optional[float] = None
+        self.warmup_ttft_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.ttft_count = 0
+        self.ttft_total_ms = 0.0
+        self.ttft_max_ms = 0.0
+        self.cold_loads = 0
+        self.load_seconds_max = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "warm": self.warm,
+            "warmup_load_seconds": self.warmup_load_seconds,
+            "warmup_ttft_ms": self.warmup_ttft_ms,
+            "last_error": self.last_error,
+            "requests": self.ttft_count,
+            "ttft_ms_mean": self.ttft_total_ms / self.ttft_count if self.ttft_count else None,
+            "ttft_ms_max": self.ttft_max_ms if self.ttft_count else None,
+            "cold_loads": self.cold_loads,
+            "load_seconds_max": self.load_seconds_max,
+        }
+
+
+class OllamaLifecycle:
+    # A reported load_duration above this means the model was not resident.
+    COLD_LOAD_SECONDS = 0.5
+
+    def __init__(
+        self,
+        client,
+        models: Iterable[str],
+        keep_alive: Union[str, float] = "24h",
+        retry_seconds: float = 5.0,
+        cold_ttft_seconds: float = 5.0,
+    ):
+        self.client = client
+        self.keep_alive = keep_alive
+        self.retry_seconds = retry_seconds
+        # Streams closed before Ollama's final chunk carry no load_duration;
+        # a first token slower than this is then taken as a cold load.
+        self.cold_ttft_seconds = cold_ttft_seconds
+        self._models: Dict[str, _ModelState] = {m: _ModelState(m) for m in dict.fromkeys(models)}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return all(state.warm for state in self._models.values())
+
+    def models(self) -> List[str]:
+        return list(self._models)
+
+    # ------------------------------------------------------------------
+    # Warm-up
+    # ------------------------------------------------------------------
+    async def warm_model(self, model: str) -> None:
+        state = self._models[model]
+        start = time.perf_counter()
+        # An empty prompt only loads the model (and applies keep_alive).
+        loaded = await self.client.generate(model=model, prompt="", keep_alive=self.keep_alive)
+        reported = getattr(loaded, "load_duration", None)
+        state.warmup_load_seconds = reported / 1e9 if reported else time.perf_counter() - start
+
+        # One-token chat: primes the prompt path and measures a warm TTFT.
+        start = time.perf_counter()
+        stream = await self.client.chat(
+            model=model,
+            messages=[{"role": "user", "content": "hi"}],
+            options={"num_predict": 1, "num_ctx": 128, "temperature": 0.0},
+            keep_alive=self.keep_alive,
+            stream=True,
+        )
+        try:
+            async for _ in stream:
+                state.warmup_ttft_ms = (time.perf_counter() - start) * 1000
+                break
+        finally:
+            await stream.aclose()
+
+        state.warm = True
+        state.last_error = None
+        logger.info(
+            "Ollama model %s warm: load %.2fs, TTFT %.0f ms (keep_alive=%s)",
+            model, state.warmup_load_seconds, state.warmup_ttft_ms or 0.0, self.keep_alive,
+        )
+
+    async def warm_up(self) -> None:
+        """Warm every model, retrying until Ollama is reachable."""
+        while not self.ready:
+            for model, state in self._models.items():
+                if state.warm:
+                    continue
+                try:
+                    await self.warm_model(model)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    state.last_error = str(e) or type(e).__name__
+                    logger.warning("Ollama warm-up of %s failed (%s); retrying in %.0fs", model, state.last_error, self.retry_seconds)
+            if not self.ready:
+                await asyncio.sleep(self.retry_seconds)
+
+    def start(self) -> None:
+        """Start warm-up in the background (call from the app's startup hook)."""
+        if self._task is None and self._models:
+            self._task = asyncio.get_running_loop().create_task(self.warm_up())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ------------------------------------------------------------------
+    # Request metrics
+    # ------------------------------------------------------------------
+    def _state(self, model: str) -> _ModelState:
+        if model not in self._models:
+            self._models[model] = _ModelState(model)
+            self._models[model].warm = True  # used ad hoc, never gates readiness
+        return self._models[model]
+
+    def record_ttft(self, model: str, seconds: float) -> None:
+        state = self._state(model)
+        ms = seconds * 1000
+        state.ttft_count += 1
+        state.ttft_total_ms += ms
+        state.ttft_max_ms = max(state.ttft_max_ms, ms)
+
+    def record_load(self, model: str, load_duration_ns: Optional[int]) -> None:
+        if not load_duration_ns:
+            return
+        seconds = load_duration_ns / 1e9
+        if seconds >= self.COLD_LOAD_SECONDS:
+            self._cold_load(model, seconds, "loaded in")
+        else:
+            state = self._state(model)
+            state.load_seconds_max = max(state.load_seconds_max, seconds)
+
+    def record_unreported_load(self, model: str, ttft_seconds: Optional[float]) -> None:
+        """Cold-load check for a stream stopped before Ollama reported load_duration.
+
+        The TTFT is an upper bound on the load time, so it is recorded as such.
+        """
+        if ttft_seconds is not None and ttft_seconds >= self.cold_ttft_seconds:
+            self._cold_load(model, ttft_seconds, "first token after")
+
+    def _cold_load(self, model: str, seconds: float, how: str) -> None:
+        state = self._state(model)
+        state.load_seconds_max = max(state.load_seconds_max, seconds)
+        state.cold_loads += 1
+        logger.warning("Ollama model %s was cold: %s %.2fs during a request", model, how, seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "keep_alive": self.keep_alive,
+            "models": {name: state.stats() for name, state in self._models.items()},
+        }
@@ -6,9 +6,13 @@ import logging
 from pathlib import Path
 from typing import List, Tuple, Dict, Any
 
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import numpy as np
+from sklearn.preprocessing import normalize
+from sklearn.utils.extmath import safe_sparse_dot
+
+from utils import tracing
+from utils.cache import TieredCache
+from utils.icd10_index import ICD_CACHE_DIR, load_or_build_index
 
 
 # Set up logging
@@ -16,36 +20,72 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
-# 1.  Build ICD‑10 TF‑IDF index once at startup
+# 1.  Load the persisted ICD‑10 TF‑IDF index once at startup
+#     (built offline by `python -m utils.icd10_index`, memory-mapped here)
 # ---------------------------------------------------------------------------
-ICD_CACHE_DIR  = os.path.join(os.path.dirname(__file__),"..", "data")
-ICD_DF: pd.DataFrame = pd.read_csv(os.path.join(ICD_CACHE_DIR, "icd10_symptoms.csv"))
+_INDEX = load_or_build_index()
+
+_icd_codes: List[str] = _INDEX.codes
+
+_vectorizer = _INDEX.vectorizer
+_TFIDF_MATRIX = _INDEX.matrix
 
+# Allowed chapters for triage bot (Symptoms + Cardio + Resp.), overridable
+# per deployment, e.g. ICD10_ALLOWED_PREFIXES="R,I,J,H6".
+_ALLOWED_PREFIXES = tuple(
+    p.strip().upper()
+    for p in os.getenv("ICD10_ALLOWED_PREFIXES", "R,I,J").split(",")
+    if p.strip()
+)
 
-_symptom_texts: List[str] = ICD_DF["symptoms"].fillna("").tolist()
-_icd_codes: List[str] = ICD_DF["icd10code"].tolist()
+# Only the allowed rows are ever scored. They are L2-normalised once here,
+# exactly as cosine_similarity() would do on every call. Columns follow the
+# CSV order, so ties go to the code the CSV lists first.
+_allowed_rows = _INDEX.rows_for_prefixes(_ALLOWED_PREFIXES)
+_allowed_codes: List[str] = [_icd_codes[i] for i in _allowed_rows]
+_ALLOWED_MATRIX = normalize(_TFIDF_MATRIX[_allowed_rows])
 
-_vectorizer = TfidfVectorizer()
-_TFIDF_MATRIX = _vectorizer.fit_transform(_symptom_texts)
 
-# Allowed chapters for triage bot (Symptoms + Cardio + Resp.)
-_ALLOWED_PREFIXES = ("R", "I", "J")
+def _top_k_rows(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Top‑k per row of a 2‑D score matrix, in one vectorised pass.
+
+    Returns (rows, cols) grouped by row, best first within a row; ties keep
+    column order. Only entries >= each row's k‑th largest score are sorted.
+    """
+    n_rows, n = scores.shape
+    if k < n:
+        kth = np.partition(scores, n - k, axis=1)[:, n - k]
+        rows, cols = np.nonzero(scores >= kth[:, None])
+    else:
+        rows, cols = (a.ravel() for a in np.indices(scores.shape))
+    order = np.lexsort((cols, -scores[rows, cols], rows))
+    rows, cols = rows[order], cols[order]
+    rank = np.arange(rows.shape[0]) - np.searchsorted(rows, rows)
+    keep = rank < k
+    return rows[keep], cols[keep]
+
+
+@tracing.traced("predict.retrieve")
+def retrieve_icd10_batch(queries: List[str], top_k: int = 5) -> List[List[Tuple[str, float]]]:
+    """Return top‑k (code, similarity) filtered by prefix for every query.
+
+    Codes sharing no term with a query (similarity 0) are not matches, so a
+    query with no overlap at all gets an empty list.
+    """
+    if not queries:
+        return []
+    vecs = normalize(_vectorizer.transform(queries))
+    sims = safe_sparse_dot(vecs, _ALLOWED_MATRIX.T, dense_output=True)
+    results: List[List[Tuple[str, float]]] = [[] for _ in queries]
+    for row, col in zip(*_top_k_rows(sims, top_k)):
+        if sims[row, col] > 0:
+            results[row].append((_allowed_codes[col], float(sims[row, col])))
+    return results
 
 
 def retrieve_icd10_filtered(query: str, top_k: int = 5) -> List[Tuple[str, float]]:
     """Return top‑k (code, similarity) filtered by prefix."""
-    vec = _vectorizer.transform([query])
-    sims = cosine_similarity(vec, _TFIDF_MATRIX).flatten()
-    idx_sorted = sims.argsort()[::-1]
-    results = []
-    for idx in idx_sorted:
-        code: str = _icd_codes[idx]
-        if not code.startswith(_ALLOWED_PREFIXES):
-            continue
-        results.append((code, float(sims[idx])))
-        if len(results) == top_k:
-            break
-    return results
+    return retrieve_icd10_batch([query], top_k)[0]
 
 # ---------------------------------------------------------------------------
 # 2.  Simple ICD‑10 → specialty map (extend as needed)
@@ -74,12 +114,48 @@ def clean_symptom(text: str) -> str:
 # ---------------------------------------------------------------------------
 # 4.  New function to map list[str] symptoms → ICD‑10 + specialty
 # ---------------------------------------------------------------------------
+# Symptom → candidate list cache. The namespace ties entries to the index
+# artifact and retrieval settings, so a rebuilt index invalidates them.
+_MAP_TOP_K = 3
+_candidate_cache = TieredCache(
+    "icd10_candidates",
+    maxsize=int(os.getenv("SYMPTOM_CACHE_SIZE", "1024")),
+    namespace=f"{_INDEX.fingerprint}|{','.join(_ALLOWED_PREFIXES)}|k={_MAP_TOP_K}",
+    disk_path=os.getenv(
+        "SYMPTOM_CACHE_PATH", os.path.join(ICD_CACHE_DIR, "cache", "icd10_candidates.sqlite")
+    ) or None,
+)
+
+
+def symptom_cache_stats() -> Dict[str, Any]:
+    """Hit/miss/eviction counters of the symptom → ICD‑10 cache."""
+    return _candidate_cache.stats()
+
+
+def _lookup_candidates(cleaned: List[str]) -> Dict[str, List[Tuple[str, float]]]:
+    found: Dict[str, List[Tuple[str, float]]] = {}
+    misses: List[str] = []
+    for c in dict.fromkeys(cleaned):
+        hit = _candidate_cache.get(c)
+        if hit is None:
+            misses.append(c)
+        else:
+            found[c] = [(code, score) for code, score in hit]
+    # Misses are still scored in a single sparse product.
+    for c, matches in zip(misses, retrieve_icd10_batch(misses, top_k=_MAP_TOP_K)):
+        _candidate_cache.set(c, matches)
+        found[c] = list(matches)
+    return found
+
+
+@tracing.traced("predict.map_symptoms")
 def map_symptoms(symptoms: List[str]) -> List[Dict[str, Any]]:
     """Return list of dicts with ICD‑10 suggestions + specialty."""
+    cleaned = [clean_symptom(s) for s in symptoms]
+    candidates = _lookup_candidates(cleaned)
     output = []
-    for s in symptoms:
-        clean = clean_symptom(s)
-        matches = retrieve_icd10_filtered(clean, top_k=3)
+    for s, c in zip(symptoms, cleaned):
+        matches = candidates[c]
         if matches:
             code, score = matches[0]  # take best
         else:
@@ -94,6 +170,7 @@ def map_symptoms(symptoms: List[str]) -> List[Dict[str, Any]]:
         })
     return output
 
+@tracing.traced("predict.specialty")
 def final_session_specialty(mapped: List[Dict[str, Any]]) -> str:
     """Select a single specialty for the encounter.
 
@@ -0,0 +1,180 @@
+"""
+On-demand sampling profiler for single live requests.
+
+An admin sends ``X-Profile: <PROFILE_TOKEN>`` (or ``?profile=<token>``) with
+a ``/chat`` or ``/transcribe_*`` request; that request then runs under a
+sampler thread that reads ``sys._current_frames()`` every
+``PROFILE_INTERVAL_MS`` and records the stacks of the event-loop thread and
+of the worker threads (``asr-*`` ASR executor, ``icd10-map`` mapping pool).
+Nothing is installed into the interpreter, so requests that are not
+profiled pay only for the header check, and profiled ones for the sampling.
+
+Stacks are written in the collapsed format (``root;frame;frame count``) that
+flamegraph.pl, speedscope and inferno read, one ``.folded`` file per request
+in ``PROFILE_DIR``; only the newest ``PROFILE_KEEP`` files are kept. The
+root frame names the thread, so loop and worker time can be told apart.
+Samples are per thread, not per request: work from other requests running
+at the same time shows up too. One request is profiled at a time.
+
+Profiling is off unless ``PROFILE_TOKEN`` is set.
+"""
+
+import os
+import sys
+import time
+import hmac
+import asyncio
+import logging
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Tuple
+from urllib.parse import parse_qs
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+
+PROFILED_PATHS = ("/chat", "/transcribe_", "/stream_transcribe_")
+WORKER_THREAD_PREFIXES = ("asr-", "icd10-map")
+
+
+# ---------------------------------------------------------------------------
+# Sampler
+# ---------------------------------------------------------------------------
+class SamplingProfiler:
+    """Samples the stacks of one loop thread and the worker threads."""
+
+    def __init__(self, loop_thread_id: int, interval_ms: float = PROFILE_INTERVAL_MS,
+                 worker_prefixes: Tuple[str, ...] = WORKER_THREAD_PREFIXES):
+        self.loop_thread_id = loop_thread_id
+        self.interval = max(interval_ms, 0.5) / 1000
+        self.worker_prefixes = worker_prefixes
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._labels: Dict[object, str] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._started = 0.0
+        self.seconds = 0.0
+
+    def start(self) -> "SamplingProfiler":
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.seconds = time.perf_counter() - self._started
+
+    def _roots(self) -> Dict[int, str]:
+        roots = {self.loop_thread_id: "event-loop"}
+        for thread in threading.enumerate():
+            if thread.name.startswith(self.worker_prefixes) and thread.ident is not None:
+                roots[thread.ident] = thread.name
+        return roots
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = os.path.basename(code.co_filename).replace(";", "_")
+            label = self._labels[code] = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+        return label
+
+    def sample(self) -> None:
+        roots = self._roots()
+        for thread_id, frame in sys._current_frames().items():
+            root = roots.get(thread_id)
+            if root is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.append(root)
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+
+# ---------------------------------------------------------------------------
+# Output
+# ---------------------------------------------------------------------------
+def save(profiler: SamplingProfiler, name: str, directory: str, keep: int) -> Path:
+    """Write ``<name>.folded`` and delete the oldest profiles beyond ``keep``."""
+    out = Path(directory)
+    out.mkdir(parents=True, exist_ok=True)
+    path = out / f"{name}.folded"
+    path.write_text(profiler.collapsed(), encoding="utf-8")
+    profiles = sorted(out.glob("*.folded"), key=lambda p: (p.stat().st_mtime, p.name), reverse=True)
+    for old in profiles[max(keep, 1):]:
+        try:
+            old.unlink()
+        except OSError:
+            pass
+    return path
+
+
+# ---------------------------------------------------------------------------
+# Middleware
+# ---------------------------------------------------------------------------
+def _requested(scope) -> bool:
+    if not PROFILE_TOKEN or not scope["path"].startswith(PROFILED_PATHS):
+        return False
+    supplied = dict(scope.get("headers") or ()).get(b"x-profile", b"").decode("latin-1")
+    if not supplied and scope.get("query_string"):
+        supplied = parse_qs(scope["query_string"].decode("latin-1")).get("profile", [""])[0]
+    return bool(supplied) and hmac.compare_digest(supplied.encode(), PROFILE_TOKEN.encode())
+
+
+class ProfilingMiddleware:
+    """Pure ASGI, so a streamed body is profiled until its last chunk."""
+
+    def __init__(self, app):
+        self.app = app
+        self._busy = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _requested(scope):
+            await self.app(scope, receive, send)
+            return
+        if not self._busy.acquire(blocking=False):
+            logger.info("Profiling: another request is being profiled, running %s unprofiled", scope["path"])
+            await self.app(scope, receive, send)
+            return
+
+        route = scope["path"].strip("/").replace("/", "_") or "root"
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{int(time.time() * 1000) % 1000:03d}-{route}"
+
+        async def profiled_send(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", ()), (b"x-profile-id", name.encode())]}
+            await send(message)
+
+        profiler = SamplingProfiler(threading.get_ident(), PROFILE_INTERVAL_MS).start()
+        try:
+            await self.app(scope, receive, profiled_send)
+        finally:
+            try:
+                profiler.stop()
+                path = await asyncio.to_thread(save, profiler, name, PROFILE_DIR, PROFILE_KEEP)
+                logger.info(
+                    "Profiling: %s – %d samples over %.2fs written to %s",
+                    scope["path"], profiler.samples, profiler.seconds, path,
+                )
+            except OSError as e:
+                logger.warning("Profiling: could not save profile %s (%s)", name, e)
+            finally:
+                self._busy.release()
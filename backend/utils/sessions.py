@@ -0,0 +1,153 @@
+"""
+Server-side chat session state.
+
+A session keeps what the client used to resend on every turn: the
+accumulated symptoms and the patient's own words so far (lowercased and
+joined incrementally, for the hallucination check). It also keeps each
+symptom's ICD-10 mapping, so a symptom is mapped once per conversation. Clients send the
+session id plus only the new message, so per-turn work stays flat as the
+conversation grows.
+
+Sessions live in an in-process LRU with a sliding TTL. With
+``SESSION_STORE_PATH`` set they are kept in SQLite instead, shared by all
+uvicorn workers on the node and surviving restarts.
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Session:
+    id: str
+    symptoms: List[str] = field(default_factory=list)
+    text: str = ""      # lowercased user turns, space-joined
+    turns: int = 0
+    mappings: Dict[str, Dict[str, Any]] = field(default_factory=dict)  # symptom -> ICD-10 mapping
+
+    def add_user_text(self, content: str) -> None:
+        self.text = f"{self.text} {content.lower()}" if self.text else content.lower()
+        self.turns += 1
+
+
+class SessionStore:
+    def __init__(self, ttl_seconds: float = 1800, maxsize: int = 10000, disk_path: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._counters = {"created": 0, "resumed": 0, "expired": 0, "evicted": 0, "unknown": 0}
+        self._db: Optional[sqlite3.Connection] = None
+        if disk_path:
+            self._open_disk(disk_path)
+
+    # ------------------------------------------------------------------
+    # Backends
+    # ------------------------------------------------------------------
+    def _open_disk(self, path: str) -> None:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            db = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " id TEXT PRIMARY KEY,"
+                " data TEXT NOT NULL,"
+                " expires REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)")
+            self._db = db
+        except sqlite3.Error as e:
+            logger.warning("Session store: disk backend disabled (%s)", e)
+            self._db = None
+
+    def _load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        if self._db is not None:
+            row = self._db.execute(
+                "SELECT data, expires FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+                self._counters["expired"] += 1
+                return None
+            return json.loads(row[0])
+        entry = self._memory.get(session_id)
+        if entry is None:
+            return None
+        if entry[1] <= now:
+            del self._memory[session_id]
+            self._counters["expired"] += 1
+            return None
+        self._memory.move_to_end(session_id)
+        return entry[0]
+
+    def _store(self, data: Dict[str, Any]) -> None:
+        expires = time.time() + self.ttl_seconds
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (id, data, expires) VALUES (?, ?, ?)",
+                (data["id"], json.dumps(data), expires),
+            )
+            # Opportunistic cleanup keeps the table bounded without a reaper.
+            cur = self._db.execute("DELETE FROM sessions WHERE expires <= ?", (time.time(),))
+            self._counters["expired"] += max(cur.rowcount, 0)
+            return
+        self._memory[data["id"]] = (data, expires)
+        self._memory.move_to_end(data["id"])
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+            self._counters["evicted"] += 1
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def resume(self, session_id: Optional[str]) -> Tuple[Session, bool]:
+        """Return (session, is_new); unknown or expired ids start a new session."""
+        with self._lock:
+            data = None
+            if session_id:
+                try:
+                    data = self._load(session_id)
+                except sqlite3.Error as e:
+                    logger.warning("Session store: read failed (%s)", e)
+                if data is None:
+                    self._counters["unknown"] += 1
+            if data is not None:
+                self._counters["resumed"] += 1
+                return Session(**data), False
+            self._counters["created"] += 1
+        return Session(id=uuid.uuid4().hex), True
+
+    def save(self, session: Session) -> None:
+        with self._lock:
+            try:
+                self._store(asdict(session))
+            except sqlite3.Error as e:
+                logger.warning("Session store: write failed (%s)", e)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._memory)
+        return {
+            **counters,
+            "backend": "sqlite" if self._db is not None else "memory",
+            "size": size if self._db is None else None,
+            "ttl_seconds": self.ttl_seconds,
+        }
@@ -0,0 +1,114 @@
+"""
+Server-Sent Events encoding for the chat stream.
+
+Chunks mimic OpenAI's ``chat.completion.chunk`` format. Everything that is
+fixed for a stream – id, ``created``, model, the JSON around the delta – is
+rendered once into a template by `SSEEncoder`, so a token costs one string
+escape and a concatenation instead of building and serialising a nested
+dict.
+
+`coalesce` merges tokens that arrive within ``SSE_COALESCE_MS`` into one
+frame: fewer, larger frames for long clarification replies, at a bounded
+extra latency.
+
+orjson is used for JSON when it is installed (``SSE_JSON=json`` forces the
+standard library).
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+from typing import Any, AsyncIterator, Optional
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+if os.getenv("SSE_JSON", "orjson").lower() == "json":
+    orjson = None
+
+SSE_COALESCE_MS = float(os.getenv("SSE_COALESCE_MS", "25"))
+
+DONE = "data: [DONE]\n\n"
+
+
+def dumps(obj: Any) -> str:
+    """Compact JSON text (orjson when available)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits; let json decide
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def data(obj: Any) -> str:
+    """A plain ``data:`` frame for a JSON payload (metadata, errors)."""
+    return f"data: {dumps(obj)}\n\n"
+
+
+class SSEEncoder:
+    """Frames for one completion stream; id and ``created`` are per stream."""
+
+    def __init__(self, id_prefix: str, model: str, role: str = "assistant"):
+        self.id = f"chatcmpl-{id_prefix}-{uuid.uuid4().hex[:12]}"
+        self.created = int(time.time())
+        self._prefix = (
+            f'data: {{"id":{dumps(self.id)},"object":"chat.completion.chunk",'
+            f'"created":{self.created},"model":{dumps(model)},'
+            f'"choices":[{{"index":0,"delta":'
+        )
+        self._content = f'{self._prefix}{{"role":{dumps(role)},"content":'
+
+    def chunk(self, content: str, finish_reason: Optional[str] = None) -> str:
+        finish = "null" if finish_reason is None else dumps(finish_reason)
+        return f'{self._content}{dumps(content)}}},"finish_reason":{finish}}}]}}\n\n'
+
+    def finish(self, finish_reason: str = "stop") -> str:
+        """Final marker: empty delta, only the finish reason."""
+        return f'{self._prefix}{{}},"finish_reason":{dumps(finish_reason)}}}]}}\n\n'
+
+
+async def coalesce(pieces: AsyncIterator[str], window_ms: float = SSE_COALESCE_MS) -> AsyncIterator[str]:
+    """Join pieces that arrive within ``window_ms`` of the first buffered one."""
+    if window_ms <= 0:
+        async for piece in pieces:
+            yield piece
+        return
+
+    loop = asyncio.get_running_loop()
+    window = window_ms / 1000
+    source = pieces.__aiter__()
+    buffer: list = []
+    deadline: Optional[float] = None
+    pending: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(source.__anext__())
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                # Window elapsed while the next piece is still on its way.
+                yield "".join(buffer)
+                buffer, deadline = [], None
+                continue
+            future, pending = pending, None
+            try:
+                piece = future.result()
+            except StopAsyncIteration:
+                break
+            buffer.append(piece)
+            if deadline is None:
+                deadline = loop.time() + window
+            elif loop.time() >= deadline:
+                yield "".join(buffer)
+                buffer, deadline = [], None
+    finally:
+        if pending is not None:
+            pending.cancel()
+    if buffer:
+        yield "".join(buffer)
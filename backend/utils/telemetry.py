@@ -0,0 +1,191 @@
+"""
+Process resource telemetry.
+
+A daemon thread samples RSS every ``TELEMETRY_SAMPLE_SECONDS``, so hot
+paths read the latest sample instead of making a psutil call. Peak RSS
+comes from the kernel's high-water mark (``getrusage`` ``ru_maxrss``),
+which also catches spikes between samples; platforms without ``resource``
+fall back to the highest sample seen.
+
+Per-request deltas go through a request context. `track_request` opens
+one for the current task and reads RSS once when it starts and once when
+it ends (two psutil calls per request, none per token); the sampled value
+is too old for requests shorter than the sample interval. `checkpoint`
+records only the growth of the kernel peak, which is live. Both are
+process-wide, so concurrent requests show up in each other's deltas.
+"""
+
+import os
+import sys
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import psutil
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SAMPLE_SECONDS = float(os.getenv("TELEMETRY_SAMPLE_SECONDS", "5"))
+
+_MB = 1024 * 1024
+
+
+def _read_rss_mb() -> float:
+    return psutil.Process(os.getpid()).memory_info().rss / _MB
+
+
+def _kernel_peak_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak / _MB if sys.platform == "darwin" else peak / 1024
+
+
+class ResourceSampler:
+    def __init__(self, interval_seconds: float = SAMPLE_SECONDS):
+        self.interval_seconds = interval_seconds
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._rss_mb: Optional[float] = None
+        self._sampled_peak_mb = 0.0
+        self._samples = 0
+
+    def sample(self) -> float:
+        rss = _read_rss_mb()
+        with self._lock:
+            self._rss_mb = rss
+            self._sampled_peak_mb = max(self._sampled_peak_mb, rss)
+            self._samples += 1
+        return rss
+
+    def start(self) -> None:
+        if self._thread is not None or self.interval_seconds <= 0:
+            return
+        self.sample()
+
+        def run():
+            while not self._stop.wait(self.interval_seconds):
+                try:
+                    self.sample()
+                except Exception as e:
+                    logger.error("RSS sampler failed: %s", e)
+
+        self._thread = threading.Thread(target=run, name="rss-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._stop.clear()
+
+    def rss_mb(self) -> float:
+        """Latest sampled RSS; samples on demand if the sampler is not running."""
+        with self._lock:
+            rss = self._rss_mb if self._thread is not None else None
+        return rss if rss is not None else self.sample()
+
+    def peak_rss_mb(self) -> float:
+        peak = _kernel_peak_mb()
+        if peak is not None:
+            return peak
+        with self._lock:
+            return self._sampled_peak_mb
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = self._samples
+        return {
+            "rss_mb": round(self.rss_mb(), 1),
+            "peak_rss_mb": round(self.peak_rss_mb(), 1),
+            "peak_source": "getrusage" if resource is not None else "sampled",
+            "sample_interval_seconds": self.interval_seconds,
+            "samples": samples,
+        }
+
+
+sampler = ResourceSampler()
+
+
+# ---------------------------------------------------------------------------
+# Per-request context
+# ---------------------------------------------------------------------------
+@dataclass
+class RequestUsage:
+    tag: str
+    start_rss_mb: float
+    start_peak_mb: float
+    started: float = field(default_factory=time.perf_counter)
+    checkpoints: List[Tuple[str, float]] = field(default_factory=list)
+
+    def checkpoint(self, label: str) -> None:
+        peak_delta = sampler.peak_rss_mb() - self.start_peak_mb
+        self.checkpoints.append((label, peak_delta))
+        logger.debug("%s %s: peak %+.1f MB", self.tag, label, peak_delta)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "seconds": round(time.perf_counter() - self.started, 3),
+            "rss_delta_mb": round(_read_rss_mb() - self.start_rss_mb, 2),
+            "peak_delta_mb": round(sampler.peak_rss_mb() - self.start_peak_mb, 2),
+            "checkpoints": {label: {"peak_delta_mb": round(peak, 2)} for label, peak in self.checkpoints},
+        }
+
+
+_current: ContextVar[Optional[RequestUsage]] = ContextVar("request_usage", default=None)
+
+_totals_lock = threading.Lock()
+_totals = {"requests": 0, "peak_growth_requests": 0, "max_rss_delta_mb": 0.0, "max_peak_delta_mb": 0.0}
+
+
+@contextmanager
+def track_request(tag: str) -> Iterator[RequestUsage]:
+    usage = RequestUsage(tag, _read_rss_mb(), sampler.peak_rss_mb())
+    _current.set(usage)
+    try:
+        yield usage
+    finally:
+        # No token reset: streaming bodies may be closed from another context.
+        _current.set(None)
+        summary = usage.summary()
+        with _totals_lock:
+            _totals["requests"] += 1
+            if summary["peak_delta_mb"] > 0:
+                _totals["peak_growth_requests"] += 1
+            _totals["max_rss_delta_mb"] = max(_totals["max_rss_delta_mb"], summary["rss_delta_mb"])
+            _totals["max_peak_delta_mb"] = max(_totals["max_peak_delta_mb"], summary["peak_delta_mb"])
+        logger.info(
+            "%s finished in %.3fs: RSS %+.1f MB, peak %+.1f MB",
+            tag, summary["seconds"], summary["rss_delta_mb"], summary["peak_delta_mb"],
+        )
+
+
+def current_request() -> Optional[RequestUsage]:
+    return _current.get()
+
+
+def checkpoint(label: str) -> None:
+    """Record peak-RSS growth for the current request, if one is tracked."""
+    usage = _current.get()
+    if usage is not None:
+        usage.checkpoint(label)
+
+
+def stats() -> Dict[str, Any]:
+    with _totals_lock:
+        totals = dict(_totals)
+    return {**sampler.stats(), "tracked_requests": totals}
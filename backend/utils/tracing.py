@@ -0,0 +1,277 @@
+"""
+Request tracing: request ids, per-stage spans and latency histograms.
+
+Off by default (``TRACING_ENABLED=1`` turns it on). When off, `span`
+returns a shared no-op and `traced` functions call straight through, so
+the instrumentation left in the hot paths costs one global lookup.
+
+When on:
+
+* `RequestTracingMiddleware` gives every HTTP request an id (the client's
+  ``X-Request-ID`` if it sent a sane one), echoes it in the response and
+  records the request's duration per route;
+* ``with span("chat.ollama"):`` times a stage into a histogram keyed by the
+  stage name; stages on ASR/mapping worker threads are attributed to the
+  request that submitted them (the pools copy the context);
+* ``/metrics`` renders all histograms in the Prometheus text format;
+* with ``TRACE_SPANS_PATH`` set, every span is also appended to that file
+  as one JSON line (request id, name, start, duration, attributes).
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import inspect
+import logging
+import threading
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Dict, Optional, Tuple
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("TRACING_ENABLED", "0").lower() in ("1", "true", "yes")
+SPANS_PATH = os.getenv("TRACE_SPANS_PATH") or None
+
+# Seconds; covers a sub-millisecond cache hit up to a cold model load.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+# ---------------------------------------------------------------------------
+# Histograms
+# ---------------------------------------------------------------------------
+class Histogram:
+    """Fixed-bucket histograms for one metric, one series per label set."""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts (last is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, labels: Tuple[str, ...], seconds: float) -> None:
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                index = i
+                break
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += seconds
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Tuple[list, float]]:
+        with self._lock:
+            return {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self.snapshot().items()):
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {total:.6f}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+        return "\n".join(lines)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+stage_seconds = Histogram(
+    "voicemedi_stage_duration_seconds", "Time spent per pipeline stage.", ("stage",)
+)
+request_seconds = Histogram(
+    "voicemedi_request_duration_seconds",
+    "HTTP request duration until the last body byte.",
+    ("method", "route", "status"),
+)
+
+
+def render_metrics() -> str:
+    """All histograms in the Prometheus text exposition format."""
+    return "\n".join([
+        "# HELP voicemedi_tracing_enabled Whether request tracing is on.",
+        "# TYPE voicemedi_tracing_enabled gauge",
+        f"voicemedi_tracing_enabled {int(ENABLED)}",
+        stage_seconds.render(),
+        request_seconds.render(),
+    ]) + "\n"
+
+
+# ---------------------------------------------------------------------------
+# Span file
+# ---------------------------------------------------------------------------
+class _SpanWriter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._file = None
+        self._path = None
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            if self._path != SPANS_PATH:
+                self._open(SPANS_PATH)
+            if self._file is not None:
+                self._file.write(line)
+
+    def _open(self, path: Optional[str]) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._file, self._path = None, path
+        if path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                self._file = open(path, "a", buffering=1, encoding="utf-8")
+            except OSError as e:
+                logger.warning("Tracing: cannot write spans to %s (%s)", path, e)
+
+
+_writer = _SpanWriter()
+
+
+# ---------------------------------------------------------------------------
+# Spans
+# ---------------------------------------------------------------------------
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("name", "attrs", "_start", "_wall")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self._wall = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._start
+        stage_seconds.observe((self.name,), seconds)
+        if SPANS_PATH:
+            record = {
+                "request_id": _request_id.get(),
+                "name": self.name,
+                "start": round(self._wall, 6),
+                "duration_ms": round(seconds * 1000, 3),
+                "thread": threading.current_thread().name,
+            }
+            if self.attrs:
+                record["attrs"] = self.attrs
+            if exc_type is not None:
+                record["error"] = exc_type.__name__
+            _writer.write(record)
+        return False
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+
+def span(name: str, **attrs):
+    """Time a stage: ``with span("predict.retrieve", queries=3): ...``."""
+    return Span(name, attrs) if ENABLED else _NOOP
+
+
+def traced(name: str):
+    """Decorator form of `span` for plain and async functions."""
+
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not ENABLED:
+                    return await fn(*args, **kwargs)
+                with Span(name, {}):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with Span(name, {}):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+# ---------------------------------------------------------------------------
+# Middleware
+# ---------------------------------------------------------------------------
+_SANE_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+class RequestTracingMiddleware:
+    """Pure ASGI, so streamed bodies are timed to their last byte."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope.get("headers") or ()).get(b"x-request-id", b"").decode("latin-1")
+        request_id = incoming if _SANE_ID.match(incoming) else uuid.uuid4().hex[:16]
+        token = _request_id.set(request_id)
+        start = time.perf_counter()
+        status = ["500"]
+
+        async def traced_send(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+                message = {**message, "headers": [*message.get("headers", ()), (b"x-request-id", request_id.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, traced_send)
+        finally:
+            route = scope.get("route")
+            request_seconds.observe(
+                (scope["method"], getattr(route, "path", "unmatched"), status[0]),
+                time.perf_counter() - start,
+            )
+            _request_id.reset(token)
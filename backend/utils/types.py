@@ -7,4 +7,6 @@ class Message(BaseModel):
 
 class ChatRequest(BaseModel):
     messages: List[Message]
-    accumulated_symptoms: Optional[List[str]] = []
\ No newline at end of file
+    accumulated_symptoms: Optional[List[str]] = []
+    # Returned in final_metadata; with it, `messages` only needs the new turn.
+    session_id: Optional[str] = None
\ No newline at end of file
@@ -0,0 +1,215 @@
+"""
+Energy-based voice-activity detection for 16 kHz mono PCM.
+
+Kiosk recordings are mostly silence: patients pause before, between and
+after sentences. `split_speech` drops the non-speech regions of a whole
+recording and cuts what is left into chunks of at most `max_chunk_seconds`
+at pauses, so every ASR engine decodes speech only (and whisper never sees
+the long silences it tends to hallucinate repeats into). `SpeechGate` does
+the same for a live stream, one chunk at a time.
+
+The detector is deliberately simple – per-frame RMS in dBFS against a
+threshold derived from the recording's own noise floor – so it costs a few
+milliseconds per minute of audio and needs nothing beyond NumPy.
+"""
+
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from utils.convert_to_wav import SAMPLE_RATE
+
+
+VAD_ENABLED = os.getenv("VAD_ENABLED", "1").lower() not in ("0", "false", "no")
+
+FRAME_MS = 30
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+
+# Frames must be this far above the noise floor, and never below the
+# absolute floor, to count as speech.
+MIN_SPEECH_DB = float(os.getenv("VAD_MIN_SPEECH_DB", "-50"))
+MARGIN_DB = float(os.getenv("VAD_MARGIN_DB", "12"))
+
+MIN_SPEECH_MS = 150   # shorter bursts are clicks / bumps
+MIN_SILENCE_MS = int(os.getenv("VAD_MIN_SILENCE_MS", "400"))  # shorter pauses stay in
+PAD_MS = 150          # context kept around every speech region
+
+
+@dataclass
+class VADResult:
+    chunks: List[np.ndarray] = field(default_factory=list)
+    total_seconds: float = 0.0
+    speech_seconds: float = 0.0
+
+    @property
+    def skipped_seconds(self) -> float:
+        return round(self.total_seconds - self.speech_seconds, 3)
+
+
+def frame_db(samples: np.ndarray) -> np.ndarray:
+    """RMS level of each 30 ms frame in dBFS (the last partial frame included)."""
+    audio = np.asarray(samples)
+    if audio.dtype == np.int16:
+        audio = audio.astype(np.float32) / 32768.0
+    else:
+        audio = audio.astype(np.float32, copy=False)
+    n_frames = -(-len(audio) // FRAME_SAMPLES)
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    padded = np.zeros(n_frames * FRAME_SAMPLES, dtype=np.float32)
+    padded[: len(audio)] = audio
+    frames = padded.reshape(n_frames, FRAME_SAMPLES)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def _threshold(levels: np.ndarray) -> float:
+    noise_floor = float(np.percentile(levels, 10))
+    # A recording that is speech from end to end has no quiet 10th
+    # percentile; never put the bar above the loud part of the audio.
+    speech_level = float(np.percentile(levels, 90))
+    return max(MIN_SPEECH_DB, min(noise_floor + MARGIN_DB, speech_level - MARGIN_DB))
+
+
+def _runs(mask: np.ndarray) -> List[Tuple[int, int]]:
+    """[start, end) index pairs of the True runs in a boolean array."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+
+def detect_speech(samples: np.ndarray) -> List[Tuple[int, int]]:
+    """Speech regions as [start, end) sample offsets, padded and merged."""
+    levels = frame_db(samples)
+    if len(levels) == 0:
+        return []
+    speech = levels > _threshold(levels)
+
+    min_speech = max(1, MIN_SPEECH_MS // FRAME_MS)
+    min_silence = max(1, MIN_SILENCE_MS // FRAME_MS)
+    pad = PAD_MS // FRAME_MS
+
+    regions: List[Tuple[int, int]] = []
+    for start, end in _runs(speech):
+        if end - start < min_speech:
+            continue
+        start, end = max(0, start - pad), min(len(levels), end + pad)
+        if regions and start - regions[-1][1] < min_silence:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+
+    return [
+        (int(start * FRAME_SAMPLES), int(min(end * FRAME_SAMPLES, len(samples))))
+        for start, end in regions
+    ]
+
+
+def _split_long(samples: np.ndarray, start: int, end: int, max_len: int) -> List[Tuple[int, int]]:
+    """Cut one over-long region at its quietest frames."""
+    pieces = []
+    while end - start > max_len:
+        # Search the last third of the window for the quietest frame.
+        lo = start + (2 * max_len) // 3
+        levels = frame_db(samples[lo : start + max_len])
+        cut = lo + int(np.argmin(levels)) * FRAME_SAMPLES if len(levels) else start + max_len
+        cut = min(max(cut, start + FRAME_SAMPLES), start + max_len)
+        pieces.append((start, cut))
+        start = cut
+    pieces.append((start, end))
+    return pieces
+
+
+def split_speech(
+    samples: np.ndarray,
+    max_chunk_seconds: float = 30.0,
+    enabled: Optional[bool] = None,
+) -> VADResult:
+    """Drop non-speech and group the speech into chunks of ≤ max_chunk_seconds.
+
+    Neighbouring speech regions are concatenated (silence removed) as long
+    as the chunk stays under the limit, so a recording normally becomes a
+    single chunk; only long monologues are split, and always at a pause.
+    """
+    total = len(samples) / SAMPLE_RATE
+    if enabled is None:
+        enabled = VAD_ENABLED
+    max_len = int(max_chunk_seconds * SAMPLE_RATE)
+
+    if not enabled:
+        regions = [(0, len(samples))] if len(samples) else []
+    else:
+        regions = detect_speech(samples)
+
+    pieces: List[Tuple[int, int]] = []
+    for start, end in regions:
+        pieces.extend(_split_long(samples, start, end, max_len))
+
+    chunks: List[np.ndarray] = []
+    current: List[np.ndarray] = []
+    current_len = 0
+    for start, end in pieces:
+        if current and current_len + (end - start) > max_len:
+            chunks.append(np.concatenate(current))
+            current, current_len = [], 0
+        current.append(samples[start:end])
+        current_len += end - start
+    if current:
+        chunks.append(np.concatenate(current))
+
+    speech = sum(end - start for start, end in pieces) / SAMPLE_RATE
+    return VADResult(chunks=chunks, total_seconds=total, speech_seconds=speech)
+
+
+class SpeechGate:
+    """Streaming counterpart of `split_speech` for live 16-bit PCM.
+
+    `accept(chunk)` says whether a chunk should be fed to the recognizer.
+    Speech chunks pass, followed by `hangover_ms` of trailing silence so
+    the recognizer can still detect the end of the utterance; after that,
+    silence is dropped until speech resumes.
+    """
+
+    def __init__(self, sample_rate: int = SAMPLE_RATE, hangover_ms: int = 1000, enabled: Optional[bool] = None):
+        self.sample_rate = sample_rate
+        self.hangover_ms = hangover_ms
+        self.enabled = VAD_ENABLED if enabled is None else enabled
+        # Start from a quiet-room guess; see _track_noise_floor.
+        self.noise_floor = MIN_SPEECH_DB - MARGIN_DB
+        self.total_seconds = 0.0
+        self.skipped_seconds = 0.0
+        self._since_speech_ms = float("inf")
+        self.ended = False  # True for the chunk on which the hangover ran out
+
+    def _track_noise_floor(self, levels: np.ndarray) -> None:
+        # Drop to quieter backgrounds at once, follow louder ones slowly
+        # (a few seconds), so a noisy room is learned but speech is not.
+        quiet = float(np.percentile(levels, 10))
+        if quiet < self.noise_floor:
+            self.noise_floor = quiet
+        else:
+            self.noise_floor += 0.05 * (quiet - self.noise_floor)
+
+    def accept(self, chunk: bytes) -> bool:
+        samples = np.frombuffer(chunk[: len(chunk) - len(chunk) % 2], dtype="<i2")
+        duration_ms = 1000 * len(samples) / self.sample_rate
+        self.total_seconds += duration_ms / 1000
+        self.ended = False
+        if not self.enabled or not len(samples):
+            return True
+
+        levels = frame_db(samples)
+        self._track_noise_floor(levels)
+        threshold = max(MIN_SPEECH_DB, self.noise_floor + MARGIN_DB)
+        if levels.max() > threshold:
+            self._since_speech_ms = 0.0
+            return True
+
+        was_open = self._since_speech_ms <= self.hangover_ms
+        self._since_speech_ms += duration_ms
+        if self._since_speech_ms <= self.hangover_ms:
+            return True
+        self.ended = was_open
+        self.skipped_seconds += duration_ms / 1000
+        return False
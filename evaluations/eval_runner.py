@@ -0,0 +1,273 @@
+"""
+Shared runner for the evaluation scripts.
+
+* one pooled ``httpx.AsyncClient`` with bounded concurrency;
+* results are appended to a JSONL file as they complete (one line per
+  item, flushed immediately), so a crashed run resumes where it stopped
+  and nothing is ever rewritten;
+* metrics (WER/CER, symptom precision/recall) are accumulated per item
+  and reported as the run progresses, including items from earlier runs.
+
+Used by ``test_chat_from_csv.py`` and ``test_transcribe_vosk.py``.
+"""
+
+import re
+import json
+import asyncio
+import logging
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Transcript
+# ---------------------------------------------------------------------------
+def load_transcript_with_continuation(file_path) -> List[Tuple[str, str]]:
+    """(speaker, text) turns; lines without a "P:"/"D:" prefix continue the previous turn."""
+    full_lines = []
+    current_speaker = None
+    current_text = []
+
+    with open(file_path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+
+            if line.startswith("P:") or line.startswith("D:"):
+                if current_speaker and current_text:
+                    full_lines.append((current_speaker, " ".join(current_text)))
+                current_speaker = "P" if line.startswith("P:") else "D"
+                current_text = [line[2:].strip()]
+            else:
+                current_text.append(line)
+
+    if current_speaker and current_text:
+        full_lines.append((current_speaker, " ".join(current_text)))
+
+    return full_lines
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, drop punctuation, collapse whitespace."""
+    return " ".join(_PUNCTUATION.sub("", text.lower()).split())
+
+
+def edit_counts(reference: List[str], hypothesis: List[str]) -> Dict[str, int]:
+    """Hits, substitutions, deletions and insertions of a minimal alignment."""
+    # Each cell holds (cost, hits, subs, dels, ins). On equal cost the
+    # diagonal wins, then deletion, then insertion; WER/CER are the same for
+    # any minimal alignment, hit-based MER/WIL can differ from jiwer on ties.
+    previous = [(j, 0, 0, 0, j) for j in range(len(hypothesis) + 1)]
+    for i, ref in enumerate(reference, 1):
+        current = [(i, 0, 0, i, 0)]
+        for j, hyp in enumerate(hypothesis, 1):
+            diag = previous[j - 1]
+            if ref == hyp:
+                best = (diag[0], diag[1] + 1, diag[2], diag[3], diag[4])
+            else:
+                best = (diag[0] + 1, diag[1], diag[2] + 1, diag[3], diag[4])
+            up, left = previous[j], current[j - 1]
+            if up[0] + 1 < best[0]:
+                best = (up[0] + 1, up[1], up[2], up[3] + 1, up[4])
+            if left[0] + 1 < best[0]:
+                best = (left[0] + 1, left[1], left[2], left[3], left[4] + 1)
+            current.append(best)
+        previous = current
+    _, hits, subs, dels, ins = previous[-1]
+    return {"hits": hits, "substitutions": subs, "deletions": dels, "insertions": ins}
+
+
+def transcription_measures(expected_norm: str, actual_norm: str) -> Dict[str, Any]:
+    """Per-utterance WER/MER/WIL/WIP/CER and the counts behind them."""
+    words = edit_counts(expected_norm.split(), actual_norm.split())
+    chars = edit_counts(list(expected_norm), list(actual_norm))
+    hits, errors = words["hits"], words["substitutions"] + words["deletions"] + words["insertions"]
+    n_ref, n_hyp = len(expected_norm.split()), len(actual_norm.split())
+    wip = (hits / n_ref) * (hits / n_hyp) if n_ref and n_hyp else 0.0
+    char_errors = chars["substitutions"] + chars["deletions"] + chars["insertions"]
+    return {
+        "cer": char_errors / len(expected_norm) if expected_norm else float(bool(actual_norm)),
+        "wer": errors / n_ref if n_ref else float(bool(n_hyp)),
+        "mer": errors / (hits + errors) if hits + errors else 0.0,
+        "wil": 1 - wip,
+        "wip": wip,
+        **words,
+        "ref_words": n_ref,
+        "ref_chars": len(expected_norm),
+        "char_errors": char_errors,
+    }
+
+
+class ErrorRates:
+    """Corpus WER/CER: total edits over total reference words/characters."""
+
+    def __init__(self):
+        self.items = 0
+        self.word_errors = self.ref_words = 0
+        self.char_errors = self.ref_chars = 0
+
+    def add(self, measures: Dict[str, Any]) -> None:
+        self.items += 1
+        self.word_errors += measures["substitutions"] + measures["deletions"] + measures["insertions"]
+        self.ref_words += measures["ref_words"]
+        self.char_errors += measures["char_errors"]
+        self.ref_chars += measures["ref_chars"]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "items": self.items,
+            "wer": self.word_errors / self.ref_words if self.ref_words else None,
+            "cer": self.char_errors / self.ref_chars if self.ref_chars else None,
+        }
+
+
+class PrecisionRecall:
+    """Micro-averaged precision/recall over symptom names, plus per-utterance detection."""
+
+    def __init__(self):
+        self.items = 0
+        self.tp = self.fp = self.fn = 0
+        self.detection = {"TP": 0, "FP": 0, "FN": 0, "TN": 0}
+
+    @staticmethod
+    def _names(values: Iterable[str]) -> set:
+        return {normalize_text(v) for v in values if normalize_text(v)}
+
+    def add(self, expected: Iterable[str], predicted: Iterable[str]) -> Dict[str, Any]:
+        expected, predicted = self._names(expected), self._names(predicted)
+        tp = len(expected & predicted)
+        self.items += 1
+        self.tp += tp
+        self.fp += len(predicted) - tp
+        self.fn += len(expected) - tp
+        outcome = ("T" if bool(expected) == bool(predicted) else "F") + ("P" if predicted else "N")
+        self.detection[outcome] += 1
+        return {"tp": tp, "fp": len(predicted) - tp, "fn": len(expected) - tp, "outcome": outcome}
+
+    def summary(self) -> Dict[str, Any]:
+        precision = self.tp / (self.tp + self.fp) if self.tp + self.fp else None
+        recall = self.tp / (self.tp + self.fn) if self.tp + self.fn else None
+        f1 = 2 * precision * recall / (precision + recall) if precision and recall else None
+        return {"items": self.items, "precision": precision, "recall": recall, "f1": f1, "detection": self.detection}
+
+
+# ---------------------------------------------------------------------------
+# Results file
+# ---------------------------------------------------------------------------
+class ResultLog:
+    """Append-only JSONL of per-item results, keyed by ``key``."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.records: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            self._load()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _load(self) -> None:
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            # A crash can leave a partial last line; drop it.
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                f.truncate(end)
+        for line in data[:end].decode("utf-8").splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            self.records[record["key"]] = record
+        logger.info(f"Resuming: {len(self.records)} results already in {self.path}")
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.records
+
+    def append(self, record: Dict[str, Any]) -> None:
+        self.records[record["key"]] = record
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def export(self, path, columns: Optional[List[str]] = None) -> None:
+        """Write all results once as CSV or Parquet (by extension)."""
+        import pandas as pd
+
+        df = pd.DataFrame([self.records[key] for key in sorted(self.records)])
+        if columns:
+            df = df[[c for c in columns if c in df.columns]]
+        if str(path).endswith(".parquet"):
+            df.to_parquet(path, index=False)
+        else:
+            df.to_csv(path, index=False)
+        logger.info(f"Exported {len(df)} results to {path}")
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+class EvalRunner:
+    def __init__(self, base_url: str, concurrency: int = 4, timeout: float = 600.0, progress_every: int = 25):
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.progress_every = progress_every
+
+    async def run(
+        self,
+        items: Iterable[Tuple[str, Any]],
+        evaluate: Callable[[httpx.AsyncClient, Any], Awaitable[Optional[Dict[str, Any]]]],
+        log: ResultLog,
+        on_result: Callable[[Dict[str, Any]], None],
+        summary: Callable[[], Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """Evaluate every item not yet in ``log``; ``on_result`` sees old and new records."""
+        for record in log.records.values():
+            on_result(record)
+        pending = [(key, item) for key, item in items if key not in log]
+        logger.info(f"{len(pending)} items to evaluate, {len(log.records)} already done")
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        done = failed = 0
+
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=limits) as client:
+
+            async def one(key: str, item: Any):
+                async with semaphore:
+                    try:
+                        return key, await evaluate(client, item), None
+                    except (httpx.HTTPError, ValueError) as e:
+                        return key, None, e
+
+            for next_result in asyncio.as_completed([one(key, item) for key, item in pending]):
+                key, record, error = await next_result
+                if record is None:
+                    # Not logged, so a resumed run retries it.
+                    failed += 1
+                    logger.warning(f"[{key}] failed: {error or 'no result'}")
+                    continue
+                record = {"key": key, **record}
+                log.append(record)
+                on_result(record)
+                done += 1
+                if done % self.progress_every == 0:
+                    logger.info(f"{done}/{len(pending)} done, {failed} failed – {summary()}")
+
+        result = {**summary(), "evaluated": done, "failed": failed}
+        logger.info(f"Finished: {result}")
+        return result
@@ -1,41 +1,33 @@
-import asyncio
-import httpx
+import ast
 import json
-import pandas as pd
-from pathlib import Path
+import asyncio
+import argparse
 import logging
+from pathlib import Path
+
+import pandas as pd
+
+from eval_runner import EvalRunner, PrecisionRecall, ResultLog, load_transcript_with_continuation
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 TRANSCRIPT_FILE = "syntheticData.txt"
-API_URL = "http://localhost:8000/chat"
-OUTPUT_CSV = "symptom_extraction_results.csv"
-
-def load_transcript_with_continuation(file_path):
-    full_lines = []
-    current_speaker = None
-    current_text = []
-
-    with open(file_path, "r") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
+API_URL = "http://localhost:8000"
+RESULTS_JSONL = "symptom_extraction_run.jsonl"
+OUTPUT_CSV = "LLM_symptom_extractions.csv"
+# Hand-labelled expected symptoms per utterance (column actual_output)
+GROUND_TRUTH_CSV = "symptom_extraction_results.csv"
 
-            if line.startswith("P:") or line.startswith("D:"):
-                if current_speaker and current_text:
-                    full_lines.append((current_speaker, " ".join(current_text)))
-                current_speaker = "P" if line.startswith("P:") else "D"
-                current_text = [line[2:].strip()]
-            else:
-                current_text.append(line)
 
-    if current_speaker and current_text:
-        full_lines.append((current_speaker, " ".join(current_text)))
+def load_ground_truth(path) -> dict:
+    if not Path(path).exists():
+        return {}
+    df = pd.read_csv(path)
+    return {row.utterance: ast.literal_eval(row.actual_output) for row in df.itertuples()}
 
-    return full_lines
 
-async def get_accumulated_symptoms(utterance: str, prev_acc: list) -> list:
+async def get_accumulated_symptoms(client, utterance: str, prev_acc: list) -> list:
     """
     Sends the user utterance plus previous accumulated_symptoms
     to the /chat endpoint, streams the SSE, and returns the
@@ -47,58 +39,71 @@ async def get_accumulated_symptoms(utterance: str, prev_acc: list) -> list:
     }
     accumulated = prev_acc[:]  # start from previous
 
-    async with httpx.AsyncClient(timeout=600.0) as client:
-        async with client.stream("POST", API_URL, json=payload) as resp:
-            async for line in resp.aiter_lines():
-                if not line.startswith("data: "):
-                    continue
-                body = line[len("data: "):].strip()
-
-                logging.info(f"Received line: {body}")
-                # break on DONE marker
-                if body == "[DONE]":
-                    break
-
-                # try parse JSON
-                try:
-                    data = json.loads(body)
-                except json.JSONDecodeError:
-                    logging.info(f"Failed to parse JSON from line: {body}")
-                    continue
-
-                # update accumulated if metadata
-                if isinstance(data, dict) and data.get("type") == "final_metadata":
-                    accumulated = data.get("accumulated_symptoms", [])
+    async with client.stream("POST", "/chat", json=payload) as resp:
+        resp.raise_for_status()
+        async for line in resp.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            body = line[len("data: "):].strip()
+
+            logging.debug(f"Received line: {body}")
+            # break on DONE marker
+            if body == "[DONE]":
+                break
+
+            # try parse JSON
+            try:
+                data = json.loads(body)
+            except json.JSONDecodeError:
+                logging.info(f"Failed to parse JSON from line: {body}")
+                continue
+
+            # update accumulated if metadata
+            if isinstance(data, dict) and data.get("type") == "final_metadata":
+                accumulated = data.get("accumulated_symptoms", [])
     return accumulated
 
-async def main():
+
+async def main(args):
     transcript = load_transcript_with_continuation(TRANSCRIPT_FILE)
-    results = []
-    accumulated = []  # carry this forward between calls
-
-    # only first 10 patient turns
-    count = 0
-    for speaker, utterance in transcript:
-        if speaker != "P":
-            continue    
-
-        logging.info(f"Processing utterance: {utterance}")
-        # pass along the previous accumulated list
-        new_accumulated = await get_accumulated_symptoms(utterance, [])
-        results.append({
-            "utterance": utterance,
-            "llm_actual": new_accumulated
-        })
-        count += 1
-        print(f"[{count}] Extracted: {new_accumulated}")
-
-        if count >= 10:
-            break
-
-    # write CSV
-    df = pd.DataFrame(results)
-    df.to_csv(OUTPUT_CSV, index=False)
-    print(f"\n✅ Saved to '{OUTPUT_CSV}'")
+    ground_truth = load_ground_truth(args.ground_truth)
+
+    # Every patient turn is evaluated on its own (no accumulated symptoms).
+    items = [
+        (f"turn_{idx:04}", utterance)
+        for idx, (speaker, utterance) in enumerate(transcript)
+        if speaker == "P"
+    ][: args.limit]
+
+    scores = PrecisionRecall()
+
+    async def evaluate(client, utterance):
+        predicted = await get_accumulated_symptoms(client, utterance, [])
+        print(f"Extracted: {predicted} <- {utterance!r}")
+        return {"utterance": utterance, "llm_actual": predicted}
+
+    def on_result(record):
+        expected = ground_truth.get(record["utterance"])
+        if expected is not None:
+            scores.add(expected, record["llm_actual"])
+
+    log = ResultLog(args.results)
+    try:
+        summary = await EvalRunner(args.url, concurrency=args.concurrency).run(
+            items, evaluate, log, on_result, scores.summary
+        )
+        log.export(args.output, columns=["utterance", "llm_actual"])
+    finally:
+        log.close()
+    print(f"\n✅ Saved to '{args.output}' – {json.dumps(summary)}")
+
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Evaluate /chat symptom extraction on the synthetic transcripts.")
+    parser.add_argument("--url", default=API_URL)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--limit", type=int, help="Only the first N patient turns")
+    parser.add_argument("--results", default=RESULTS_JSONL, help="Append-only results (resumed if present)")
+    parser.add_argument("--output", default=OUTPUT_CSV, help="CSV or .parquet export of all results")
+    parser.add_argument("--ground-truth", default=GROUND_TRUTH_CSV)
+    asyncio.run(main(parser.parse_args()))
@@ -1,106 +1,88 @@
 
-import pandas as pd
-import httpx
+import json
 import asyncio
+import argparse
 from pathlib import Path
-from jiwer import compute_measures, cer
-from jiwer import Compose, ToLowerCase, RemovePunctuation, RemoveMultipleSpaces, RemoveWhiteSpace, RemoveEmptyStrings
+
+from eval_runner import (
+    ErrorRates,
+    EvalRunner,
+    ResultLog,
+    load_transcript_with_continuation,
+    normalize_text,
+    transcription_measures,
+)
 
 
 TRANSCRIPT_FILE = "syntheticData.txt"
 AUDIO_DIR = "tmp_xtts_wavs"
-API_URL = "http://localhost:8000/transcribe_vosk"
-
-# Create a text normalization pipeline
-normalizer = Compose([
-    ToLowerCase(),
-    RemovePunctuation(),
-    RemoveMultipleSpaces(),
-    RemoveWhiteSpace(replace_by_space=True),
-    RemoveEmptyStrings()
-])
-
-
-def load_transcript_with_continuation(file_path):
-    full_lines = []
-    current_speaker = None
-    current_text = []
+API_URL = "http://localhost:8000"
+ENDPOINT = "/transcribe_vosk"
+RESULTS_JSONL = "asr_transcription_run.jsonl"
+OUTPUT_CSV = "asr_transcription_analysis.csv"
 
-    with open(file_path, "r") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
 
-            if line.startswith("P:") or line.startswith("D:"):
-                if current_speaker and current_text:
-                    full_lines.append((current_speaker, " ".join(current_text)))
-                current_speaker = "P" if line.startswith("P:") else "D"
-                current_text = [line[2:].strip()]
-            else:
-                current_text.append(line.strip())
-
-    if current_speaker and current_text:
-        full_lines.append((current_speaker, " ".join(current_text)))
-
-    return full_lines
-
-async def transcribe_and_compare():
+async def transcribe_and_compare(args):
     transcript_lines = load_transcript_with_continuation(TRANSCRIPT_FILE)
-    audio_files = sorted(Path(AUDIO_DIR).glob("*.wav"))
-    results = []
-
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        for file in audio_files:
-            print(f"🔎 Processing {file.name}...")
-
-            if not file.exists():
-                print(f"⚠️ Skipping {file.name}: file not found.")
-                continue    
-
-            idx = int(file.stem.split("_")[1])
-            if idx >= len(transcript_lines):
-                print(f"⚠️ Skipping {file.name}: index {idx} out of range in transcript.")
-                continue
-
-            expected_text = transcript_lines[idx][1].strip()
-
-            with open(file, "rb") as f:
-                files = {"file": (file.name, f, "audio/wav")}
-                try:
-                    response = await client.post(API_URL, files=files)
-                    if response.status_code == 200:
-                        actual_text = response.json().get("text", "").strip() or "[EMPTY]"
-
-                        # Normalize both expected and actual text
-                        expected_text_norm = normalizer(expected_text)
-                        actual_text_norm = normalizer(actual_text)
-                        print(f"[{file.name}] Expected: {expected_text_norm}")
-                        print(f"[{file.name}] Actual: {actual_text_norm}")
-
-                        metrics = compute_measures(expected_text_norm, actual_text_norm)
-                        cer_value = cer(expected_text_norm, actual_text_norm)
-                        print(f"[{file.name}] Metrics: {metrics}")
-
-                        results.append({
-                            "file": file.name,
-                            "expected": expected_text,
-                            "transcribed": actual_text,
-                            "expected_norm": expected_text_norm,
-                            "transcribed_norm": actual_text_norm,
-                            "cer": cer_value,
-                            **metrics
-                        })
-                    else:
-                        print(f"[{file.name}] ❌ HTTP {response.status_code} - {response.text}")
-
-                    # Save intermediate results after each file
-                    df = pd.DataFrame(results)
-                    df.to_csv("asr_transcription_analysis.csv", index=False)
-                except Exception as e:
-                    print(f"[{file.name}] ❌ Error: {e}")
+    audio_files = sorted(Path(args.audio_dir).glob("*.wav"))[: args.limit]
+
+    items = []
+    for file in audio_files:
+        idx = int(file.stem.split("_")[1])
+        if idx >= len(transcript_lines):
+            print(f"⚠️ Skipping {file.name}: index {idx} out of range in transcript.")
+            continue
+        items.append((file.name, (file, transcript_lines[idx][1].strip())))
+
+    rates = ErrorRates()
+
+    async def evaluate(client, item):
+        file, expected_text = item
+        response = await client.post(
+            args.endpoint, files={"file": (file.name, file.read_bytes(), "audio/wav")}
+        )
+        if response.status_code != 200:
+            print(f"[{file.name}] ❌ HTTP {response.status_code} - {response.text}")
+            return None
+        actual_text = response.json().get("text", "").strip() or "[EMPTY]"
+
+        # Normalize both expected and actual text
+        expected_text_norm = normalize_text(expected_text)
+        actual_text_norm = normalize_text(actual_text)
+        print(f"[{file.name}] Expected: {expected_text_norm}")
+        print(f"[{file.name}] Actual: {actual_text_norm}")
+
+        return {
+            "file": file.name,
+            "expected": expected_text,
+            "transcribed": actual_text,
+            "expected_norm": expected_text_norm,
+            "transcribed_norm": actual_text_norm,
+            **transcription_measures(expected_text_norm, actual_text_norm),
+        }
+
+    def on_result(record):
+        rates.add(record)
+
+    log = ResultLog(args.results)
+    try:
+        summary = await EvalRunner(args.url, concurrency=args.concurrency, timeout=60.0).run(
+            items, evaluate, log, on_result, rates.summary
+        )
+        log.export(args.output)
+    finally:
+        log.close()
+    print(f"\n✅ Saved to '{args.output}' – {json.dumps(summary)}")
+    return summary
 
-    return results
 
 if __name__ == "__main__":
-    asyncio.run(transcribe_and_compare())
+    parser = argparse.ArgumentParser(description="Evaluate ASR on the generated WAV corpus.")
+    parser.add_argument("--url", default=API_URL)
+    parser.add_argument("--endpoint", default=ENDPOINT)
+    parser.add_argument("--audio-dir", default=AUDIO_DIR)
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--limit", type=int, help="Only the first N files")
+    parser.add_argument("--results", default=RESULTS_JSONL, help="Append-only results (resumed if present)")
+    parser.add_argument("--output", default=OUTPUT_CSV, help="CSV or .parquet export of all results")
+    asyncio.run(transcribe_and_compare(parser.parse_args()))
@@ -22,6 +22,7 @@ export interface MessageData {
 
 const Chat = () => {
     const accumulatedSymptomsRef = useRef<string[]>([]);
+    const sessionIdRef = useRef<string | null>(null); // server-side chat session
     // const [messages, setMessages] = useState<MessageData[]>([]);
     const [userInput, setUserInput] = useState("");
     const [loading, setLoading] = useState(false);
@@ -118,8 +119,12 @@ const Chat = () => {
                 method: "POST",
                 headers: { "Content-Type": "application/json" },
                 body: JSON.stringify({
-                    messages: messagesWithUserContext, // Send context including the latest user message
+                    // With a session the server keeps the history; only the new message is sent.
+                    messages: sessionIdRef.current
+                        ? [{ role: userMessage.role, content: userMessage.content }]
+                        : messagesWithUserContext,
                     accumulated_symptoms: accumulatedSymptomsRef.current,
+                    session_id: sessionIdRef.current,
                 }),
             });
 
@@ -169,6 +174,9 @@ const Chat = () => {
                         Array.isArray(payloadObj.accumulated_symptoms)
                     ) {
                         accumulatedSymptomsRef.current = payloadObj.accumulated_symptoms;
+                        if (typeof payloadObj.session_id === "string") {
+                            sessionIdRef.current = payloadObj.session_id;
+                        }
                         console.log("✅ symptoms updated →", accumulatedSymptomsRef.current);
                         continue;          // nothing to show in the chat window
                     }